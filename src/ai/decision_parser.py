@@ -6,6 +6,8 @@ import json
 import re
 from typing import Dict, Any, Optional
 
+from src.utils.json_utils import loads
+
 
 class DecisionParser:
     """决策解析器"""
@@ -40,7 +42,7 @@ class DecisionParser:
                     response = match.group(1)
             
             # 解析JSON
-            decision = json.loads(response)
+            decision = loads(response)
             
             return DecisionParser.apply_defaults(decision)
             
@@ -167,7 +169,7 @@ class DecisionParser:
                     response = match.group(1)
             
             # 解析JSON
-            all_decisions = json.loads(response)
+            all_decisions = loads(response)
             
             # 为每个币种应用默认值
             for symbol, decision in all_decisions.items():
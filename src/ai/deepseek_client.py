@@ -4,11 +4,15 @@ DeepSeek AI客户端
 """
 import os
 import json
+import logging
 from typing import Dict, Any, Optional
 import warnings
 import httpx
 from openai import OpenAI
 
+from src.utils.http_pool import HAS_H2
+from src.utils.logger import get_logger, trace
+
 
 class DeepSeekClient:
     """DeepSeek AI客户端"""
@@ -26,10 +30,12 @@ class DeepSeekClient:
             raise ValueError("DEEPSEEK_API_KEY 未设置")
 
         self.model = model
+        self.log = get_logger("ai")
         self.base_url = "https://api.deepseek.com/v1"
 
         # ✅ FIX: use httpx.Client to support proxies / avoid unsupported kwargs
-        http_client = httpx.Client(timeout=120.0)
+        # httpx.Client 本身就是连线池，整个程序共用这一个；装了 h2 时改走 HTTP/2（大段回应的传输较省）
+        http_client = httpx.Client(timeout=120.0, http2=HAS_H2)
 
         self.client = OpenAI(
             api_key=self.api_key,
@@ -68,10 +74,9 @@ class DeepSeekClient:
             elif hasattr(response.choices[0], "reasoning_content"):
                 reasoning_content = getattr(response.choices[0], "reasoning_content", None)
 
+            # 推理全文由呼叫端（main）记录；这里只在 DEBUG 时另外输出，免得每次都把大段文字再印一遍
             if reasoning_content:
-                print("\n🧠 AI推理过程:")
-                print(reasoning_content)
-                print()
+                trace("ai", logging.DEBUG, "\n🧠 AI推理过程:\n%s\n", reasoning_content)
 
             return {
                 "reasoning_content": reasoning_content,
@@ -85,7 +90,7 @@ class DeepSeekClient:
             }
 
         except Exception as e:
-            print(f"❌ DeepSeek API调用失败: {e}")
+            self.log.info("❌ DeepSeek API调用失败: %s", e)
             raise
 
     def get_reasoning(self, response: Dict[str, Any]) -> str:
@@ -2,16 +2,287 @@
 提示词/JSON 构建器
 把市场数据转为 JSON 载荷，并可生成给模型的中文提示词（内嵌 JSON）
 """
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+import functools
+import hashlib
 import math
-import json
+import threading
+import time
 from decimal import Decimal, InvalidOperation
 
+import numpy as np
+
+from src.utils.indicators_nb import HAS_NUMBA, rsi_tail, macd_tail, boll_tail, indicators_tail
+from src.utils.patterns import detect_patterns, decode_patterns
+from src.utils.json_utils import dumps, dumps_bytes
+
+
+@dataclass(slots=True)
+class _HistoryEntry:
+    """载荷中的单笔历史决策（栏位顺序即 JSON 键顺序）；slots 比同形 dict 省约 2/3 记忆体"""
+    timestamp: Any
+    action: Any
+    open_percent: Any
+    reduce_percent: Any
+    confidence: float
+    leverage: float
+    reason: Any
+    price: float
+    positionAfterExecution: Any
+
+
+# 载荷一律缩排 2 格、保留非 ASCII（orjson / 标准库回退见 src.utils.json_utils）
+_dumps_bytes = dumps_bytes
+_dumps = dumps
+
+
+# 各 (symbol, interval) 指标区块的共用执行绪池（prompt_workers > 1 时才建立）
+_BLOCK_POOL: Optional[ThreadPoolExecutor] = None
+_BLOCK_POOL_LOCK = threading.Lock()
+
+
+def _block_pool(workers: int) -> ThreadPoolExecutor:
+    global _BLOCK_POOL
+    if _BLOCK_POOL is None:
+        with _BLOCK_POOL_LOCK:
+            if _BLOCK_POOL is None:
+                _BLOCK_POOL = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prompt-block")
+    return _BLOCK_POOL
+
+
+# 帐户/持仓区块会读到的来源栏位（作为快取键）
+_ACCOUNT_KEYS = ("equity", "available_balance", "total_unrealized_pnl")
+_POSITION_KEYS = (
+    "side", "positionAmt", "entry_price", "leverage", "unrealized_pnl", "pnl_percent",
+    "isolatedMargin", "updateTime", "take_profit", "tp", "tp_price", "stop_loss", "sl", "sl_price",
+)
+
+# OHLC 区块的栏位顺序：rows 为 [[O, H, L, C, V], ...]，表头只输出一次
+_OHLC_COLS = ["O", "H", "L", "C", "V"]
+# 目前提示词不含 OHLC 与 K 线型态（模型只看指标）；设为 True 即在每个 timeframe 区块附上两者
+_EMIT_OHLC = False
+
+# meta.now 与提示词「#当前时间」共用的时间格式
+_ISO_TS = "%Y-%m-%d %H:%M:%S"
+# 同一秒内重复呼叫直接回传上次格式化的字串：(epoch 秒, 字串)
+_now_cache: tuple = (-1, "")
+# 提示词中时间之后、JSON 载荷之前的固定段落（UTF-8）
+_PAYLOAD_HEADER = "\n\n#市场资料 JSON（请据此做判断）\n".encode()
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_iso_ts(ts: str) -> float:
+    """ISO-8601 字串 → epoch 秒；无法解析视为最旧（0.0）。同一笔纪录每轮都会重排，快取后只解析一次"""
+    try:
+        return datetime.fromisoformat(ts).timestamp()
+    except Exception:
+        return 0.0
+
+
+def _ts_sort_key(rec: Dict[str, Any]) -> float:
+    """
+    决策纪录的排序键：解析后的时间（混用 'T' / 空白分隔、带时区的字串也能正确比较）。
+    缺失或非字串的 timestamp 视为最旧，避免 str 与其他型别混比而抛错。
+    """
+    ts = rec.get("timestamp")
+    return _parse_iso_ts(ts) if type(ts) is str else 0.0
+
+
+# 信心度字串 → 数值
+_CONF_MAP = {"HIGH": 0.8, "MEDIUM": 0.6, "LOW": 0.4, "": 0.5}
+
+
+@functools.lru_cache(maxsize=256)
+def _conf_from_str(c: str) -> float:
+    """字串信心度 → 0~1；模型回传的写法就那几种（"HIGH"、"0.7"…），快取后每笔只剩一次查表"""
+    v = _CONF_MAP.get(c.strip().upper())
+    if v is not None:
+        return v
+    try:
+        v = float(c)
+        if 0.0 <= v <= 1.0:
+            return v
+    except Exception:
+        pass
+    return 0.5
+
+# tick/step 字串：整数部、小数部、可选指数（只接受 ASCII 数字，其余交给 Decimal 判断）
+@functools.lru_cache(maxsize=256, typed=True)
+def _step_decimals(step) -> Optional[int]:
+    """
+    计算 step 的小数位数（语意同 Decimal 的 -exponent，上限 18）；
+    无效或非正数返回 None。常见字串（'0.01'、'1e-6'）直接扫字元，其余才建 Decimal。
+    """
+    s = step if type(step) is str else str(step)  # float 的 str 即最短 repr
+    if s.isascii():
+        sep = "e" if "e" in s else "E"
+        mant, has_exp, exp = s.partition(sep)
+        int_part, _, frac = mant.partition(".")
+        exp_ok = not has_exp or (exp[1:] if exp[:1] in ("+", "-") else exp).isdigit()
+        if (exp_ok and (int_part or frac)
+                and (not int_part or int_part.isdigit())
+                and (not frac or frac.isdigit())):
+            if not (int_part + frac).strip("0"):
+                return None  # 0 / 0.000
+            dp = len(frac) - (int(exp) if exp else 0)
+            return min(max(dp, 0), 18)
+    try:
+        d = Decimal(s)  # preserve precision
+        if d <= 0:
+            return None
+        dp = max(0, -d.as_tuple().exponent)  # 0.01 -> 2; 1E-6 -> 6
+        return min(dp, 18)
+    except (InvalidOperation, ValueError, TypeError):
+        return None
+
+
+def _rsi_macd_tail10(close: np.ndarray):
+    """
+    一次算出 RSI(14, SMA 平滑) / MACD(12,26,9) 最近 10 个值（旧→新，未四舍五入）。
+    与原 pandas 写法等价：RSI 只需最后 23 个 diff；EMA 为 adjust=False 的递推，
+    需从序列开头起算，故对完整 close 跑一次标量循环（约 200 点）。
+    已安装 numba 时改用 src.utils.indicators_nb 的编译 kernel（结果相同）。
+    返回 (rsi, macd, hist) 三个长度 10 的 ndarray，呼叫端直接 np.round
+    """
+    if HAS_NUMBA:
+        close = np.ascontiguousarray(close, dtype=np.float64)
+        macd, hist = macd_tail(close, 12, 26, 9, 10)
+        return rsi_tail(close, 14, 10), macd, hist
+
+    # RSI：diff → gain/loss → 14 期简单平均（只算最后 10 个窗口）
+    diff = np.diff(close[-24:])
+    gain = np.where(diff > 0, diff, 0.0)
+    loss = np.where(diff < 0, -diff, 0.0)
+    win_gain = np.lib.stride_tricks.sliding_window_view(gain, 14).mean(axis=1)
+    win_loss = np.lib.stride_tricks.sliding_window_view(loss, 14).mean(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100.0 - 100.0 / (1.0 + win_gain / win_loss)
+
+    # MACD：三条 EMA 递推 ema = a*x + (1-a)*prev，只收集最后 10 个
+    a_fast, a_slow, a_sig = 2.0 / 13.0, 2.0 / 27.0, 2.0 / 10.0
+    values = close.tolist()
+    start = len(values) - 10
+    fast = slow = values[0]
+    sig = 0.0
+    macd_out, hist_out = [], []
+    for i, x in enumerate(values):
+        fast = a_fast * x + (1.0 - a_fast) * fast
+        slow = a_slow * x + (1.0 - a_slow) * slow
+        m = fast - slow
+        sig = m if i == 0 else a_sig * m + (1.0 - a_sig) * sig
+        if i >= start:
+            macd_out.append(m)
+            hist_out.append(m - sig)
+    return rsi, np.array(macd_out), np.array(hist_out)
+
+
+# 多币种 JSON 提示词中「#当前时间」之前的静态段落（str.format 模板，{{ }} 为字面大括号）；
+# __init__ 代入 config 数值后只渲染一次，之后每次只接上时间与 JSON 载荷
+_MULTI_PROMPT_TEMPLATE = """
+你是一位专业的日内交易员。以下提供多币种的结构化市场资料（JSON），
+请逐一分析每个币种并输出**决策 JSON**，格式如下（币种键以实际输入为准）：
+
+{{
+  "BTCUSDT": {{
+    "action": "BUY_OPEN" | "SELL_OPEN" | "CLOSE" | "HOLD" | "ADD_BUY_OPEN" | "ADD_SELL_OPEN | PARTIAL_CLOSE",
+    "reason": "1-2句话说明决策理由（含关键指标与数值）",
+    "confidence": 0.0 - 1.0,
+    "leverage":  {default_leverage}-{max_leverage},
+    "open_percent": 0-10,
+    "reduce_percent" : 0-100,
+    "take_profit":  90000,
+    "stop_loss":  8000
+  }},
+  "...": {{ ... }}
+}}
+
+說明：
+──────────────────────────────
+📊 **輸入的 JSON 結構（重點欄位）**
+- `market` / `current_price` / `funding` / `open_interest`
+- `position`：當前持倉,若null則沒有持倉,格式:
+    "side": 多/空, 
+    "positionAmt": 持倉幣種數量, 
+    "entry_price": 入場價格, 
+    "leverage": 槓桿,
+    "unrealized_pnl": 未實現盈虧, 
+    "pnl_percent": 未實現盈虧比, 
+    "isolatedMargin": 使用保證金, 
+    "take_profit": 停利價格, 
+    "stop_loss": 停損價格
+- `market_data`：多時間框架（5m、1h、1D 等）
+  - `atr14`: 波動幅度 (權重:5%)
+  - `ema7`: ema7 (權重:5%)
+  - `ema21`: ema21 (權重:5%)
+  - `rsi`: 最近 10 筆（rsi 舊→新）(權重:15%)
+  - `macd`: 最近 10 筆 MACD 快線（舊→新）(權重:10%)
+  - `histogram`: 最近 10 筆 MACD 柱狀圖（舊→新）(權重:10%)
+  - `kdj`: 最近 10 筆 kdj (舊→新）(權重:35%)
+  - `boll`:  最近 10 筆 boll資料 (舊→新）(權重:15%)
+  - `decision_history`: （舊→新）最近數筆你做過的決策,格式:
+      "timestamp": 時間戳, 
+      "symbol": 幣種, 
+      "action": 決策動作, 
+      "confidence": 信心度, 
+      "leverage": 槓桿, 
+      "open_percent": 開倉百分比, 
+      "reduce_percent": 減倉百分比, 
+      "reason": 決策理由, 
+      "price": 當前價格, 
+      "positionAfterExecution": 執行決策後的倉位紀錄,欄位同position
+    
+#技術指標資料說明:
+- time_frame:1d 用來判斷大方向
+- time_frame:1h,3m,用來判斷是否開倉,也可用來判斷是否獲利了結/停損
+- 可参考 market_data 内不同 time_frame 的 RSI/MACD/HIST/KDJ/BOLL 皆为「旧→新」序列）。
+- 每个币种下方含有该币的 decision_history（旧→新），可用以对齐你的建议与既有持仓/历史。
+- 依據各項指標權重加種判斷出本次多空方向
+
+#倉位说明：
+- 初始資金為200
+- 每个币种单独决策，依市场状况 BUY_OPEN(作多)/SELL_OPEN(作空)/ADD_BUY_OPEN(加倉作多)/ADD_SELL_OPEN(加倉作空)
+- 若判断风险较高或趋势不明确，可使用 HOLD。HOLD時無需提供leverage/open_percent/take_profit/stop_loss
+- BUY_OPEN/SELL_OPEN 时务必提供合理止盈止损價位。 
+- ADD_BUY_OPEN/ADD_SELL_OPEN 為加倉,加倉時需同時提供新的止盈止损價位,(可參考當前position的take_profit/stop_loss來做計算)
+- take_profit : 開倉價位加{take_profit_low} - {take_profit_high}%
+- stop_loss   : 開倉價位減{stop_loss_low} - {stop_loss_high}%
+- 我會根據你回傳的open_percent,leverage來開倉
+  開倉所使用的保證金(isolatedMargin)為 equity*open_percent
+  若所有艙位的isolatedMargin合超過equity的{margin_cap_percent}%, 則不可開倉或加倉
+  各幣種的isolatedMargin不要超過 equity/幣種數量 
+- PARTIAL_CLOSE 為減倉, 只用來確保利潤,不用來減少損失 , 需帶入reduce_percent
+  1) 請先把position物件內的 pnl_percent除以leverage (pnl_percent/leverage) 
+     得到的數字超過 {reduce_if_over}% 再考慮PARTIAL_CLOSE
+  2) 不可以連續三次PARTIAL_CLOSE,若判斷反轉請直接CLOSE
+  3) PARTIAL_CLOSE 每次設置5-20%,根據情況判斷
+- 若技術分析結果與市場情況相反,造成倉位浮虧的時候:
+  請先把position物件內的 pnl_percent除以leverage (pnl_percent/leverage) 
+  得到的數字(絕對值)超過 {position_tolerance}% 再考慮停損
+
+#額外說明
+-不要頻繁開倉關倉,有足夠信心再給開倉信號
+-若同方向連勝且多週期一致 ⇒ 可**小幅加槓桿/加倉**
+-回傳的symbol不要有斜線 , 例如 ETH/USDT -> ETHUSDT
+-不要只做多
+
+#当前时间
+"""
+
 
 class PromptBuilder:
     """提示词构建器（支援 JSON 输出）"""
 
+    # 执行个体属性固定（皆在 __init__ 设定）；新增属性时记得一并加进来
+    __slots__ = (
+        "config", "ai_config", "default_intervals", "symbol_precisions", "prompt_workers",
+        "_hist_cache", "_acct_cache", "_pos_cache", "_block_cache", "_symbol_static", "_pdp", "_qdp",
+        "_prompt_head", "_prompt_head_bytes",
+    )
+
     @staticmethod
     def _decimals_from_step(step, default_dp: int = 2) -> int:
         """
@@ -22,13 +293,10 @@ class PromptBuilder:
         if step is None:
             return default_dp
         try:
-            d = Decimal(str(step))  # preserve precision
-            if d <= 0:
-                return default_dp
-            dp = max(0, -d.as_tuple().exponent)  # 0.01 -> 2; 1E-6 -> 6
-            return int(min(dp, 18))
-        except (InvalidOperation, ValueError, TypeError):
-            return default_dp
+            dp = _step_decimals(step)
+        except TypeError:  # 不可 hash 的输入，略过快取
+            dp = _step_decimals.__wrapped__(step)
+        return default_dp if dp is None else dp
 
     def __init__(self, config: Dict[str, Any], precision_map: Dict[str, Dict[str, int]]):
         """
@@ -40,21 +308,54 @@ class PromptBuilder:
         self.config = config
         self.ai_config = config.get("ai", {})
         # 预设的时间框架输出顺序（只输出存在于资料中的）
-        self.default_intervals = ["3m" , "15m" , "1h", "1d"]
+        self.default_intervals = ("3m", "15m", "1h", "1d")  # tuple：进程内固定，迴圈直接走
         self.symbol_precisions = precision_map
+        # 指标区块并行数：1 = 依序计算（指标计算多半持有 GIL，多执行绪未必更快）
+        self.prompt_workers = max(1, int(self.ai_config.get("prompt_workers", 1) or 1))
+        # decision_history 分组结果快取：(key, grouped)
+        self._hist_cache = None
+        # 帐户区块快取 (key, block)；持仓区块快取 {symbol: (key, block)}
+        self._acct_cache = None
+        self._pos_cache: Dict[str, Any] = {}
+        # 指标区块快取 {(symbol, interval): (fingerprint, block)}；K 线与指标没变就沿用上次的区块
+        # （同一个 block dict 会出现在多次载荷中，呼叫端请勿就地修改）
+        self._block_cache: Dict[tuple, tuple] = {}
+        # 每个 symbol 的不变资料：(market 名称, price_dp, qty_dp)
+        self._symbol_static: Dict[str, tuple] = {
+            sym: self._make_symbol_static(sym) for sym in (precision_map or {})
+        }
+        # 摊平成 {symbol: dp}，_round_price / _round_qty 每次只查一层 dict
+        self._pdp: Dict[str, int] = {sym: meta[1] for sym, meta in self._symbol_static.items()}
+        self._qdp: Dict[str, int] = {sym: meta[2] for sym, meta in self._symbol_static.items()}
+        # 提示词的静态部分（只含 config 数值，进程内不变）
+        self._prompt_head = self._build_prompt_head()
+        self._prompt_head_bytes = self._prompt_head.encode()
 
     # ---------------------------
     # 小工具：数值安全处理 / 取值 / 四捨五入
     # ---------------------------
     @staticmethod
     def _is_num(x) -> bool:
+        # 快速路径：float 直接判有限值；None / bool 直接否决，免走 isinstance + try/except
+        t = type(x)
+        if t is float:
+            return math.isfinite(x)
+        if x is None or t is bool:
+            return False
         try:
-            return (x is not None) and (not isinstance(x, bool)) and math.isfinite(float(x))
+            # int 也走 float()：超过 float 范围的大整数仍判为 False
+            return math.isfinite(float(x))
         except Exception:
             return False
 
     @staticmethod
     def _to_float(x, default: float = 0.0) -> float:
+        # 快速路径：绝大多数输入本来就是 float / None，免走 try/except
+        t = type(x)
+        if t is float:
+            return x if math.isfinite(x) else default
+        if x is None:
+            return default
         try:
             v = float(x)
             if math.isfinite(v):
@@ -65,11 +366,21 @@ class PromptBuilder:
 
     @staticmethod
     def _round(x, n=4):
+        if type(x) is float:
+            return round(x, n)
         try:
             return round(float(x), n)
         except Exception:
             return 0.0
 
+    @staticmethod
+    def _round_many(values, n: int) -> List[float]:
+        """一组数值一次 np.round；含无法转 float 的值时逐个退回 _round（该值得 0.0）"""
+        try:
+            return np.round(np.asarray(values, dtype=np.float64), n).tolist()
+        except (TypeError, ValueError):
+            return [PromptBuilder._round(x, n) for x in values]
+
     @staticmethod
     def _get(d: dict, key: str, default=0.0, n: Optional[int] = None):
         v = d.get(key, default)
@@ -82,6 +393,9 @@ class PromptBuilder:
         """
         把字串 HIGH/MEDIUM/LOW 或数字转成 0~1 浮点数
         """
+        t = type(c)
+        if t is float:
+            return c if 0.0 <= c <= 1.0 else 0.5
         if isinstance(c, (int, float)):
             try:
                 v = float(c)
@@ -91,72 +405,48 @@ class PromptBuilder:
                 pass
             return 0.5
         if isinstance(c, str):
-            cs = c.strip().upper()
-            if cs == "HIGH":
-                return 0.8
-            if cs == "MEDIUM":
-                return 0.6
-            if cs == "LOW":
-                return 0.4
-            try:
-                v = float(c)
-                if 0.0 <= v <= 1.0:
-                    return v
-            except Exception:
-                pass
+            return _conf_from_str(str(c))
         return 0.5
 
     # ---------------------------
     # K线形态检测
     # ---------------------------
     @staticmethod
-    def _detect_candlestick_patterns(ohlc_tail: List[Dict[str, float]]) -> List[str]:
-        patterns: List[str] = []
+    def _detect_candlestick_patterns(ohlc_tail: Any) -> List[str]:
+        """
+        ohlc_tail 为 [[O, H, L, C, V], ...] 或同形 ndarray（旧→新，栏位见 _OHLC_COLS）；
+        规则见 src.utils.patterns（编译过的 kernel，回传 bitmask 再解码）
+        """
         if len(ohlc_tail) == 0:
-            return patterns
-
-        def body(o, c): return abs(c - o)
-        def upper(o, h, c): return h - max(o, c)
-        def lower(o, l, c): return min(o, c) - l
-
-        last = ohlc_tail[-1]
-        o, h, l, c = last["O"], last["H"], last["L"], last["C"]
-        rng = max(1e-9, h - l)
-        b = body(o, c)
-        up = upper(o, h, c)
-        lo = lower(o, l, c)
-
-        if b <= rng * 0.1:
-            patterns.append("Doji")
-        if (lo >= rng * 0.5) and (up <= rng * 0.2) and (c > o):
-            patterns.append("Hammer")
-        if (up >= rng * 0.5) and (lo <= rng * 0.2) and (c < o):
-            patterns.append("ShootingStar")
-
-        if len(ohlc_tail) >= 2:
-            prev = ohlc_tail[-2]
-            o2, c2 = prev["O"], prev["C"]
-            if (c2 < o2) and (c > o) and (c >= max(o2, c2)) and (o <= min(o2, c2)):
-                patterns.append("BullishEngulfing")
-            if (c2 > o2) and (c < o) and (o >= max(o2, c2)) and (c <= min(o2, c2)):
-                patterns.append("BearishEngulfing")
-        return patterns
-    
+            return []
+        arr = np.ascontiguousarray(ohlc_tail, dtype=np.float64)
+        return decode_patterns(detect_patterns(arr))
+
     def _price_dp(self, symbol: str, fallback: int = 2) -> int:
         return int(self.symbol_precisions.get(symbol, {}).get("price_dp", fallback))
 
     def _qty_dp(self, symbol: str, fallback: int = 4) -> int:
         return int(self.symbol_precisions.get(symbol, {}).get("qty_dp", fallback))
 
+    def _make_symbol_static(self, symbol: str) -> tuple:
+        return (f"{symbol.replace('USDT', '')}/USDT", self._price_dp(symbol), self._qty_dp(symbol))
+
+    def _symbol_meta(self, symbol: str) -> tuple:
+        """(market, price_dp, qty_dp)；不在精度表内的 symbol 第一次用到时算好并记下"""
+        meta = self._symbol_static.get(symbol)
+        if meta is None:
+            meta = self._symbol_static[symbol] = self._make_symbol_static(symbol)
+        return meta
+
     def _round_price(self, symbol: str, x: Any) -> float:
         try:
-            return round(float(x), self._price_dp(symbol))
+            return round(float(x), self._pdp.get(symbol, 2))
         except Exception:
             return 0.0
 
     def _round_qty(self, symbol: str, x: Any) -> float:
         try:
-            return round(float(x), self._qty_dp(symbol))
+            return round(float(x), self._qdp.get(symbol, 4))
         except Exception:
             return 0.0
 
@@ -167,56 +457,59 @@ class PromptBuilder:
         self,
         decision_history: Optional[List[Dict[str, Any]]],
         max_per_symbol: int = 10,
-    ) -> Dict[str, List[Dict[str, Any]]]:
+    ) -> Dict[str, List[_HistoryEntry]]:
         """
         将全域 decision_history 依 symbol 分组，输出为「旧→新」。
         若超过 max_per_symbol，保留最后 N 笔（最近 N 笔），
         但输出顺序仍维持旧→新以与 RSI/MACD/OHLC 一致。
+        每笔为 _HistoryEntry（序列化后与原本的 dict 键值相同）。
         """
-        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        grouped: Dict[str, List[_HistoryEntry]] = {}
         if not decision_history:
             return grouped
 
-        # 先将全部纪录按时间「旧→新」排序
-        def _ts_key(rec: Dict[str, Any]) -> float:
-            ts = rec.get("timestamp")
-            try:
-                return datetime.fromisoformat(ts).timestamp()
-            except Exception:
-                return 0.0
+        # history 只会 append，(id, 长度, 最后一笔时间) 不变即视为同一份资料
+        key = (id(decision_history), len(decision_history),
+               decision_history[-1].get("timestamp"), max_per_symbol)
+        if self._hist_cache is not None and self._hist_cache[0] == key:
+            return self._hist_cache[1]
 
-        sorted_all = sorted(decision_history, key=_ts_key, reverse=False)  # 旧→新
+        # 先将全部纪录按时间「旧→新」排序（时间解析有 lru_cache，重复的 timestamp 不再解析）。
+        # history 依时间 append，输入几乎已排好，Timsort 只需一趟 O(N) 比较；
+        # 实测比「每币种 heapq 留 N 笔」快 2~3 倍（heap 每笔都要建 tuple + 呼叫 heappush）。
+        sorted_all = sorted(decision_history, key=_ts_sort_key)  # 旧→新
 
-        # 依币种分桶
-        buckets: Dict[str, List[Dict[str, Any]]] = {}
+        # 依币种分桶：deque(maxlen=N) 在 append 时自动挤掉最旧的，只留最近 N 笔（仍为旧→新）
+        maxlen = max_per_symbol if max_per_symbol > 0 else None
+        buckets: Dict[str, deque] = {}
         for rec in sorted_all:
             sym = rec.get("symbol")
             if not sym:
                 continue
-            arr = buckets.setdefault(sym, [])
-            arr.append(rec)
-
-        # 对每个币种：只保留最后 N 笔（最近 N 笔），但输出顺序仍旧→新
-        for sym, arr in buckets.items():
-            trimmed = arr[-max_per_symbol:]
-
-            cleaned_list: List[Dict[str, Any]] = []
-            for rec in trimmed:
-                cleaned = {
-                    "timestamp": rec.get("timestamp"),
-                    "action": rec.get("action"),
-                    "open_percent" : rec.get("open_percent") or 0,
-                    "reduce_percent" : rec.get("reduce_percent") or 0,
-                    "confidence": self._norm_confidence(rec.get("confidence")),
-                    "leverage": self._to_float(rec.get("leverage"), 0.0),
-                    "reason": rec.get("reason"),
-                    "price": self._to_float(rec.get("price"), 0.0),
-                    "positionAfterExecution" : rec.get("positionAfterExecution"),
-                }
-                cleaned_list.append(cleaned)
-
-            grouped[sym] = cleaned_list  # 旧→新
-
+            dq = buckets.get(sym)
+            if dq is None:
+                dq = buckets[sym] = deque(maxlen=maxlen)
+            dq.append(rec)
+
+        # 只清洗留下来的纪录
+        norm_conf, to_float = self._norm_confidence, self._to_float
+        for sym, dq in buckets.items():
+            grouped[sym] = [
+                _HistoryEntry(
+                    rec.get("timestamp"),
+                    rec.get("action"),
+                    rec.get("open_percent") or 0,
+                    rec.get("reduce_percent") or 0,
+                    norm_conf(rec.get("confidence")),
+                    to_float(rec.get("leverage"), 0.0),
+                    rec.get("reason"),
+                    to_float(rec.get("price"), 0.0),
+                    rec.get("positionAfterExecution"),
+                )
+                for rec in dq
+            ]  # 旧→新
+
+        self._hist_cache = (key, grouped)
         return grouped
 
     # ---------------------------
@@ -248,58 +541,52 @@ class PromptBuilder:
                 j_list.append(j_val)
                 k_prev, d_prev = k_val, d_val
 
-            # 取最后 10 组（旧→新），四舍五入 1 位小数
-            tail_k = k_list[-10:]
-            tail_d = d_list[-10:]
-            tail_j = j_list[-10:]
-
-            result = [
-                {"k": round(k, 1), "d": round(d, 1), "j": round(j, 1)}
-                for k, d, j in zip(tail_k, tail_d, tail_j)
-            ]
-            return result
+            # 取最后 10 组（旧→新），整块一次四舍五入 1 位小数
+            rows = np.round(np.array((k_list[-10:], d_list[-10:], j_list[-10:])).T, 1).tolist()
+            return [{"k": k, "d": d, "j": j} for k, d, j in rows]
         except Exception:
             return []
 
     # ---------------------------
     # 计算多组 BOLL（旧→新，近 10 组）
     # ---------------------------
-    def _compute_boll_series(self, df, symbol: str, window: int = 20) -> List[Dict[str, float]]:
+    @staticmethod
+    def _compute_boll_series(df, price_dp: int, window: int = 20) -> List[Dict[str, float]]:
         """
         返回最近 10 组布林带（旧→新），格式：
         [{"upper": x, "middle": y, "lower": z}, ...]
-        所有价格栏位均用该 symbol 的动态价格精度进行四舍五入。
+        所有价格栏位均用该 symbol 的动态价格精度（price_dp）进行四舍五入。
         """
         try:
             if df is None or len(df) < window or "close" not in df:
                 return []
 
-            closes = df["close"]
-            sma = closes.rolling(window=window, min_periods=window).mean()
-            std = closes.rolling(window=window, min_periods=window).std()
-
-            upper = sma + (std * 2)
-            lower = sma - (std * 2)
-
-            tail_u = upper.tail(10).tolist()
-            tail_m = sma.tail(10).tolist()
-            tail_l = lower.tail(10).tolist()
-
-            out = []
-            for u, m, l in zip(tail_u, tail_m, tail_l):
-                out.append({
-                    "upper": self._round_price(symbol, u),
-                    "middle": self._round_price(symbol, m),
-                    "lower": self._round_price(symbol, l),
-                })
-            return out
+            # 只需最后 10 个窗口：取尾端 window+9 根做滑动视图，免走 pandas rolling std
+            closes = df["close"].to_numpy(dtype=np.float64, copy=False)[-(window + 9):]
+            if HAS_NUMBA and len(closes) == window + 9:
+                upper, sma, lower = boll_tail(np.ascontiguousarray(closes), window, 10)
+            else:
+                # 不足 window+9 根时前端补 NaN，与 rolling(min_periods=window) 一样输出 10 组（前几组为 NaN）
+                if len(closes) < window + 9:
+                    closes = np.concatenate((np.full(window + 9 - len(closes), np.nan), closes))
+                windows = np.lib.stride_tricks.sliding_window_view(closes, window)
+                sma = windows.mean(axis=1)
+                std = windows.std(axis=1, ddof=1)
+                upper = sma + (std * 2)
+                lower = sma - (std * 2)
+
+            # (10, 3) 矩阵一次四舍五入
+            tail = np.column_stack((upper, sma, lower))
+            rows = np.round(tail, price_dp).tolist()
+            return [{"upper": u, "middle": m, "lower": l} for u, m, l in rows]
         except Exception:
             return []
 
     # ---------------------------
     # 单一时间框架 → JSON 区块（价格类栏位依 symbol 精度）
     # ---------------------------
-    def _build_interval_block(self, interval: str, data: Dict[str, Any], symbol: str) -> Optional[Dict[str, Any]]:
+    @staticmethod
+    def _build_interval_block(interval: str, data: Dict[str, Any], price_dp: int) -> Optional[Dict[str, Any]]:
         """
         生成单一 timeframe 的 JSON 区块：
         {
@@ -312,94 +599,317 @@ class PromptBuilder:
           "atr14":  ...,
           "kdj": [ {"k":..,"d":..,"j":..}, ... 10 ],
           "boll": [ {"upper":..,"middle":..,"lower":..}, ... 10 ],
-          "ohlc": [ {O,H,L,C,V}, ... 10 rows old->new ]
+          "ohlc": {"cols": ["O","H","L","C","V"], "rows": [[o,h,l,c,v], ... old->new]}
         }
         说明：
         - KDJ 与 BOLL 皆为「多组阵列」，取最近 10 组，顺序为旧→新。
-        - 价格类字段使用该 symbol 的动态价格精度。
+        - 价格类字段使用该 symbol 的动态价格精度（由调用方预先查好 price_dp 传入）。
+        - 纯函数（不读 self），可在执行绪池中并行呼叫。
         """
         if not data:
             return None
 
         ind = data.get("indicators", {}) or {}
         df = data.get("dataframe")
-
-        # 价格类指标（单值）：动态价格精度
+        # MarketDataManager 另附 (5, N) 的 ohlcv 阵列时，热路径直接取列，不经 DataFrame 取栏
+        ohlcv = data.get("ohlcv")
+        if ohlcv is not None:
+            n_rows = ohlcv.shape[1]
+        else:
+            n_rows = 0 if df is None else len(df)  # 只取一次长度，下面的门槛都看这个 int
+
+        # 价格类指标（单值）：动态价格精度，三个值一起四舍五入
+        ema7, ema21, atr14 = PromptBuilder._round_many(
+            (ind.get("ema_7", 0.0), ind.get("ema_21", 0.0), ind.get("atr_14", 0.0)),  # ATR 为价格距离，也用价格精度
+            price_dp,
+        )
         block: Dict[str, Any] = {
             "time_frame": interval,
-            "ema7": self._round_price(symbol, ind.get("ema_7", 0.0)),
-            "ema21": self._round_price(symbol, ind.get("ema_21", 0.0)),
-            "atr14": self._round_price(symbol, ind.get("atr_14", 0.0)),  # ATR 为价格距离，也用价格精度
+            "ema7": ema7,
+            "ema21": ema21,
+            "atr14": atr14,
         }
 
-        # ===== RSI / MACD arrays（旧→新）=====
-        rsi_arr, macd_arr, hist_arr = [], [], []
-        if df is not None and len(df) >= 30 and "close" in df:
-            closes = df["close"]
-
-            # RSI（1 位小数）
+        # ===== 已安装 numba：RSI / MACD / KDJ / BOLL 一次编译过的 pass 算完 =====
+        # MarketDataManager 抓 K 线时已算好就直接用（indicators["prompt_tails"]），否则这里算
+        fused = ind.get("prompt_tails")
+        if fused is None and HAS_NUMBA and n_rows >= 30 and ohlcv is not None:
             try:
-                delta = closes.diff()
-                gain = delta.where(delta > 0, 0).rolling(window=14, min_periods=14).mean()
-                loss = (-delta.where(delta < 0, 0)).rolling(window=14, min_periods=14).mean()
-                rs = gain / loss
-                rsi_full = 100 - (100 / (1 + rs))
-                rsi_arr = [self._round(x, 1) for x in rsi_full.tail(10).tolist()]
+                fused = indicators_tail(ohlcv[1], ohlcv[2], ohlcv[3], 10, 9, 20)
             except Exception:
-                pass
-
-            # MACD 与 Hist（4 位小数）
+                fused = None
+        elif fused is None and HAS_NUMBA and n_rows >= 30 and all(col in df for col in ("high", "low", "close")):
             try:
-                ema_fast = closes.ewm(span=12, adjust=False).mean()
-                ema_slow = closes.ewm(span=26, adjust=False).mean()
-                macd_line = ema_fast - ema_slow
-                signal_line = macd_line.ewm(span=9, adjust=False).mean()
-                hist = macd_line - signal_line
-                macd_arr = [self._round(x, 4) for x in macd_line.tail(10).tolist()]
-                hist_arr = [self._round(x, 4) for x in hist.tail(10).tolist()]
+                fused = indicators_tail(
+                    np.ascontiguousarray(df["high"].to_numpy(dtype=np.float64, copy=False)),
+                    np.ascontiguousarray(df["low"].to_numpy(dtype=np.float64, copy=False)),
+                    np.ascontiguousarray(df["close"].to_numpy(dtype=np.float64, copy=False)),
+                    10, 9, 20,
+                )
             except Exception:
-                pass
-
-        block["rsi"] = rsi_arr
-        block["macd"] = macd_arr
-        block["histogram"] = hist_arr
-
-        # ===== KDJ 多组（旧→新）=====
-        kdj_list = self._compute_kdj_series(df, n=9)
-        block["kdj"] = kdj_list
-
-        # ===== BOLL 多组（旧→新）=====
-        boll_list = self._compute_boll_series(df, symbol, window=20)
-        block["boll"] = boll_list
-
-        # ===== OHLC（最近10根，旧→新；价格用动态价格精度）=====
-        ohlc_list: List[Dict[str, float]] = []
-        if df is not None and len(df) > 0:
-            tail = df.tail(5)
-            for _, row in tail.iterrows():
-                o = self._round_price(symbol, row.get("open", 0))
-                h = self._round_price(symbol, row.get("high", 0))
-                l = self._round_price(symbol, row.get("low", 0))
-                c = self._round_price(symbol, row.get("close", 0))
-                v = self._round(row.get("volume", 0), 0)  # 量仍用 0 位
-                ohlc_list.append({"O": o, "H": h, "L": l, "C": c, "V": v})
-        # block["ohlcv"] = ohlc_list
-        # block["patterns"] = self._detect_candlestick_patterns(ohlc_list) if ohlc_list else []
+                fused = None
+        if fused is not None:
+            rsi_raw, macd_raw, hist_raw, k, d, j, upper, middle, lower = fused
+            block["rsi"] = np.round(rsi_raw, 1).tolist()
+            block["macd"], block["histogram"] = np.round((macd_raw, hist_raw), 4).tolist()
+            block["kdj"] = [
+                {"k": kv, "d": dv, "j": jv}
+                for kv, dv, jv in np.round(np.column_stack((k, d, j)), 1).tolist()
+            ]
+            block["boll"] = [
+                {"upper": u, "middle": m, "lower": l}
+                for u, m, l in np.round(np.column_stack((upper, middle, lower)), price_dp).tolist()
+            ]
+        else:
+            # ===== RSI / MACD arrays（旧→新）=====
+            rsi_arr, macd_arr, hist_arr = [], [], []
+            if n_rows >= 30 and (ohlcv is not None or "close" in df):
+                try:
+                    closes = ohlcv[3] if ohlcv is not None else df["close"].to_numpy(dtype=np.float64, copy=False)
+                    rsi_raw, macd_raw, hist_raw = _rsi_macd_tail10(closes)
+                    rsi_arr = np.round(rsi_raw, 1).tolist()                      # RSI（1 位小数）
+                    macd_arr, hist_arr = np.round((macd_raw, hist_raw), 4).tolist()  # MACD 与 Hist（4 位小数）
+                except Exception:
+                    pass
+
+            block["rsi"] = rsi_arr
+            block["macd"] = macd_arr
+            block["histogram"] = hist_arr
+
+            # ===== KDJ 多组（旧→新）；资料不足 9 根直接给空阵列，不进 pandas =====
+            kdj_list = PromptBuilder._compute_kdj_series(df, n=9) if n_rows >= 9 else []
+            block["kdj"] = kdj_list
+
+            # ===== BOLL 多组（旧→新）；不足 20 根同上 =====
+            boll_list = PromptBuilder._compute_boll_series(df, price_dp, window=20) if n_rows >= 20 else []
+            block["boll"] = boll_list
+
+        # ===== OHLC（最近5根，旧→新；价格用动态价格精度）=====
+        # 以栏位阵列表示（rows 每列依 _OHLC_COLS），不再每列重复 O/H/L/C/V 键名。
+        # 未输出时整段略过，不必每个区块都切一次 DataFrame
+        if _EMIT_OHLC:
+            ohlc_rows: List[List[float]] = []
+            patterns: List[str] = []
+            if n_rows > 0:
+                try:
+                    if ohlcv is not None:
+                        arr = ohlcv[:, -5:].T
+                    else:
+                        # 先切尾 5 列再转 ndarray，不必把整张表转成 float64 再丢掉
+                        arr = df[["open", "high", "low", "close", "volume"]].iloc[-5:].to_numpy(dtype=np.float64)
+                    rounded = np.column_stack((
+                        np.round(arr[:, :4], price_dp),
+                        np.round(arr[:, 4], 0),  # 量仍用 0 位
+                    ))
+                    ohlc_rows = rounded.tolist()
+                    patterns = PromptBuilder._detect_candlestick_patterns(rounded)  # 型态以四舍五入后的价格判断
+                except Exception:
+                    ohlc_rows, patterns = [], []
+            block["ohlc"] = {"cols": _OHLC_COLS, "rows": ohlc_rows}
+            block["patterns"] = patterns
         return block
 
-    def _opt_price(self, symbol: str, x: Any):
+    def _collect_interval_blocks(self, all_symbols_data: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        计算所有 (symbol, interval) 的指标区块，返回 {symbol: [block, ...]}（依 default_intervals 顺序）。
+        prompt_workers > 1 时丢进共用执行绪池并行计算，结果顺序不变。
+        """
+        tasks = []
+        results: List[Optional[Dict[str, Any]]] = []
+        misses: List[int] = []
+        cache = self._block_cache
+        intervals = self.default_intervals
+        for symbol, symbol_data in all_symbols_data.items():
+            market_data = symbol_data.get("market_data", {}) or {}
+            multi = market_data.get("multi_timeframe", {}) or {}
+            price_dp = self._symbol_meta(symbol)[1]
+            # 只走该币种实际有的 timeframe（顺序仍依 default_intervals）
+            for interval in [iv for iv in intervals if iv in multi]:
+                data = multi[interval] or {}
+                fp = self._block_fingerprint(data, price_dp)
+                hit = cache.get((symbol, interval))
+                if fp is not None and hit is not None and hit[0] == fp:
+                    results.append(hit[1])
+                else:
+                    misses.append(len(tasks))
+                    results.append(None)
+                tasks.append((symbol, interval, data, price_dp, fp))
+
+        # 只重算快取没命中的区块
+        todo = [tasks[i] for i in misses]
+        if self.prompt_workers > 1 and len(todo) > 1:
+            fresh = list(_block_pool(self.prompt_workers).map(
+                lambda t: PromptBuilder._build_interval_block(t[1], t[2], t[3]), todo
+            ))
+        else:
+            fresh = [PromptBuilder._build_interval_block(t[1], t[2], t[3]) for t in todo]
+        for i, block in zip(misses, fresh):
+            results[i] = block
+            symbol, interval, _, _, fp = tasks[i]
+            if fp is not None:
+                cache[(symbol, interval)] = (fp, block)
+
+        blocks: Dict[str, List[Dict[str, Any]]] = {}
+        for task, block in zip(tasks, results):
+            if block:
+                blocks.setdefault(task[0], []).append(block)
+        return blocks
+
+    @staticmethod
+    def _block_fingerprint(data: Dict[str, Any], price_dp: int) -> Optional[tuple]:
+        """
+        区块内容的指纹：K 线各栏位的原始 bytes 杂凑 + 单值指标 + 价格精度。
+        最后一根 K 线仍在形成中（收盘价随时在变），所以必须看内容，不能只看最后一根的时间；
+        算指纹只需几微秒，远低于重算一个区块。无法取得时返回 None（不快取）。
+        """
+        if not data:
+            return None
+        try:
+            ind = data.get("indicators", {}) or {}
+            df = data.get("dataframe")
+            ohlcv = data.get("ohlcv")
+            key: List[Any] = [price_dp, ind.get("ema_7"), ind.get("ema_21"), ind.get("atr_14")]
+            if ohlcv is not None:
+                # 五栏在同一块连续记忆体，一次杂凑
+                key.append(ohlcv.shape)
+                key.append(hash(ohlcv.tobytes()))
+            elif df is not None:
+                key.append(len(df))
+                for col in ("open", "high", "low", "close", "volume"):
+                    if col in df:
+                        key.append((col, hash(df[col].to_numpy(dtype=np.float64, copy=False).tobytes())))
+            return tuple(key)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _opt_price(x: Any, price_dp: int):
         """
         取可選價格欄位；若 x 不存在/<=0/無法轉 float，返回 None。
-        會依該 symbol 的價格精度做四捨五入。
+        會依該 symbol 的價格精度（price_dp）做四捨五入。
         """
         try:
             v = float(x)
             if not math.isfinite(v) or v <= 0:
                 return None
-            return self._round_price(symbol, v)
+            return round(v, price_dp)
         except Exception:
             return None
         
+    # ---------------------------
+    # 载荷各区块：meta / account / 单一币种
+    # ---------------------------
+    @staticmethod
+    def _now_str() -> str:
+        """目前本地时间字串（meta.now 与「#当前时间」共用格式）；格式只到秒，同一秒内只 strftime 一次"""
+        global _now_cache
+        sec = int(time.time())
+        cached = _now_cache
+        if cached[0] != sec:
+            # 整个 tuple 一次替换，其他执行绪不会读到秒数与字串不一致的中间状态
+            cached = _now_cache = (sec, time.strftime(_ISO_TS, time.localtime(sec)))
+        return cached[1]
+
+    @staticmethod
+    def _build_meta(now: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "now": now or PromptBuilder._now_str(),
+            "exchange": "Binance Perp (USDT-M)",
+        }
+
+    def _build_account(self, account_summary: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if not account_summary:
+            return {}
+        # 帐户数值没变（多数 tick 只有价格在动）就沿用上次的区块
+        key = tuple(account_summary.get(k) for k in _ACCOUNT_KEYS)
+        cached = self._acct_cache
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        block = {
+            "equity": self._get(account_summary, "equity", 0.0, 2),
+            "available_balance": self._get(account_summary, "available_balance", 0.0, 2),
+            "total_unrealized_pnl": self._get(account_summary, "total_unrealized_pnl", 0.0, 2),
+        }
+        self._acct_cache = (key, block)
+        return block
+
+    def _build_position(self, symbol: str, position: Dict[str, Any], price_dp: int, qty_dp: int) -> Dict[str, Any]:
+        """持仓区块；来源栏位与精度都没变时直接沿用上次结果（快取为唯读共用，勿修改）"""
+        try:
+            key = (price_dp, qty_dp) + tuple(position.get(k) for k in _POSITION_KEYS)
+            cached = self._pos_cache.get(symbol)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+        except TypeError:  # 栏位值不可 hash，略过快取
+            key = None
+
+        block = {
+            "side": position.get("side") or ("LONG" if self._to_float(position.get("positionAmt"), 0.0) > 0 else "SHORT"),
+            "positionAmt": self._round(position.get("positionAmt", 0.0), qty_dp),
+            "entry_price": self._round(position.get("entry_price", 0.0), price_dp),
+            "leverage": self._to_float(position.get("leverage"), 0.0),
+            "unrealized_pnl": self._get(position, "unrealized_pnl", 0.0, 4),
+            "pnl_percent": self._get(position, "pnl_percent", 0.0, 4),
+            "isolatedMargin": self._get(position, "isolatedMargin", 0.0, 4),
+            "updateTime": position.get("updateTime") or 0,
+            "take_profit": self._opt_price(
+                position.get("take_profit")
+                or position.get("tp")
+                or position.get("tp_price"),
+                price_dp,
+            ),
+            "stop_loss": self._opt_price(
+                position.get("stop_loss")
+                or position.get("sl")
+                or position.get("sl_price"),
+                price_dp,
+            ),
+        }
+        if key is not None:
+            self._pos_cache[symbol] = (key, block)
+        return block
+
+    def _build_symbol_obj(
+        self,
+        symbol: str,
+        symbol_data: Dict[str, Any],
+        grouped_hist: Dict[str, List[_HistoryEntry]],
+        blocks: List[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        market_data = symbol_data.get("market_data", {}) or {}
+        position = symbol_data.get("position")
+        realtime = (market_data.get("realtime") or {})
+        # market 名称与精度在 __init__ 已预先算好，后续栏位直接用 dp 四舍五入
+        market, price_dp, qty_dp = self._symbol_meta(symbol)
+
+        # 顶层行情（价格用动态价格精度）
+        current_price = self._round(realtime.get("price", 0.0), price_dp)
+        funding_rate = self._get(realtime, "funding_rate", 0.0, 6)
+        open_interest = self._get(realtime, "open_interest", 0.0, 0)
+
+        symbol_obj: Dict[str, Any] = {
+            "market": market,
+            "funding": funding_rate,
+            "open_interest": open_interest,
+            "current_price": current_price,
+            "position": None,
+            "market_data": [],
+            # 该币种的历史决策（旧→新）
+            "decision_history": grouped_hist.get(symbol, []),
+        }
+
+        # 持仓（若有）— 数量用 qty 精度，价格用 price 精度
+        if position:
+            symbol_obj["position"] = self._build_position(symbol, position, price_dp, qty_dp)
+
+        # 各时间框架（区块已由 _collect_interval_blocks 算好）
+        for block in blocks:
+            # 若希望每个 timeframe 也带 funding，可复制 symbol 层的 funding（可选）
+            # 区块来自 _block_cache，复制后再加 funding，避免改写快取内容
+            symbol_obj["market_data"].append({**block, "funding": funding_rate})
+
+        return symbol_obj
+
     # ---------------------------
     # 整体：多币种 → JSON 载荷（dict）
     # ---------------------------
@@ -408,9 +918,11 @@ class PromptBuilder:
         all_symbols_data: Dict[str, Any],
         account_summary: Optional[Dict[str, Any]] = None,
         decision_history: Optional[List[Dict[str, Any]]] = None,
+        now: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
-        产出**JSON 载荷**（Python dict 可直接 json.dumps）
+        产出**JSON 载荷**（Python dict；decision_history 元素为 _HistoryEntry，请用 _dumps 序列化）
+        now：可指定 meta.now（回测时固定时间）；预设为目前时间。
         结构：
         {
           "meta": {...},
@@ -429,88 +941,85 @@ class PromptBuilder:
           ]
         }
         """
-        payload: Dict[str, Any] = {
-            "meta": {
-                "now": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "exchange": "Binance Perp (USDT-M)",
-            },
-            "account": {},
-            "symbols": [],
-        }
-
-        # 帐户摘要
-        if account_summary:
-            payload["account"] = {
-                "equity": self._get(account_summary, "equity", 0.0, 2),
-                "available_balance": self._get(account_summary, "available_balance", 0.0, 2),
-                "total_unrealized_pnl": self._get(account_summary, "total_unrealized_pnl", 0.0, 2),
-            }
-
         # 历史决策按币种分组（旧→新）
         grouped_hist = self._group_history_by_symbol(decision_history, max_per_symbol=10)
+        blocks = self._collect_interval_blocks(all_symbols_data)
+        return {
+            "meta": self._build_meta(now),
+            "account": self._build_account(account_summary),
+            "symbols": [
+                self._build_symbol_obj(symbol, symbol_data, grouped_hist, blocks.get(symbol, []))
+                for symbol, symbol_data in all_symbols_data.items()
+            ],
+        }
 
-        # 遍历币种
+    def inputs_digest(
+        self,
+        all_symbols_data: Dict[str, Any],
+        account_summary: Optional[Dict[str, Any]] = None,
+    ) -> bytes:
+        """
+        行情 / 账户 / 持仓这几项输入的杂凑（不含历史决策与时间）。
+        呼叫端据此判断本周期的市场输入是否与上次相同；区块多半已在快取里，重算成本很低。
+        """
+        h = hashlib.blake2b(digest_size=16)
+        h.update(_dumps_bytes(self._build_account(account_summary), indent=False))
+        blocks = self._collect_interval_blocks(all_symbols_data)
         for symbol, symbol_data in all_symbols_data.items():
-            market_data = symbol_data.get("market_data", {}) or {}
-            position = symbol_data.get("position")
-            coin_name = symbol.replace("USDT", "")
-            realtime = (market_data.get("realtime") or {})
-
-            # 顶层行情（价格用动态价格精度）
-            current_price = self._round_price(symbol, realtime.get("price", 0.0))
-            funding_rate = self._get(realtime, "funding_rate", 0.0, 6)
-            open_interest = self._get(realtime, "open_interest", 0.0, 0)
-
-            symbol_obj: Dict[str, Any] = {
-                "market": f"{coin_name}/USDT",
-                "funding": funding_rate,
-                "open_interest": open_interest,
-                "current_price": current_price,
-                "position": None,
-                "market_data": [],
-                # 该币种的历史决策（旧→新）
-                "decision_history": grouped_hist.get(symbol, []),
-            }
-
-            # 持仓（若有）— 数量用 qty 精度，价格用 price 精度
-            if position:
-                symbol_obj["position"] = {
-                    "side": position.get("side") or ("LONG" if self._to_float(position.get("positionAmt"), 0.0) > 0 else "SHORT"),
-                    "positionAmt": self._round_qty(symbol, position.get("positionAmt", 0.0)),
-                    "entry_price": self._round_price(symbol, position.get("entry_price", 0.0)),
-                    "leverage": self._to_float(position.get("leverage"), 0.0),
-                    "unrealized_pnl": self._get(position, "unrealized_pnl", 0.0, 4),
-                    "pnl_percent": self._get(position, "pnl_percent", 0.0, 4),
-                    "isolatedMargin": self._get(position, "isolatedMargin", 0.0, 4),
-                    "updateTime": position.get("updateTime") or 0,
-                    "take_profit": self._opt_price(
-                        symbol,
-                        position.get("take_profit")
-                        or position.get("tp")
-                        or position.get("tp_price")
-                    ),
-                    "stop_loss": self._opt_price(
-                        symbol,
-                        position.get("stop_loss")
-                        or position.get("sl")
-                        or position.get("sl_price")
-                    ),
-                }
-
-            # 各时间框架
-            multi = market_data.get("multi_timeframe", {}) or {}
-            for interval in self.default_intervals:
-                if interval not in multi:
-                    continue
-                block = self._build_interval_block(interval, multi.get(interval) or {}, symbol)
-                if block:
-                    # 若希望每个 timeframe 也带 funding，可复制 symbol 层的 funding（可选）
-                    block["funding"] = funding_rate
-                    symbol_obj["market_data"].append(block)
+            symbol_obj = self._build_symbol_obj(symbol, symbol_data, {}, blocks.pop(symbol, []))
+            h.update(_dumps_bytes(symbol_obj, indent=False))
+        return h.digest()
 
-            payload["symbols"].append(symbol_obj)
+    # ---------------------------
+    # 整体：多币种 → JSON bytes（逐区块序列化，不建整棵 dict）
+    # ---------------------------
+    def _write_payload_json(
+        self,
+        write: Callable[[bytes], Any],
+        all_symbols_data: Dict[str, Any],
+        account_summary: Optional[Dict[str, Any]] = None,
+        decision_history: Optional[List[Dict[str, Any]]] = None,
+        now: Optional[str] = None,
+    ) -> None:
+        """
+        把与 build_multi_symbol_analysis_payload 相同的载荷逐片段交给 write（UTF-8 bytes）。
+        每个币种的 dict 序列化完即丢弃；子片段依嵌套深度补缩排，输出与整体 _dumps 逐字元相同。
+        """
+        grouped_hist = self._group_history_by_symbol(decision_history, max_per_symbol=10)
+        blocks = self._collect_interval_blocks(all_symbols_data)
+
+        write(b'{\n  "meta": ')
+        write(_dumps_bytes(self._build_meta(now)).replace(b"\n", b"\n  "))
+        write(b',\n  "account": ')
+        write(_dumps_bytes(self._build_account(account_summary)).replace(b"\n", b"\n  "))
+        write(b',\n  "symbols": ')
+        first = True
+        for symbol, symbol_data in all_symbols_data.items():
+            write(b"[\n    " if first else b",\n    ")
+            symbol_obj = self._build_symbol_obj(symbol, symbol_data, grouped_hist, blocks.pop(symbol, []))
+            write(_dumps_bytes(symbol_obj).replace(b"\n", b"\n    "))
+            first = False
+        write(b"[]" if first else b"\n  ]")
+        write(b"\n}")
 
-        return payload
+    # ---------------------------
+    # 静态提示词（依 config 组一次，之后每次只接上时间与 JSON）
+    # ---------------------------
+    def _build_prompt_head(self) -> str:
+        """返回「#当前时间」之前的整段提示词（_MULTI_PROMPT_TEMPLATE 代入 config 数值）"""
+        trading = self.config.get("trading", {})
+        risk = self.config.get("risk", {})
+        return _MULTI_PROMPT_TEMPLATE.format(
+            default_leverage=trading.get("default_leverage", 10),
+            max_leverage=trading.get("max_leverage", 10),
+            take_profit_low=risk.get("take_profit_low", 1),
+            take_profit_high=risk.get("take_profit_high", 10),
+            stop_loss_low=risk.get("stop_loss_low", 1),
+            stop_loss_high=risk.get("stop_loss_high", 10),
+            margin_cap_percent=100 - trading.get("reserve_percent", 10),
+            reduce_if_over=risk.get("reduce_if_over", 10),
+            position_tolerance=risk.get("position_tolerance", 10),
+        ).lstrip()
 
     # ---------------------------
     # 文字提示：内嵌 JSON（给 DeepSeek）
@@ -520,111 +1029,54 @@ class PromptBuilder:
         all_symbols_data: Dict[str, Any],
         account_summary: Optional[Dict[str, Any]] = None,
         decision_history: Optional[List[Dict[str, Any]]] = None,
+        now: Optional[str] = None,
     ) -> str:
         """
         产生**中文提示词** + 内嵌 **JSON 载荷**。
         模型请以该 JSON 为依据，回传每个币种的决策 JSON。
+        now：可指定时间字串（回测时固定时间、略过 strftime）；预设为目前时间。
         """
-        payload = self.build_multi_symbol_analysis_payload(
-            all_symbols_data, account_summary, decision_history
-        )
-        payload_json = json.dumps(payload, ensure_ascii=False, indent=2)
+        return self.build_multi_symbol_analysis_prompt_json_bytes(
+            all_symbols_data, account_summary, decision_history, now=now
+        ).decode()
 
-        prompt = f"""
-你是一位专业的日内交易员。以下提供多币种的结构化市场资料（JSON），
-请逐一分析每个币种并输出**决策 JSON**，格式如下（币种键以实际输入为准）：
-
-{{
-  "BTCUSDT": {{
-    "action": "BUY_OPEN" | "SELL_OPEN" | "CLOSE" | "HOLD" | "ADD_BUY_OPEN" | "ADD_SELL_OPEN | PARTIAL_CLOSE",
-    "reason": "1-2句话说明决策理由（含关键指标与数值）",
-    "confidence": 0.0 - 1.0,
-    "leverage":  {self.config.get('trading', {}).get('default_leverage', 10)}-{self.config.get('trading', {}).get('max_leverage', 10)},
-    "open_percent": 0-10,
-    "reduce_percent" : 0-100,
-    "take_profit":  90000,
-    "stop_loss":  8000
-  }},
-  "...": {{ ... }}
-}}
-
-說明：
-──────────────────────────────
-📊 **輸入的 JSON 結構（重點欄位）**
-- `market` / `current_price` / `funding` / `open_interest`
-- `position`：當前持倉,若null則沒有持倉,格式:
-    "side": 多/空, 
-    "positionAmt": 持倉幣種數量, 
-    "entry_price": 入場價格, 
-    "leverage": 槓桿,
-    "unrealized_pnl": 未實現盈虧, 
-    "pnl_percent": 未實現盈虧比, 
-    "isolatedMargin": 使用保證金, 
-    "take_profit": 停利價格, 
-    "stop_loss": 停損價格
-- `market_data`：多時間框架（5m、1h、1D 等）
-  - `atr14`: 波動幅度 (權重:5%)
-  - `ema7`: ema7 (權重:5%)
-  - `ema21`: ema21 (權重:5%)
-  - `rsi`: 最近 10 筆（rsi 舊→新）(權重:15%)
-  - `macd`: 最近 10 筆 MACD 快線（舊→新）(權重:10%)
-  - `histogram`: 最近 10 筆 MACD 柱狀圖（舊→新）(權重:10%)
-  - `kdj`: 最近 10 筆 kdj (舊→新）(權重:35%)
-  - `boll`:  最近 10 筆 boll資料 (舊→新）(權重:15%)
-  - `decision_history`: （舊→新）最近數筆你做過的決策,格式:
-      "timestamp": 時間戳, 
-      "symbol": 幣種, 
-      "action": 決策動作, 
-      "confidence": 信心度, 
-      "leverage": 槓桿, 
-      "open_percent": 開倉百分比, 
-      "reduce_percent": 減倉百分比, 
-      "reason": 決策理由, 
-      "price": 當前價格, 
-      "positionAfterExecution": 執行決策後的倉位紀錄,欄位同position
-    
-#技術指標資料說明:
-- time_frame:1d 用來判斷大方向
-- time_frame:1h,3m,用來判斷是否開倉,也可用來判斷是否獲利了結/停損
-- 可参考 market_data 内不同 time_frame 的 RSI/MACD/HIST/KDJ/BOLL 皆为「旧→新」序列）。
-- 每个币种下方含有该币的 decision_history（旧→新），可用以对齐你的建议与既有持仓/历史。
-- 依據各項指標權重加種判斷出本次多空方向
-
-#倉位说明：
-- 初始資金為200
-- 每个币种单独决策，依市场状况 BUY_OPEN(作多)/SELL_OPEN(作空)/ADD_BUY_OPEN(加倉作多)/ADD_SELL_OPEN(加倉作空)
-- 若判断风险较高或趋势不明确，可使用 HOLD。HOLD時無需提供leverage/open_percent/take_profit/stop_loss
-- BUY_OPEN/SELL_OPEN 时务必提供合理止盈止损價位。 
-- ADD_BUY_OPEN/ADD_SELL_OPEN 為加倉,加倉時需同時提供新的止盈止损價位,(可參考當前position的take_profit/stop_loss來做計算)
-- take_profit : 開倉價位加{self.config.get('risk', {}).get('take_profit_low', 1)} - {self.config.get('risk', {}).get('take_profit_high', 10)}%
-- stop_loss   : 開倉價位減{self.config.get('risk', {}).get('stop_loss_low', 1)} - {self.config.get('risk', {}).get('stop_loss_high', 10)}%
-- 我會根據你回傳的open_percent,leverage來開倉
-  開倉所使用的保證金(isolatedMargin)為 equity*open_percent
-  若所有艙位的isolatedMargin合超過equity的{100 - self.config.get('trading', {}).get('reserve_percent', 10)}%, 則不可開倉或加倉
-  各幣種的isolatedMargin不要超過 equity/幣種數量 
-- PARTIAL_CLOSE 為減倉, 只用來確保利潤,不用來減少損失 , 需帶入reduce_percent
-  1) 請先把position物件內的 pnl_percent除以leverage (pnl_percent/leverage) 
-     得到的數字超過 {self.config.get('risk', {}).get('reduce_if_over', 10)}% 再考慮PARTIAL_CLOSE
-  2) 不可以連續三次PARTIAL_CLOSE,若判斷反轉請直接CLOSE
-  3) PARTIAL_CLOSE 每次設置5-20%,根據情況判斷
-- 若技術分析結果與市場情況相反,造成倉位浮虧的時候:
-  請先把position物件內的 pnl_percent除以leverage (pnl_percent/leverage) 
-  得到的數字(絕對值)超過 {self.config.get('risk', {}).get('position_tolerance', 10)}% 再考慮停損
-
-#額外說明
--不要頻繁開倉關倉,有足夠信心再給開倉信號
--若同方向連勝且多週期一致 ⇒ 可**小幅加槓桿/加倉**
--回傳的symbol不要有斜線 , 例如 ETH/USDT -> ETHUSDT
--不要只做多
-
-#当前时间
-{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-#市场资料 JSON（请据此做判断）
-{payload_json}
-""".strip()
+    def build_multi_symbol_analysis_prompt_json_bytes(
+        self,
+        all_symbols_data: Dict[str, Any],
+        account_summary: Optional[Dict[str, Any]] = None,
+        decision_history: Optional[List[Dict[str, Any]]] = None,
+        now: Optional[str] = None,
+    ) -> bytes:
+        """
+        与 build_multi_symbol_analysis_prompt_json 内容相同，直接回传 UTF-8 bytes
+        （片段本来就是 bytes，写档、算杂凑或以 bytes 计长度时不必再 decode/encode 一轮）。
+        """
+        buf = bytearray()
+        self.build_multi_symbol_analysis_prompt_json_streaming(
+            all_symbols_data, account_summary, decision_history, now=now, write=buf.extend
+        )
+        return bytes(buf)
 
-        return prompt
+    def build_multi_symbol_analysis_prompt_json_streaming(
+        self,
+        all_symbols_data: Dict[str, Any],
+        account_summary: Optional[Dict[str, Any]] = None,
+        decision_history: Optional[List[Dict[str, Any]]] = None,
+        now: Optional[str] = None,
+        *,
+        write: Callable[[bytes], Any],
+    ) -> None:
+        """
+        与 build_multi_symbol_analysis_prompt_json 内容相同，但依序把 UTF-8 片段交给 write
+        （bytearray.extend、档案 / socket 的 write 等），同一时间只有一个币种的 dict 存活。
+        """
+        # 同一个时间戳供 meta.now 与「#当前时间」使用，两者不会再差几微秒
+        now_str = now or self._now_str()
+        # 静态提示词已在 __init__ 组好，这里只接上时间与 JSON
+        write(self._prompt_head_bytes)
+        write(now_str.encode())
+        write(_PAYLOAD_HEADER)
+        self._write_payload_json(write, all_symbols_data, account_summary, decision_history, now_str)
 
     # （保留：仅在需要时使用）
     def _format_account_summary(self, account_summary: Dict[str, Any]) -> str:
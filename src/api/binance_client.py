@@ -5,19 +5,20 @@ import os
 import time
 import hmac
 import hashlib
-import requests
 from typing import Optional, Dict, Any
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
 from typing import Optional, Dict, Any
 from functools import lru_cache
 from src.utils.logger import get_logger
+from src.utils.http_pool import mount_pool, pooled_session
 
 class BinanceClient:
     """Binance API客户端封装"""
     
     def __init__(self, api_key: Optional[str] = None, 
-                 api_secret: Optional[str] = None, timeout: int = 30):
+                 api_secret: Optional[str] = None, timeout: int = 30,
+                 pool_maxsize: int = 32):
         """
         初始化Binance客户端（正式网）
         
@@ -25,8 +26,8 @@ class BinanceClient:
             api_key: API密钥（默认从环境变量读取 BINANCE_API_KEY）
             api_secret: API密钥Secret（默认从环境变量读取 BINANCE_SECRET）
             timeout: 请求超时时间（秒）
+            pool_maxsize: 每个主机保留的 keep-alive 连线数（多币种并行请求时按币种数放大）
         """
-        print(api_key)
         self.log = get_logger("binance_client")  # 專用交易 logger
         self.api_key = api_key
         self.api_secret = api_secret
@@ -48,6 +49,15 @@ class BinanceClient:
         except Exception as e:
             self.log.info(f"❌ 初始化Binance客户端失败: {e}")
             raise
+
+        # python-binance 的 session 带 JSON Content-Type 与 API key 标头，只加大其连线池；
+        # 本类别自己发的 REST 请求（表单 POST）另用一个不带预设标头的连线池 session
+        mount_pool(self.client.session, pool_maxsize)
+        self._http = pooled_session(pool_maxsize)
+
+        # exchangeInfo 整包快取：(monotonic ts, {symbol: SymbolFilters})；交易规则很少变动
+        self.filters_ttl = 3600.0
+        self._filters_cache: Optional[tuple] = None
     
     def _coin_margin_request(self, method: str, endpoint: str, params: dict = None, signed: bool = True) -> dict:
         """
@@ -83,9 +93,9 @@ class BinanceClient:
         
         try:
             if method == 'GET':
-                response = requests.get(url, params=params, headers=headers, timeout=self.timeout)
+                response = self._http.get(url, params=params, headers=headers, timeout=self.timeout)
             else:
-                response = requests.post(url, data=params, headers=headers, timeout=self.timeout)
+                response = self._http.post(url, data=params, headers=headers, timeout=self.timeout)
             
             response.raise_for_status()
             return response.json()
@@ -376,35 +386,28 @@ class BinanceClient:
         Returns:
             创建的订单列表
         """
-        orders = []
-        try:
-            # 设置止盈
-            if take_profit_price:
-                tp_order = self.client.futures_create_order(
-                    symbol=symbol,
-                    side='SELL' if side == 'BUY' else 'BUY',
-                    type='TAKE_PROFIT_MARKET',  # 止盈市价单
-                    stopPrice=take_profit_price,
-                    closePosition=True
-                )
-                orders.append(tp_order)
-            
-            # 设置止损
-            if stop_loss_price:
-                sl_order = self.client.futures_create_order(
-                    symbol=symbol,
-                    side='SELL' if side == 'BUY' else 'BUY',
-                    type='STOP_MARKET',  # 止损市价单
-                    stopPrice=stop_loss_price,
-                    closePosition=True
-                )
-                orders.append(sl_order)
-            
-            return orders
-            
-        except BinanceAPIException as e:
-            self.log.info(f"⚠️ 设置止盈止损失败 {symbol}: {e} tp: {take_profit_price} sl: {stop_loss_price}")
-            raise
+        close_side = 'SELL' if side == 'BUY' else 'BUY'
+        specs = []
+        # 设置止盈
+        if take_profit_price:
+            specs.append(dict(symbol=symbol, side=close_side, type='TAKE_PROFIT_MARKET',  # 止盈市价单
+                              stopPrice=take_profit_price, closePosition=True))
+        # 设置止损
+        if stop_loss_price:
+            specs.append(dict(symbol=symbol, side=close_side, type='STOP_MARKET',  # 止损市价单
+                              stopPrice=stop_loss_price, closePosition=True))
+        # closePosition 单逐笔走 POST /fapi/v1/order：batchOrders 不支援 closePosition（且要求 quantity）
+        # 两笔各自下单，止盈被拒时止损照样挂上；有任何一笔失败，下完后抛出第一个错误
+        orders, error = [], None
+        for spec in specs:
+            try:
+                orders.append(self.client.futures_create_order(**spec))
+            except BinanceAPIException as e:
+                self.log.info(f"⚠️ 设置止盈止损失败 {symbol}: {e} tp: {take_profit_price} sl: {stop_loss_price}")
+                error = error or e
+        if error is not None:
+            raise error
+        return orders
     
     # ==================== 查询订单 ====================
     
@@ -456,14 +459,23 @@ class BinanceClient:
         取消所有「會關倉」的條件單（TP/SL/STOP/TAKE_PROFIT）。
         回傳取消數量。
         """
-        targets = self.list_close_orders(symbol)
+        ids = [o["orderId"] for o in self.list_close_orders(symbol)]
         cnt = 0
-        for o in targets:
+        # DELETE /fapi/v1/batchOrders 一次最多撤 10 笔，取代逐笔撤单
+        for i in range(0, len(ids), 10):
+            chunk = ids[i:i + 10]
             try:
-                self.client.futures_cancel_order(symbol=symbol, orderId=o["orderId"])
-                cnt += 1
+                results = self.client.futures_cancel_orders(
+                    symbol=symbol, orderIdList="[" + ",".join(map(str, chunk)) + "]"
+                )
             except BinanceAPIException as e:
-                self.log.info(f"⚠️ 取消關倉單失敗 {symbol} #{o.get('orderId')}: {e}")
+                self.log.info(f"⚠️ 取消關倉單失敗 {symbol} #{chunk}: {e}")
+                continue
+            for r in results:
+                if 'code' in r:
+                    self.log.info(f"⚠️ 取消關倉單失敗 {symbol}: {r}")
+                else:
+                    cnt += 1
         if cnt:
             self.log.info(f"🧹 已清除 {symbol} 舊 TP/SL/STOP 類單 {cnt} 筆")
         return cnt
@@ -486,6 +498,21 @@ class BinanceClient:
             self.log.info(f"⚠️ 连接测试失败: {e}")
             return False
 
+    def get_all_symbol_filters(self) -> Dict[str, Any]:
+        """
+        一次 futures_exchange_info() 取回所有交易对的 SymbolFilters：{symbol: SymbolFilters}
+        结果快取 filters_ttl 秒，期间不再打 exchangeInfo
+        """
+        now = time.monotonic()
+        hit = self._filters_cache
+        if hit is not None and now - hit[0] < self.filters_ttl:
+            return hit[1]
+        from src.utils.symbol_filters import SymbolFilters
+        info = self.client.futures_exchange_info()  # dict with "symbols": [...]
+        filters = {s["symbol"]: SymbolFilters(s) for s in info.get("symbols", []) if s.get("symbol")}
+        self._filters_cache = (now, filters)
+        return filters
+
     @lru_cache(maxsize=256)
     def get_symbol_filters(self, symbol: str):
         """
@@ -494,18 +521,16 @@ class BinanceClient:
         Cached to avoid repeated calls.
         """
         try:
-            info = self.client.futures_exchange_info()  # dict with "symbols": [...]
-            symbols = info.get("symbols", [])
-            target = next((s for s in symbols if s.get("symbol") == symbol), None)
-            if not target:
-                # Fallback: direct REST call to /fapi/v1/exchangeInfo?symbol=...
-                import requests, time
-                url = f"{self.base_url}/fapi/v1/exchangeInfo"
-                resp = requests.get(url, params={"symbol": symbol}, timeout=self.timeout)
-                resp.raise_for_status()
-                data = resp.json()
-                syms = data.get("symbols", [])
-                target = syms[0] if syms else None
+            cached = self.get_all_symbol_filters().get(symbol)
+            if cached is not None:
+                return cached
+            # Fallback: direct REST call to /fapi/v1/exchangeInfo?symbol=...
+            url = f"{self.base_url}/fapi/v1/exchangeInfo"
+            resp = self._http.get(url, params={"symbol": symbol}, timeout=self.timeout)
+            resp.raise_for_status()
+            data = resp.json()
+            syms = data.get("symbols", [])
+            target = syms[0] if syms else None
 
             if not target:
                 raise ValueError(f"Symbol {symbol} not found in exchange info")
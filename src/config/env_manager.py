@@ -3,12 +3,19 @@
 负责加载和管理环境变量
 """
 import os
+from functools import lru_cache
 from typing import Tuple, Optional
 from dotenv import load_dotenv
 
 
 class EnvManager:
     """环境变量管理器"""
+
+    # 环境变量载入后就不再变动：以下 getter 各自快取结果（load_env_file 会清掉重读）
+    _CACHED = (
+        "get_api_credentials", "get_api_credentials_hedge", "get_deepseek_key",
+        "get_discord_webhook_url", "get_discord_account_tag", "is_hedge_enabled",
+    )
     
     @staticmethod
     def load_env_file(file_path: str = '.env') -> bool:
@@ -23,12 +30,14 @@ class EnvManager:
         """
         if os.path.exists(file_path):
             load_dotenv(file_path)
+            EnvManager.clear_cache()  # 新载入的值要让下一次 get_* 读到
             return True
         else:
             print(f"⚠️ 环境变量文件不存在: {file_path}")
             return False
     
     @staticmethod
+    @lru_cache(maxsize=1)
     def get_api_credentials() -> Tuple[Optional[str], Optional[str]]:
         """
         获取API凭证
@@ -46,6 +55,7 @@ class EnvManager:
         return api_key, api_secret
     
     @staticmethod
+    @lru_cache(maxsize=1)
     def get_api_credentials_hedge() -> Tuple[Optional[str], Optional[str]]:
         """
         获取API凭证
@@ -61,27 +71,37 @@ class EnvManager:
         
         return api_key, api_secret
     @staticmethod
+    @lru_cache(maxsize=1)
     def get_deepseek_key() -> Optional[str]:
         """获取DeepSeek API密钥"""
         return os.getenv('DEEPSEEK_API_KEY')
     
     @staticmethod
+    @lru_cache(maxsize=1)
     def get_discord_webhook_url() -> Optional[str]:
         """获取Discord webhook URL"""
         return os.getenv('DISCORD_WEBHOOK_URL')
     
     @staticmethod
+    @lru_cache(maxsize=1)
     def get_discord_account_tag() -> Optional[str]:
         """获取Discord账户标签，用于标识不同的交易账户"""
         return os.getenv('DISCORD_ACCOUNT_TAG')
 
     @staticmethod
+    @lru_cache(maxsize=1)
     def is_hedge_enabled() -> bool:
         """检查是否启用对冲功能"""
         value = os.getenv('HEDGE_ENABLED', 'false').lower()
         return value in ('true', '1', 'yes', 'on')
     
     
+    @classmethod
+    def clear_cache(cls) -> None:
+        """清掉 get_* / is_hedge_enabled 的快取（载入 .env 或程式内改了 os.environ 之后呼叫）"""
+        for fn in cls._CACHED:
+            getattr(cls, fn).cache_clear()
+
     @staticmethod
     def require_env(key: str, error_msg: str = None) -> str:
         """
@@ -1,6 +1,7 @@
 from __future__ import annotations
 from typing import Any, Dict, List, Optional
 import os
+import time
 
 from binance.client import Client
 
@@ -24,6 +25,10 @@ class AccountDataManager:
         if self.client is None:
             self.client = _client_from_env()
         self.futures = futures
+        # account snapshot: endpoint resolved on first success + short TTL cache
+        self.summary_ttl = 5.0
+        self._fetch_summary = None
+        self._summary_cache = None  # (expires_monotonic, summary)
 
     # -------------------- Public API used by main.py --------------------
 
@@ -35,56 +40,94 @@ class AccountDataManager:
           'total_unrealized_pnl': float,    # USDT-M unrealized PnL
           'margin_ratio': float             # % = totalMaintMargin / totalWalletBalance * 100
         }
+        The snapshot is cached for summary_ttl seconds; the futures endpoint that
+        worked last time is tried first, the others only if it fails. The spot
+        fallback is never remembered, so the futures endpoints are retried on
+        every refresh after a temporary outage.
         """
-        # 1) Prefer the project's wrapper: wrapper.get_account() → futures_account()
-        try:
-            if self.wrapper and hasattr(self.wrapper, "get_account"):
-                acct = self.wrapper.get_account() or {}
-                equity = float(acct.get("totalWalletBalance") or 0.0)
-                unreal = float(acct.get("totalUnrealizedProfit") or 0.0)
-                maint  = float(acct.get("totalMaintMargin") or 0.0)
-                availableBalance = float(acct.get("availableBalance") or 0.0)
-                margin_ratio = (maint / equity * 100.0) if equity > 0 else 0.0
-                return {
-                    "equity": equity,
-                    "total_unrealized_pnl": unreal,
-                    "margin_ratio": margin_ratio,
-                    "available_balance" : availableBalance
-                }
-        except Exception:
-            pass
+        now = time.monotonic()
+        cached = self._summary_cache
+        if cached is not None and cached[0] > now:
+            return dict(cached[1])
 
-        # 2) Fall back to raw python-binance futures endpoints
-        try:
-            acct = self.client.futures_account()
-            equity = float(acct.get("totalWalletBalance") or acct.get("totalMarginBalance") or 0.0)
-            unreal = float(acct.get("totalUnrealizedProfit") or 0.0)
-            maint  = float(acct.get("totalMaintMargin") or 0.0)
-            availableBalance = float(acct.get("availableBalance") or 0.0)
-            margin_ratio = (maint / equity * 100.0) if equity > 0 else 0.0
-            return {
-                "equity": equity,
-                "total_unrealized_pnl": unreal,
-                "margin_ratio": margin_ratio,
-                "available_balance" : availableBalance
-            }
-        except Exception:
-            pass
+        summary = None
+        failed = self._fetch_summary
+        if failed is not None:
+            try:
+                summary = self._fetch_summary()
+                failed = None
+            except Exception:
+                self._fetch_summary = None  # endpoint stopped working → probe the others
+
+        if summary is None:
+            for fetch in self._summary_fetchers():
+                if fetch == failed:
+                    continue
+                try:
+                    summary = fetch()
+                except Exception:
+                    continue
+                if fetch != self._fetch_summary_spot:
+                    self._fetch_summary = fetch
+                break
+            else:
+                return {}
+
+        self._summary_cache = (now + self.summary_ttl, summary)
+        return dict(summary)
+
+    def invalidate_summary(self) -> None:
+        """Drop the cached snapshot (e.g. right after placing orders)."""
+        self._summary_cache = None
 
+    def _summary_fetchers(self):
+        # 1) Prefer the project's wrapper: wrapper.get_account() → futures_account()
+        if self.wrapper and hasattr(self.wrapper, "get_account"):
+            yield self._fetch_summary_wrapper
+        # 2) Fall back to raw python-binance futures endpoints
+        yield self._fetch_summary_futures
         # 3) Spot fallback (very rough; used only if futures endpoints unavailable)
-        try:
-            acct = self.client.get_account()
-            balances = acct.get("balances", [])
-            usdt = next((b for b in balances if b.get("asset") == "USDT"), None)
-            free = float(usdt["free"]) if usdt else 0.0
-            locked = float(usdt["locked"]) if usdt else 0.0
-            return {
-                "equity": free + locked,
-                "total_unrealized_pnl": 0.0,
-                "margin_ratio": 0.0,
-            }
-        except Exception:
-            return {}
+        yield self._fetch_summary_spot
+
+    def _fetch_summary_wrapper(self) -> dict:
+        acct = self.wrapper.get_account() or {}
+        equity = float(acct.get("totalWalletBalance") or 0.0)
+        unreal = float(acct.get("totalUnrealizedProfit") or 0.0)
+        maint  = float(acct.get("totalMaintMargin") or 0.0)
+        availableBalance = float(acct.get("availableBalance") or 0.0)
+        margin_ratio = (maint / equity * 100.0) if equity > 0 else 0.0
+        return {
+            "equity": equity,
+            "total_unrealized_pnl": unreal,
+            "margin_ratio": margin_ratio,
+            "available_balance" : availableBalance
+        }
+
+    def _fetch_summary_futures(self) -> dict:
+        acct = self.client.futures_account()
+        equity = float(acct.get("totalWalletBalance") or acct.get("totalMarginBalance") or 0.0)
+        unreal = float(acct.get("totalUnrealizedProfit") or 0.0)
+        maint  = float(acct.get("totalMaintMargin") or 0.0)
+        availableBalance = float(acct.get("availableBalance") or 0.0)
+        margin_ratio = (maint / equity * 100.0) if equity > 0 else 0.0
+        return {
+            "equity": equity,
+            "total_unrealized_pnl": unreal,
+            "margin_ratio": margin_ratio,
+            "available_balance" : availableBalance
+        }
+
+    def _fetch_summary_spot(self) -> dict:
+        acct = self.client.get_account()
+        balances = acct.get("balances", [])
+        usdt = next((b for b in balances if b.get("asset") == "USDT"), None)
+        free = float(usdt["free"]) if usdt else 0.0
+        locked = float(usdt["locked"]) if usdt else 0.0
+        return {
+            "equity": free + locked,
+            "total_unrealized_pnl": 0.0,
+            "margin_ratio": 0.0,
+        }
 
     # Optional helpers (may be handy later)
 
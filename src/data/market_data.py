@@ -1,15 +1,76 @@
 # at top
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
 import pandas as pd
 
-from src.utils.indicators import (
-    calculate_rsi,
-    calculate_macd,
-    calculate_ema,
-    calculate_atr,
-    calculate_sma,
-    calculate_bollinger_bands,
+from src.utils.indicators_nb import (
+    HAS_NUMBA,
+    indicators_tail,
+    ema_last,
+    rsi_wilder_last,
+    macd_last,
+    atr_wilder_last,
+    sma_std_last,
 )
+from src.utils.indicators import calculate_atr
+
+_KLINE_COLS = [
+    "open_time","open","high","low","close","volume",
+    "close_time","quote_volume","num_trades",
+    "taker_buy_base","taker_buy_quote","ignore",
+]
+_OHLCV_COLS = ["open","high","low","close","volume"]
+
+_ZERO_INDICATORS = {
+    "RSI": 0.0, "MACD": 0.0, "EMA20": 0.0, "EMA50": 0.0,
+    "SMA20": 0.0, "SMA50": 0.0, "BOLL_UP": 0.0, "BOLL_MID": 0.0,
+    "BOLL_LOW": 0.0, "ATR": 0.0,
+    # snake_case the prompt expects:
+    "rsi": 0.0, "macd": 0.0, "macd_signal": 0.0, "macd_histogram": 0.0,
+    "ema_20": 0.0, "ema_50": 0.0, "sma_20": 0.0, "sma_50": 0.0,
+    "bollinger_middle": 0.0, "bollinger_upper": 0.0, "bollinger_lower": 0.0,
+    "atr_14": 0.0,
+}
+
+# 各 interval 抓 K 线 + 算指标共用的执行绪池（I/O 为主，HTTP 等待时会释放 GIL）
+_FETCH_POOL: Optional[ThreadPoolExecutor] = None
+_FETCH_POOL_LOCK = threading.Lock()
+
+
+def _fetch_pool() -> ThreadPoolExecutor:
+    # 丢进来的工作只做单次请求/计算，不可再等待本池的其他 future（避免池满互等）
+    global _FETCH_POOL
+    if _FETCH_POOL is None:
+        with _FETCH_POOL_LOCK:
+            if _FETCH_POOL is None:
+                _FETCH_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="market-data")
+    return _FETCH_POOL
+
+
+# 资金费率 8 小时才结算一次、持仓量几分钟才明显变化：每个 symbol 快取一段时间，不必每个 tick 都打 API
+_FUNDING_TTL = 300.0
+_OI_TTL = 60.0
+_FUNDING_CACHE: dict = {}  # symbol -> (expires_monotonic, value)
+_OI_CACHE: dict = {}
+_TTL_LOCK = threading.Lock()
+_MISS = object()
+
+
+def _ttl_get(cache: dict, symbol: str):
+    hit = cache.get(symbol)
+    if hit is not None and hit[0] > time.monotonic():
+        return hit[1]
+    return _MISS
+
+
+def _ttl_put(cache: dict, symbol: str, value, ttl: float) -> None:
+    with _TTL_LOCK:
+        cache[symbol] = (time.monotonic() + ttl, value)
+
 
 class MarketDataManager:
     def __init__(self, client, *_, **__):
@@ -23,9 +84,22 @@ class MarketDataManager:
         symbol = symbol.upper()
         out = {"symbol": symbol, "timestamp": int(time.time() * 1000)}
 
+        # 五个端点互不相依：先同时送出，再依原顺序解析（总耗时≈最慢的一个请求）
+        pool = _fetch_pool()
+        # 以 lambda 包起来：方法不存在时的 AttributeError 也留到下方各自的 try 里处理
+        f_ticker = pool.submit(lambda: self.wrapper.get_ticker(symbol))  # <- wrapper method
+        f_book = pool.submit(self._book_ticker, symbol)
+        f_mark = pool.submit(lambda: self.client.futures_mark_price(symbol=symbol))
+        funding = _ttl_get(_FUNDING_CACHE, symbol)
+        oi_val = _ttl_get(_OI_CACHE, symbol)
+        if funding is _MISS:
+            f_funding = pool.submit(lambda: self.wrapper.get_funding_rate(symbol))
+        if oi_val is _MISS:
+            f_oi = pool.submit(lambda: self.wrapper.get_open_interest(symbol))
+
         # 24h ticker / last price via wrapper (futures)
         try:
-            t = self.wrapper.get_ticker(symbol)  # <- wrapper method
+            t = f_ticker.result()
             # last price can be 'lastPrice' or 'price'
             lp = t.get("lastPrice") or t.get("price") or "0"
             out["price"] = float(lp)
@@ -43,12 +117,7 @@ class MarketDataManager:
 
         # bid/ask — try futures book-ticker names that differ across versions
         try:
-            if hasattr(self.client, "futures_orderbook_ticker"):
-                oba = self.client.futures_orderbook_ticker(symbol=symbol)
-            elif hasattr(self.client, "futures_book_ticker"):
-                oba = self.client.futures_book_ticker(symbol=symbol)
-            else:
-                oba = self.client.get_orderbook_ticker(symbol=symbol)  # fallback spot
+            oba = f_book.result()
             out["bid"] = float(oba["bidPrice"])
             out["ask"] = float(oba["askPrice"])
         except Exception:
@@ -58,84 +127,140 @@ class MarketDataManager:
 
         # mark price & funding rate (wrapper helpers)
         try:
-            mp = self.client.futures_mark_price(symbol=symbol)
+            mp = f_mark.result()
             out["mark_price"] = float(mp["markPrice"])
         except Exception:
             out["mark_price"] = out.get("price", 0.0)
 
-        try:
-            fr = self.wrapper.get_funding_rate(symbol)
-            out["funding_rate"] = float(fr) if fr is not None else 0.0
-        except Exception:
-            out["funding_rate"] = 0.0
+        if funding is not _MISS:
+            out["funding_rate"] = funding
+        else:
+            try:
+                fr = f_funding.result()
+                out["funding_rate"] = float(fr) if fr is not None else 0.0
+                _ttl_put(_FUNDING_CACHE, symbol, out["funding_rate"], _FUNDING_TTL)
+            except Exception:
+                out["funding_rate"] = 0.0  # 失败不写快取，下个 tick 重试
 
         # optional: open interest via wrapper
-        try:
-            oi = self.wrapper.get_open_interest(symbol)
-            out["open_interest"] = float(oi) if oi is not None else None
-        except Exception:
-            pass
+        if oi_val is not _MISS:
+            out["open_interest"] = oi_val
+        else:
+            try:
+                oi = f_oi.result()
+                out["open_interest"] = float(oi) if oi is not None else None
+                _ttl_put(_OI_CACHE, symbol, out["open_interest"], _OI_TTL)
+            except Exception:
+                pass
 
         return out
 
-    # ---------- multi timeframe (use wrapper.get_klines) ----------
-    def get_multi_timeframe_data(self, symbol: str, intervals, limit: int = 200) -> dict:
+    def warm_slow_caches(self, symbol: str, until: float) -> None:
+        """
+        预先抓好在 until（monotonic 时间）之前会过期的资金费率 / 持仓量快取，
+        供主循环在等待下个周期时呼叫；失败不写快取，由下个周期照常重抓
+        """
         symbol = symbol.upper()
-        data = {}
-        for iv in intervals:
+        hit = _FUNDING_CACHE.get(symbol)
+        if hit is None or hit[0] <= until:
+            try:
+                fr = self.wrapper.get_funding_rate(symbol)
+                _ttl_put(_FUNDING_CACHE, symbol, float(fr) if fr is not None else 0.0, _FUNDING_TTL)
+            except Exception:
+                pass
+        hit = _OI_CACHE.get(symbol)
+        if hit is None or hit[0] <= until:
             try:
-                rows = self.wrapper.get_klines(symbol, iv, limit)
-                cols = [
-                    "open_time","open","high","low","close","volume",
-                    "close_time","quote_volume","num_trades",
-                    "taker_buy_base","taker_buy_quote","ignore",
-                ]
-                import pandas as pd
-                df = pd.DataFrame(rows, columns=cols)
-                for c in ("open","high","low","close","volume"):
-                    df[c] = pd.to_numeric(df[c], errors="coerce")
-
-                inds = self._compute_indicators(df)
-                kl = [
-                    {"t": int(r[0]), "o": float(r[1]), "h": float(r[2]),
-                    "l": float(r[3]), "c": float(r[4]), "v": float(r[5])}
-                    for r in rows
-                ]
-                # include dataframe for prompt_builder to pretty-print K lines
-                data[iv] = {"klines": kl, "indicators": inds, "dataframe": df[["open","high","low","close","volume"]]}
+                oi = self.wrapper.get_open_interest(symbol)
+                _ttl_put(_OI_CACHE, symbol, float(oi) if oi is not None else None, _OI_TTL)
             except Exception:
-                data[iv] = {"klines": [], "indicators": zeros, "dataframe": None}
-        return data
+                pass
+
+    def _book_ticker(self, symbol: str) -> dict:
+        """bid/ask — try futures book-ticker names that differ across versions"""
+        if hasattr(self.client, "futures_orderbook_ticker"):
+            return self.client.futures_orderbook_ticker(symbol=symbol)
+        if hasattr(self.client, "futures_book_ticker"):
+            return self.client.futures_book_ticker(symbol=symbol)
+        return self.client.get_orderbook_ticker(symbol=symbol)  # fallback spot
+
+    # ---------- multi timeframe (use wrapper.get_klines) ----------
+    def get_multi_timeframe_data(self, symbol: str, intervals, limit: int = 200) -> dict:
+        symbol = symbol.upper()
+        intervals = list(intervals)
+        if len(intervals) <= 1:
+            return {iv: self._fetch_and_compute(symbol, iv, limit) for iv in intervals}
+        # 各 interval 同时发请求，总耗时≈最慢的一个；结果仍依 intervals 顺序
+        pool = _fetch_pool()
+        futs = {iv: pool.submit(self._fetch_and_compute, symbol, iv, limit) for iv in intervals}
+        return {iv: f.result() for iv, f in futs.items()}
+
+    def _fetch_and_compute(self, symbol: str, iv: str, limit: int) -> dict:
+        """抓单一 interval 的 K 线并算指标；失败时回传全 0 指标（不影响其他 interval）"""
+        try:
+            rows = self.wrapper.get_klines(symbol, iv, limit)
+            ohlcv, df = self._ohlcv_frame(rows)
+
+            inds = self._compute_indicators(df)
+            # 下游只读 dataframe / indicators，不再另建每根 K 线一个 dict 的 klines 清单
+            # ohlcv：(5, N) float64，每列依 _OHLCV_COLS 顺序且各自连续，PromptBuilder 直接取用，不经 pandas
+            return {"indicators": inds, "dataframe": df, "ohlcv": ohlcv}
+        except Exception:
+            return {"indicators": dict(_ZERO_INDICATORS), "dataframe": None, "ohlcv": None}
+
+    @staticmethod
+    def _ohlcv_frame(rows):
+        """
+        K 线 rows → (ohlcv, df)
+        ohlcv 为 (5, N) float64 阵列（列依 open/high/low/close/volume），df 为同内容的 DataFrame
+        """
+        if not rows:
+            return np.empty((5, 0)), pd.DataFrame(columns=_OHLCV_COLS, dtype=np.float64)
+        try:
+            # 一次把 5 栏字串转成 float64，不建 12 栏的宽表再逐栏 to_numeric
+            ohlcv = np.array(rows, dtype=object)[:, 1:6].astype(np.float64).T.copy()
+            return ohlcv, pd.DataFrame(ohlcv.T, columns=_OHLCV_COLS)
+        except (ValueError, TypeError):
+            # 有无法解析的值时维持原本 coerce → NaN 的行为
+            df = pd.DataFrame(rows, columns=_KLINE_COLS)[_OHLCV_COLS]
+            df = df.apply(pd.to_numeric, errors="coerce")
+            return df.to_numpy(dtype=np.float64).T.copy(), df
 
     def _compute_indicators(self, df: pd.DataFrame) -> dict:
-        zeros = {
-            "RSI": 0.0, "MACD": 0.0, "EMA20": 0.0, "EMA50": 0.0,
-            "SMA20": 0.0, "SMA50": 0.0, "BOLL_UP": 0.0, "BOLL_MID": 0.0,
-            "BOLL_LOW": 0.0, "ATR": 0.0,
-            # snake_case the prompt expects:
-            "rsi": 0.0, "macd": 0.0, "macd_signal": 0.0, "macd_histogram": 0.0,
-            "ema_20": 0.0, "ema_50": 0.0, "sma_20": 0.0, "sma_50": 0.0,
-            "bollinger_middle": 0.0, "bollinger_upper": 0.0, "bollinger_lower": 0.0,
-            "atr_14": 0.0,
-        }
+        zeros = dict(_ZERO_INDICATORS)
         if df.empty:
             return zeros
 
+        # 提示词用的指标序列尾端，抓 K 线时顺便算好，PromptBuilder 只需四舍五入
+        tails = self._prompt_tails(df)
+        if tails is not None:
+            zeros["prompt_tails"] = tails
+
         close = pd.to_numeric(df["close"], errors="coerce").dropna()
         high  = pd.to_numeric(df["high"],  errors="coerce").dropna()
         low   = pd.to_numeric(df["low"],   errors="coerce").dropna()
         if len(close) < 50 or len(high) < 15 or len(low) < 15:
             return zeros
 
-        # compute via project helpers
-        rsi = calculate_rsi(close, 14)
-        macd_line, macd_signal, macd_hist = calculate_macd(close, 12, 26, 9)
-        ema20 = calculate_ema(close, 20)
-        ema50 = calculate_ema(close, 50)
-        sma20 = calculate_sma(close, 20)
-        sma50 = calculate_sma(close, 50)
-        mid, up, lowb = calculate_bollinger_bands(close, 20, 2.0)
-        atr = calculate_atr(high, low, close, 14)
+        # 只要最后一个值：单趟 kernel 直接回传 float，不建整条 pandas Series
+        # （结果同 calculate_*；无 numba 时以纯 Python 执行，仍比 pandas 快）
+        c = np.ascontiguousarray(close.to_numpy(dtype=np.float64))
+        rsi = rsi_wilder_last(c, 14)
+        macd_line, macd_signal, macd_hist = macd_last(c, 12, 26, 9)
+        ema20 = ema_last(c, 20)
+        ema50 = ema_last(c, 50)
+        sma20, std20 = sma_std_last(c, 20)
+        sma50, _ = sma_std_last(c, 50)
+        mid, up, lowb = sma20, sma20 + 2.0 * std20, sma20 - 2.0 * std20
+        if high.index.equals(close.index) and low.index.equals(close.index):
+            atr = atr_wilder_last(
+                np.ascontiguousarray(high.to_numpy(dtype=np.float64)),
+                np.ascontiguousarray(low.to_numpy(dtype=np.float64)),
+                c, 14,
+            )
+        else:
+            # 三栏缺值位置不同时，保留 pandas 依索引对齐的 TR 算法
+            atr = calculate_atr(high, low, close, 14)
 
         def nz(x): 
             try:
@@ -171,4 +296,24 @@ class MarketDataManager:
             "bollinger_lower": nz(lowb),
             "atr_14": nz(atr),
         }
-        return out
\ No newline at end of file
+        if tails is not None:
+            out["prompt_tails"] = tails
+        return out
+
+    @staticmethod
+    def _prompt_tails(df: pd.DataFrame):
+        """
+        最近 10 个 RSI / MACD / 柱状图 / K / D / J / BOLL 上中下轨（旧→新、未四舍五入），
+        即 src.utils.indicators_nb.indicators_tail 的输出。
+        需 numba 且至少 30 根 K 线；否则返回 None，由 PromptBuilder 自行计算。
+        """
+        if not HAS_NUMBA or len(df) < 30:
+            return None
+        try:
+            h, l, c = (
+                np.ascontiguousarray(df[col].to_numpy(dtype=np.float64))
+                for col in ("high", "low", "close")
+            )
+            return indicators_tail(h, l, c, 10, 9, 20)
+        except Exception:
+            return None
\ No newline at end of file
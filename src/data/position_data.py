@@ -1,16 +1,23 @@
 # src/data/position_data.py
 from __future__ import annotations
 
-import json
 import os
 import pathlib
+import sqlite3
+import sys
+import threading
 import time
-from dataclasses import dataclass, asdict
-from typing import Any, Dict, List, Optional
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
 from src.utils.logger import get_logger
+from src.utils.json_utils import dumps_bytes, iter_array, loads
+from src.utils.jit import HAS_NUMBA, njit
 
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     symbol: str               # e.g., "BTCUSDT"
     side: str                 # "LONG" | "SHORT"
@@ -29,6 +36,139 @@ class Position:
     take_profit: Optional[float] = None
     stop_loss: Optional[float] = None
 
+    def to_dict(self) -> Dict[str, Any]:
+        """对外（main.py / prompt）用的持仓 dict"""
+        return {
+            "symbol": self.symbol,
+            "side": self.side,
+            "positionAmt": self.positionAmt,
+            "entry_price": self.entry_price,
+            "mark_price": self.mark_price,
+            "leverage": self.leverage,
+            "unrealized_pnl": self.unrealized_pnl,
+            "pnl_percent": self.pnl_percent,
+            "isolatedMargin": self.isolatedMargin,
+            "liq_price": self.liq_price,
+            "isolated": self.isolated,
+            "opened_at": self.opened_at,
+            "meta": self.meta,
+            "take_profit": self.take_profit,
+            "stop_loss": self.stop_loss,
+        }
+
+
+def _pos_to_row(p: Position) -> Dict[str, Any]:
+    """Position → positions.json 的一列（栏位顺序同 asdict）；meta 直接沿用参照，不像 asdict 整份深拷贝"""
+    return {
+        "symbol": p.symbol,
+        "side": p.side,
+        "positionAmt": p.positionAmt,
+        "isolatedMargin": p.isolatedMargin,
+        "entry_price": p.entry_price,
+        "mark_price": p.mark_price,
+        "leverage": p.leverage,
+        "unrealized_pnl": p.unrealized_pnl,
+        "pnl_percent": p.pnl_percent,
+        "liq_price": p.liq_price,
+        "isolated": p.isolated,
+        "opened_at": p.opened_at,
+        "meta": p.meta,
+        "take_profit": p.take_profit,
+        "stop_loss": p.stop_loss,
+    }
+
+@njit(cache=True)
+def _position_math(amt: np.ndarray, upnl: np.ndarray, iso: np.ndarray):
+    """
+    批次持仓数值：方向（True=LONG）、仓位大小 |amt|、pnl%（upnl / isolatedMargin * 100）
+    全仓部位 isolatedMargin 为 0，pnl% 给 0.0，不让单笔除零拖垮整批
+    """
+    n = amt.shape[0]
+    is_long = np.empty(n, dtype=np.bool_)
+    size = np.empty(n, dtype=np.float64)
+    pnl_pct = np.empty(n, dtype=np.float64)
+    for i in range(n):
+        a = amt[i]
+        is_long[i] = a > 0
+        size[i] = abs(a)
+        m = iso[i]
+        pnl_pct[i] = (upnl[i] / m) * 100 if m != 0.0 else 0.0
+    return is_long, size, pnl_pct
+
+
+def _position_math_np(amt: np.ndarray, upnl: np.ndarray, iso: np.ndarray):
+    """_position_math 的 NumPy 向量化版本（未安装 numba 时使用），结果相同"""
+    pnl_pct = np.zeros_like(upnl)
+    np.divide(upnl, iso, out=pnl_pct, where=iso != 0.0)  # isolatedMargin 为 0 的位置保持 0.0
+    pnl_pct *= 100
+    return amt > 0, np.abs(amt), pnl_pct
+
+
+if HAS_NUMBA:
+    # 启动时先编译（cache=True 时多半直接读磁碟快取），首次批次查询不必等 JIT
+    _position_math(np.zeros(1), np.zeros(1), np.ones(1))
+else:
+    # 纯 Python 跑逐笔回圈反而更慢，改用整批向量运算
+    _position_math = _position_math_np
+
+
+# 原始持仓列 → (amt, iso, upnl, entry, mark, lev, liq, isolated_flag)
+# 每个栏位：(候选键（依优先序）, 是否套 `or 0.0` 防 None/"", 转换)；键都不存在时取预设值
+_ROW_FIELDS = (
+    (("positionAmt",), False, "float", "0.0"),
+    (("isolatedMargin",), True, "float", "0.0"),
+    (("unRealizedProfit", "unrealizedProfit"), True, "float", "0.0"),
+    (("entryPrice",), True, "float", "0.0"),
+    (("markPrice", "markPriceAvg"), True, "float", "0.0"),
+    (("leverage",), True, "float", "0.0"),
+    (("liquidationPrice",), False, "", "None"),
+    (("isolated", "marginType"), False, "str", "''"),
+)
+
+_SYMBOLS: Dict[str, str] = {}
+
+
+def _sym(symbol: str) -> str:
+    """
+    symbol 正规化（大写）并 intern：同一个原始字串只 upper() 一次，
+    之后各处存放 / 查询的都是同一个 str 物件（dict 查找时 identity 比对即命中）
+    """
+    canon = _SYMBOLS.get(symbol)
+    if canon is None:
+        canon = _SYMBOLS[symbol] = sys.intern(symbol.upper())
+    return canon
+
+
+_EXTRACTORS: Dict[FrozenSet[str], Callable[[Dict[str, Any]], Tuple]] = {}
+
+
+def _row_extractor(d: Dict[str, Any]) -> Callable[[Dict[str, Any]], Tuple]:
+    """
+    依列的键集合（wrapper / python-binance 各自固定）产生专用的取值函式并快取：
+    d.get 的多层回退在产生时就决定好，热路径只剩直接取键与 float()。
+    产生的原始码只含 _ROW_FIELDS 内的固定键名，交易所回传的键不会进入 exec。
+    """
+    keys = frozenset(d)
+    fn = _EXTRACTORS.get(keys)
+    if fn is None:
+        exprs = []
+        for names, guard, conv, default in _ROW_FIELDS:
+            key = next((k for k in names if k in keys), None)
+            if key is None:
+                exprs.append(default)
+                continue
+            expr = f"d[{key!r}]"
+            if guard:
+                expr += " or 0.0"
+            exprs.append(f"{conv}({expr})" if conv else expr)
+        # float / str 绑成预设参数：产生的函式里是区域变数存取，不必每次查 builtins
+        src = "def _extract(d, float=float, str=str):\n    return (" + ", ".join(exprs) + ",)\n"
+        ns: Dict[str, Any] = {}
+        exec(src, ns)
+        fn = _EXTRACTORS[keys] = ns["_extract"]
+    return fn
+
+
 class PositionDataManager:
     """
     Futures-first position manager.
@@ -37,25 +177,130 @@ class PositionDataManager:
       (wrapper.get_position / wrapper.get_all_positions) when available.
     - Falls back to raw python-binance futures endpoints.
     - Also keeps a small JSON file for local persistence / debugging.
+      path（或环境变数 POS_STORE_PATH）以 .db / .sqlite 结尾时改用 SQLite：
+      upsert / close 只动一列，多个行程同时读写也安全。
     """
 
-    def __init__(self, client=None, path: str = "data/positions.json"):
+    _SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+    def __init__(self, client=None, path: Optional[str] = None):
         # keep both: the wrapper (repo class) and the raw python-binance client
         self.log = get_logger("debug")  # 專用交易 logger
         self.wrapper = client
         self.client = getattr(client, "client", client)
-        self.path = pathlib.Path(path)
+        self.path = pathlib.Path(path or os.getenv("POS_STORE_PATH") or "data/positions.json")
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        if not self.path.exists():
+        self._db: Optional[sqlite3.Connection] = None
+        # main 会从 I/O 执行绪池并行呼叫 get_current_position（会回退读本地存放区），读写存放区一律加锁
+        self._store_lock = threading.Lock()
+        # 已解析的档案内容 + 当时的 (mtime_ns, size)；档案没被外部改过就不重读重解析
+        self._cache_rows: Optional[List[Dict[str, Any]]] = None
+        self._cache_stamp: Optional[tuple] = None
+        # symbol(大写) -> row；跟着 _cache_rows 走（_index_src 记录索引是从哪一份 rows 建的）
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._index_src: Optional[List[Dict[str, Any]]] = None
+        self._last_bytes: Optional[bytes] = None  # 上次写入的档案内容，内容没变就不重写
+        if self.path.suffix.lower() in self._SQLITE_SUFFIXES:
+            self._db = self._open_db()
+        elif self._stamp() is None:  # 一次 stat；不存在才建空档
             self._write([])
+        # 交易所查询结果的短 TTL 快取（同一轮内重复查同一 symbol 不再打 API）
+        self._ttl = float(os.getenv("POS_CACHE_TTL", "1.0"))
+        self._pos_cache: Dict[str, tuple] = {}   # symbol -> (monotonic ts, Position | None)
+        self._all_cache: Optional[tuple] = None  # (monotonic ts, List[Position])
+
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        """清掉交易所查询快取（下单/平仓后呼叫）；symbol=None 时全部清掉"""
+        if symbol is None:
+            self._pos_cache.clear()
+        else:
+            self._pos_cache.pop(_sym(symbol), None)
+        self._all_cache = None
 
     # ----------------- storage helpers -----------------
 
+    def _open_db(self) -> sqlite3.Connection:
+        """
+        开启 SQLite 存放区（WAL：读写互不阻塞）。
+        表是空的而旁边还有旧的 positions.json 时，先把旧资料汇入一次（重复 symbol 取第一笔，同 JSON 版）。
+        """
+        db = sqlite3.connect(str(self.path), timeout=5.0, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS positions (symbol TEXT PRIMARY KEY, row BLOB NOT NULL)")
+        legacy = self.path.with_suffix(".json")
+        if db.execute("SELECT 1 FROM positions LIMIT 1").fetchone() is None:
+            try:
+                rows = loads(legacy.read_bytes())
+            except FileNotFoundError:
+                rows = []
+            if rows:
+                with db:
+                    db.executemany(
+                        "INSERT OR IGNORE INTO positions (symbol, row) VALUES (?, ?)",
+                        [(_sym(str(r.get("symbol", ""))), dumps_bytes(r, indent=False, default=str)) for r in rows],
+                    )
+                self.log.info(f"imported {len(rows)} rows from {legacy} into {self.path}")
+        return db
+
+    def _stamp(self) -> Optional[tuple]:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
     def _read(self) -> List[Dict[str, Any]]:
-        return json.loads(self.path.read_text(encoding="utf-8")) if self.path.exists() else []
+        stamp = self._stamp()
+        if stamp is None:
+            return []
+        if stamp != self._cache_stamp or self._cache_rows is None:
+            try:
+                data = self.path.read_bytes()
+            except FileNotFoundError:  # stat 之后才被删掉
+                return []
+            self._cache_rows = loads(data)
+            self._cache_stamp = stamp
+        return self._cache_rows
+
+    def _find_in_file(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """快取是冷的时，逐笔解析档案找 symbol，找到即停（重复时同样取第一笔）"""
+        try:
+            text = self.path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        for row in iter_array(text):
+            if _sym(str(row.get("symbol", ""))) is symbol:
+                return row
+        return None
+
+    def _rows_index(self) -> Dict[str, Dict[str, Any]]:
+        """symbol → row 索引；档案内容变了（_read 换了一份 rows）才重建"""
+        rows = self._read()
+        if rows is not self._index_src:
+            index: Dict[str, Dict[str, Any]] = {}
+            for row in rows:
+                index.setdefault(_sym(str(row.get("symbol", ""))), row)  # 重复时与线性扫描一样取第一笔
+            self._index = index
+            self._index_src = rows
+        return self._index
 
     def _write(self, rows: List[Dict[str, Any]]) -> None:
-        self.path.write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+        # meta 是交易所原样回传的 dict，万一夹了无法序列化的值就转成字串，不让整档写失败
+        data = dumps_bytes(rows, default=str)
+        if data == self._last_bytes and self._stamp() == self._cache_stamp:
+            # 内容与上次写入相同且档案没被外部动过：不必重写
+            self._cache_rows = rows
+            return
+        # 先写暂存档再 os.replace：中途崩溃也不会留下写一半的 positions.json
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb", buffering=1 << 16) as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+        self._last_bytes = data
+        # 刚写入的 rows 就是最新内容，记下写后的 stamp，下一次 _read 不必再读档
+        self._cache_rows = rows
+        self._cache_stamp = self._stamp()
 
     # ----------------- exchange fetchers -----------------
 
@@ -64,54 +309,115 @@ class PositionDataManager:
         Query the exchange for a single symbol's active position (size != 0).
         Prefer the repo wrapper; fallback to python-binance.
         """
-        symbol = symbol.upper()
+        symbol = _sym(symbol)
+        now = time.monotonic()
+        hit = self._pos_cache.get(symbol)
+        if hit is not None and now - hit[0] < self._ttl:
+            return hit[1]
 
         # 1) Try wrapper first
-        try:
-            if self.wrapper and hasattr(self.wrapper, "get_position"):
+        if self.wrapper and hasattr(self.wrapper, "get_position"):
+            try:
                 pos = self.wrapper.get_position(symbol)  # None or dict
-                if pos:
-                    return self._normalize_pos_dict(symbol, pos)
-        except Exception as e:
-            print(e)
-            return None
+                result = self._normalize_pos_dict(symbol, pos) if pos else None
+                # 「无持仓」也是有效答案，一并快取；查询失败则不快取
+                self._pos_cache[symbol] = (now, result)
+                return result
+            except Exception as e:
+                self.log.info(f"wrapper.get_position {symbol} error: {e}")
+
+        # 2) python-binance futures endpoint
+        if self.client is not self.wrapper and hasattr(self.client, "futures_position_information"):
+            try:
+                rows = self.client.futures_position_information(symbol=symbol) or []
+                pos = next((r for r in rows if float(r.get("positionAmt", 0) or 0) != 0.0), None)
+                result = self._normalize_pos_dict(symbol, pos) if pos else None
+                self._pos_cache[symbol] = (now, result)
+                return result
+            except Exception as e:
+                self.log.info(f"futures_position_information {symbol} error: {e}")
+        return None
 
     def _fetch_all_exchange_positions(self) -> List[Position]:
         # 1) wrapper first
         self.log.info("_fetch_all_exchange_positions")
-        try:
-            if self.wrapper and hasattr(self.wrapper, "get_all_positions"):
+        now = time.monotonic()
+        hit = self._all_cache
+        if hit is not None and now - hit[0] < self._ttl:
+            return list(hit[1])
+        if self.wrapper and hasattr(self.wrapper, "get_all_positions"):
+            try:
                 rows = self.wrapper.get_all_positions() or []
                 self.log.info(rows)
-                return [self._normalize_pos_dict(r.get("symbol", ""), r)
-                        for r in rows
-                        if float(r.get("positionAmt", 0)) != 0.0]
-        except Exception:
-            return []
+                result = self._normalize_many(rows, skip_flat=True)
+                self._all_cache = (now, result)
+                return list(result)
+            except Exception as e:
+                self.log.info(f"wrapper.get_all_positions error: {e}")
+
+        # 2) python-binance futures endpoint
+        if self.client is not self.wrapper and hasattr(self.client, "futures_position_information"):
+            try:
+                rows = self.client.futures_position_information() or []
+                result = self._normalize_many(rows, skip_flat=True)
+                self._all_cache = (now, result)
+                return list(result)
+            except Exception as e:
+                self.log.info(f"futures_position_information error: {e}")
+        return []
 
     # ----------------- normalization -----------------
 
-    def _normalize_pos_dict(self, symbol: str, d: Dict[str, Any]) -> Position:
+    def _normalize_pos_dict(self, symbol: str, d: Dict[str, Any], now: Optional[float] = None) -> Position:
         """
         Convert various futures position dicts into our Position dataclass.
         Works with both wrapper.get_position() and python-binance rows.
         """
-        symbol = (symbol or d.get("symbol", "")).upper()
-        amt = float(d.get("positionAmt", 0.0))
+        amt, isolatedMargin, upnl, *rest = _row_extractor(d)(d)
         side = "LONG" if amt > 0 else "SHORT"
         positionAmt = abs(amt)
-        isolatedMargin = float(d.get("isolatedMargin", 0.0) or 0.0)
-        entry = float(d.get("entryPrice", 0.0) or 0.0)
-        mark = float(d.get("markPrice", d.get("markPriceAvg", 0.0)) or 0.0)
-        lev = float(d.get("leverage", 0.0) or 0.0)
-        upnl = float(d.get("unRealizedProfit", d.get("unrealizedProfit", 0.0)) or 0.0)
-        liq = d.get("liquidationPrice", None)
+        # 全仓部位 isolatedMargin 为 0：pnl% 给 0.0（与 _position_math 一致），不抛 ZeroDivisionError
+        pnl_percent = (upnl / isolatedMargin) * 100 if isolatedMargin else 0.0
+        return self._build_position(symbol, d, side, positionAmt, isolatedMargin, upnl, pnl_percent, *rest,
+                                    now=time.time() if now is None else now)
+
+    def _normalize_many(self, rows: List[Dict[str, Any]], skip_flat: bool = False) -> List[Position]:
+        """
+        批次版 _normalize_pos_dict：方向 / 仓位大小 / pnl% 整批交给 _position_math 一次算完，
+        其余栏位再逐笔组成 Position。
+        skip_flat=True 时略过 positionAmt 为 0 的列（用取值时已转好的 float 判断，不再另外 float() 一次）
+        """
+        vals = [_row_extractor(r)(r) for r in rows]
+        if skip_flat:
+            kept = [(r, v) for r, v in zip(rows, vals) if v[0] != 0.0]
+            rows = [r for r, _ in kept]
+            vals = [v for _, v in kept]
+        n = len(rows)
+        if n == 0:
+            return []
+        amt = np.fromiter((v[0] for v in vals), dtype=np.float64, count=n)
+        iso = np.fromiter((v[1] for v in vals), dtype=np.float64, count=n)
+        upnl = np.fromiter((v[2] for v in vals), dtype=np.float64, count=n)
+        is_long, size, pnl_pct = _position_math(amt, upnl, iso)
+        now = time.time()  # 整批共用一个时间戳
+        return [
+            self._build_position(
+                r.get("symbol", ""), r, "LONG" if lg else "SHORT", sz, v[1], v[2], pp, *v[3:], now=now,
+            )
+            for r, v, lg, sz, pp in zip(rows, vals, is_long.tolist(), size.tolist(), pnl_pct.tolist())
+        ]
+
+    def _build_position(self, symbol: str, d: Dict[str, Any], side: str, positionAmt: float,
+                        isolatedMargin: float, upnl: float, pnl_percent: float,
+                        entry: float, mark: float, lev: float, liq: Any, isolated_flag: str,
+                        now: float) -> Position:
+        """数值核心算好之后，补上其余栏位（强平价、逐仓旗标、TP/SL）"""
+        symbol = _sym(symbol or d.get("symbol", ""))
         liq_price = float(liq) if liq not in (None, "", "0", 0) else None
 
-        isolated_flag = str(d.get("isolated", d.get("marginType", ""))).upper()
+        isolated_flag = isolated_flag.upper()
         isolated = (isolated_flag == "TRUE") or (isolated_flag == "ISOLATED")
 
-        pnl_percent = (upnl / isolatedMargin) * 100
         tp, sl = self._infer_tp_sl(symbol, side, entry)
         return Position(
             symbol=symbol,
@@ -125,7 +431,7 @@ class PositionDataManager:
             pnl_percent=pnl_percent,
             liq_price=liq_price,
             isolated=isolated,
-            opened_at=time.time(),  # we don’t have exchange open time here
+            opened_at=now,  # we don’t have exchange open time here
             meta=d,
             take_profit=tp,
             stop_loss=sl,
@@ -148,23 +454,7 @@ class PositionDataManager:
                 return None
             pos = cached
 
-        return {
-            "symbol": pos.symbol,
-            "side": pos.side,
-            "positionAmt": pos.positionAmt,
-            "entry_price": pos.entry_price,
-            "mark_price": pos.mark_price,
-            "leverage": pos.leverage,
-            "unrealized_pnl": pos.unrealized_pnl,
-            "pnl_percent" : pos.pnl_percent,
-            "isolatedMargin" : pos.isolatedMargin,
-            "liq_price": pos.liq_price,
-            "isolated": pos.isolated,
-            "opened_at": pos.opened_at,
-            "meta": pos.meta,
-            "take_profit": pos.take_profit,    
-            "stop_loss": pos.stop_loss,         
-        }
+        return pos.to_dict()
 
     def get_all_open_positions(self) -> List[Dict[str, Any]]:
         """
@@ -177,23 +467,7 @@ class PositionDataManager:
         out: List[Dict[str, Any]] = []
         for p in rows:
             if isinstance(p, Position):
-                out.append({
-                    "symbol": p.symbol,
-                    "side": p.side,
-                    "positionAmt": p.positionAmt,
-                    "entry_price": p.entry_price,
-                    "mark_price": p.mark_price,
-                    "leverage": p.leverage,
-                    "unrealized_pnl": p.unrealized_pnl,
-                    "pnl_percent" : p.pnl_percent,
-                    "isolatedMargin" : p.isolatedMargin,
-                    "liq_price": p.liq_price,
-                    "isolated": p.isolated,
-                    "opened_at": p.opened_at,
-                    "meta": p.meta,
-                    "take_profit": p.take_profit,    
-                    "stop_loss": p.stop_loss,         
-                })
+                out.append(p.to_dict())
             else:
                 # already a dict (from local cache)
                 out.append(p)
@@ -265,18 +539,26 @@ class PositionDataManager:
     # ----------------- local cache convenience -----------------
 
     def list_open(self) -> List[Position]:
-        return [Position(**row) for row in self._read()]
+        with self._store_lock:
+            if self._db is not None:
+                blobs = self._db.execute("SELECT row FROM positions ORDER BY rowid").fetchall()
+                return [Position(**loads(b)) for (b,) in blobs]
+            return [Position(**row) for row in self._read()]
 
     def get(self, symbol: str) -> Optional[Position]:
-        symbol = symbol.upper()
-        for p in self.list_open():
-            if p.symbol.upper() == symbol:
-                return p
-        return None
+        symbol = _sym(symbol)
+        with self._store_lock:
+            if self._db is not None:
+                hit = self._db.execute("SELECT row FROM positions WHERE symbol = ?", (symbol,)).fetchone()
+                return Position(**loads(hit[0])) if hit else None
+            if self._cache_rows is None or self._stamp() != self._cache_stamp:
+                row = self._find_in_file(symbol)  # 只查一笔不必整档解析，完整读取留给 list_open / upsert
+            else:
+                row = self._rows_index().get(symbol)
+        return Position(**row) if row else None
 
     def upsert(self, symbol: str, side: str, positionAmt: float, entry_price: float, meta: Optional[Dict[str, Any]] = None) -> Position:
-        symbol = symbol.upper()
-        existing = self.list_open()
+        symbol = _sym(symbol)
         now = time.time()
         pos = Position(
             symbol=symbol,
@@ -285,20 +567,39 @@ class PositionDataManager:
             entry_price=float(entry_price),
             mark_price=float(meta.get("mark_price", entry_price) if meta else entry_price),
             leverage=float(meta.get("leverage", 0) if meta else 0),
+            isolatedMargin=float(meta.get("isolatedMargin", 0) if meta else 0),
             unrealized_pnl=float(meta.get("unrealized_pnl", 0) if meta else 0),
+            pnl_percent=float(meta.get("pnl_percent", 0) if meta else 0),
             liq_price=float(meta.get("liq_price", 0)) if meta and meta.get("liq_price") else None,
             isolated=bool(meta.get("isolated", True) if meta else True),
             opened_at=now,
             meta=meta or {},
         )
-        kept: List[Dict[str, Any]] = [asdict(p) for p in existing if p.symbol.upper() != symbol]
-        kept.append(asdict(pos))
-        self._write(kept)
+        self._store(pos)
         return pos
 
     def close(self, symbol: str) -> bool:
-        symbol = symbol.upper()
-        before = self.list_open()
-        after = [asdict(p) for p in before if p.symbol.upper() != symbol]
-        self._write(after)
-        return len(after) != len(before)
\ No newline at end of file
+        symbol = _sym(symbol)
+        with self._store_lock:
+            if self._db is not None:
+                cur = self._db.execute("DELETE FROM positions WHERE symbol = ?", (symbol,))
+                return cur.rowcount > 0
+            index = dict(self._rows_index())
+            removed = index.pop(symbol, None)
+            if removed is not None:  # 本来就没有这一列：不必重写档案
+                self._write(list(index.values()))
+        return removed is not None
+
+    def _store(self, pos: Position) -> None:
+        """写入（或取代）pos.symbol 那一列"""
+        row = _pos_to_row(pos)
+        with self._store_lock:
+            if self._db is not None:
+                # REPLACE 会删掉旧列再插入（rowid 变大），新纪录排在最后，与 JSON 版顺序一致
+                blob = dumps_bytes(row, indent=False, default=str)
+                self._db.execute("INSERT OR REPLACE INTO positions (symbol, row) VALUES (?, ?)", (pos.symbol, blob))
+                return
+            index = dict(self._rows_index())  # 复本：写档成功前不动快取
+            index.pop(pos.symbol, None)        # 先移除再放回，新纪录排在最后（同旧行为）
+            index[pos.symbol] = row
+            self._write(list(index.values()))
@@ -2,14 +2,21 @@
 AI交易机器人主程序
 整合所有模块，实现完整的交易流程
 """
+import gzip
+import hashlib
 import os
+import queue
+import shutil
 import sys
+import threading
 import time
-import json
 import tempfile  # ← 新增
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path  # ← 新增
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Deque, Literal, Tuple
 
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -31,19 +38,48 @@ from src.ai.decision_parser import DecisionParser
 from src.utils.symbol_filters import SymbolFilters
 from src.utils.logger import init_all_loggers, get_logger
 from src.utils.discord import notify_discord
+from src.utils.json_utils import JSONDecodeError, dumps_bytes, iter_array, loads
+
+# Discord 讯息的逐项模板（format_map 代入同一个 ctx dict，避免每项各自组多段 f-string）
+_STARTUP_POS_TPL = (
+    "{symbol} {side}: {position_amt:.4f}\n"
+    "  入场: {entry_price:.2f} | 标记: {mark_price:.2f}\n"
+    "  盈亏: {pnl_sign}{unrealized_pnl:.2f} USDT ({pnl_sign}{pnl_percent:.2f}%)\n"
+)
+_DECISION_TPL = "{symbol}: {action} \n{reason}\n" + " " * 20 + "\n"
+
+# 决策纪录的时间戳（同 datetime.now().isoformat()：本地时间，微秒为 0 时不带小数）
+_ISO_SEC = "%Y-%m-%dT%H:%M:%S"
+_iso_cache: tuple = (-1, "")
+
+
+def _iso_now() -> str:
+    """目前本地时间的 ISO 字串；秒以上的部分每秒只 strftime 一次，微秒由 time_ns 整数运算补上"""
+    global _iso_cache
+    sec, ns = divmod(time.time_ns(), 1_000_000_000)
+    cached = _iso_cache
+    if cached[0] != sec:
+        # 整个 tuple 一次替换，其他执行绪不会读到秒数与字串不一致的中间状态
+        cached = _iso_cache = (sec, time.strftime(_ISO_SEC, time.localtime(sec)))
+    us = ns // 1000
+    return f"{cached[1]}.{us:06d}" if us else cached[1]
+
 
 class TradingBot:
     """交易机器人主类"""
     
+    _BANNER = "=" * 60
+
+    # 下个周期开始前多少秒启动背景预取（须小于 market_data 的资金费率 / 持仓量快取 TTL）
+    _PREFETCH_LEAD = 5.0
+
     def __init__(self, config_path: str = 'config/trading_config.json'):
-        self.logs = init_all_loggers()
+        init_all_loggers()
+        # 只取 main 自己会写的 logger；trade / debug / binance_client / hedge 由各元件建构时自己取用，
+        # 档案 handler 到那时才建立（例如没启用对冲就不会开 hedge.log）
         self.log_ai = get_logger("ai")
-        self.log_trade = get_logger("trade")
         self.log_sys = get_logger("system")
         self.log_prompt = get_logger("prompt")
-        self.log_debug = get_logger("debug")
-        self.log_binance_client = get_logger("binance_client")
-        self.log_hedge = get_logger("hedge")
         """初始化交易机器人"""
         self.log_ai.info("=" * 60)
         self.log_ai.info("🚀 AI交易机器人启动中...")
@@ -51,6 +87,9 @@ class TradingBot:
         
         # 加载配置
         self.config = ConfigLoader.load_trading_config(config_path)
+        # 交易币种与周期秒数在运行期间不变，载入时取一次，之后各周期直接读取
+        self._symbols: Tuple[str, ...] = tuple(ConfigLoader.get_trading_symbols(self.config))
+        self._interval_seconds = ConfigLoader.get_schedule_config(self.config)['interval_seconds']
         self.log_ai.info(f"✅ 配置加载完成")
         
         # 加载环境变量
@@ -86,26 +125,73 @@ class TradingBot:
             self.hedger = None
         self.position_manager = PositionManager(self.client)
         self.risk_manager = RiskManager(self.config)
+        # 决策动作 → 处理函式（加仓与开仓走同一段流程）；未知动作视同 HOLD
+        self._action_table = {
+            'BUY_OPEN': self._act_open_long,
+            'ADD_BUY_OPEN': self._act_open_long,
+            'SELL_OPEN': self._act_open_short,
+            'ADD_SELL_OPEN': self._act_open_short,
+            'CLOSE': self._act_close,
+            'HOLD': self._act_hold,
+            'PARTIAL_CLOSE': self._act_partial_close,
+        }
         self.log_ai.info(f"✅ 交易执行器初始化完成")
         
         # === 新增：本地歷史檔案設定 ===
         paths_cfg = self.config.get('paths', {})
         # 你也可以在 trading_config.json 裡設定:
-        # "paths": {"state_dir": "./state", "history_file": "decision_history.jsonl", "max_history": 300}
+        # "paths": {"state_dir": "./state", "history_file": "decision_history.jsonl", "max_history": 300,
+        #           "compact_threshold_bytes": 0, "archive_history": false}
         self.state_dir = Path(paths_cfg.get('state_dir', './state'))
         self.state_dir.mkdir(parents=True, exist_ok=True)
         self.history_file = self.state_dir / paths_cfg.get('history_file', 'decision_history.jsonl')
         self.max_history: int = int(paths_cfg.get('max_history', 300))
+        # 历史档的长驻追加 handle（第一次写入时才开启），每个周期结束 flush 一次
+        self._hist_fh = None
+        self._hist_fh_path: Optional[Path] = None
+        # 历史档大小超过门槛才压缩重写（0 = 自动：约 4 倍 max_history 笔、每笔以 1 KiB 估）
+        self._compact_threshold: int = int(paths_cfg.get('compact_threshold_bytes', 0)) or 4 * self.max_history * 1024
+        self._hist_dirty_since_compact = 0  # 上次压缩之后追加过几笔；0 表示档案内容就是上次压缩的结果
+        # 压缩前先把整份旧档以 gzip 另存（<stem>-YYYYMMDD-HHMMSS.jsonl.gz），被裁掉的旧纪录不会遗失
+        self._archive_history: bool = bool(paths_cfg.get('archive_history', False))
+        try:
+            self._hist_bytes: int = self.history_file.stat().st_size
+        except FileNotFoundError:
+            self._hist_bytes = 0
 
         # AI组件
-        symbols = ConfigLoader.get_trading_symbols(self.config)
-        precision_map = self._build_precision_map(symbols)
+        precision_map = self._build_precision_map(self._symbols)
         self.prompt_builder = PromptBuilder(self.config, precision_map)
+        # 逐币种收集行情 / 持仓用的执行绪池。不能共用 market_data 的抓取池：
+        # 这里的任务会等待该池中的子请求（K 线各周期、即时行情），共用会互相卡死
+        self._io_pool = ThreadPoolExecutor(max_workers=min(8, max(1, len(self._symbols))),
+                                           thread_name_prefix="symbol-io")
         self.decision_parser = DecisionParser()
+        # 行情 / 账户 / 持仓与上次相同、上次决策全为 HOLD 且未超过 ai_cache_ttl 秒时，沿用上次决策不再呼叫 AI；0 = 停用
+        self._ai_cache_ttl = float(ConfigLoader.get_ai_config(self.config).get('ai_cache_ttl', 0) or 0)
+        self._last_inputs_hash: Optional[bytes] = None  # 上次全 HOLD 时的 inputs_digest
+        self._last_decisions: Dict[str, Dict[str, Any]] = {}
+        self._last_ai_ts = 0.0
+        # 是否把完整的提示词 / AI 推理 / 回复写进日志（每周期数十 KB）；关闭时只记一行长度与杂凑摘要
+        self._verbose = bool(self.config.get('logging', {}).get('verbose_ai_io', True))
         self.log_ai.info(f"✅ AI组件初始化完成")
         
         # 状态追踪（從本地載入歷史）
-        self.decision_history: List[Dict[str, Any]] = self._load_decision_history(self.history_file, self.max_history)
+        # deque(maxlen)：append 时自动丢掉最旧的，不必每次切片重建 list
+        self.decision_history: Deque[Dict[str, Any]] = deque(
+            self._load_decision_history(self.history_file, self.max_history), maxlen=self.max_history
+        )
+        # 每个币种最近 3 笔决策（analyze_with_ai 用），不必每次扫整份 history 过滤
+        self._history_by_symbol: Dict[str, Deque[Dict[str, Any]]] = defaultdict(lambda: deque(maxlen=3))
+        for rec in self.decision_history:
+            self._history_by_symbol[rec.get('symbol')].append(rec)
+        # 历史档的写入（追加 / flush / 压缩）全交给背景执行绪，save_decision 只把纪录放进伫列
+        # 此后 _hist_fh、_hist_bytes、_hist_dirty_since_compact 只由该执行绪改动
+        self._hist_queue: "queue.Queue[tuple]" = queue.Queue()
+        self._compact_pending = False
+        self._writer_thread = threading.Thread(target=self._history_writer, name="history-writer", daemon=True)
+        self._writer_thread.start()
+        self._shut_down = False
         self.trade_count = 0
 
         # 发送账户摘要到Discord
@@ -119,65 +205,168 @@ class TradingBot:
     def _load_decision_history(self, path: Path, limit: int) -> List[Dict[str, Any]]:
         """
         從本地檔案載入決策歷史。
-        支援 JSONL（每行一筆 JSON）或舊版 JSON 陣列格式。
+        支援 JSONL（每行一筆 JSON）或舊版 JSON 陣列格式（載入後就地轉存成 JSONL）。
         僅保留最後 limit 筆；若檔案不存在回傳空陣列。
         """
         if not path.exists():
             return []
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                first_char = f.read(1)
-                f.seek(0)
-                records: List[Dict[str, Any]] = []
-                if first_char == '[':
-                    # 舊版 JSON 陣列
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        records = [x for x in data if isinstance(x, dict)]
-                else:
-                    # JSONL
-                    for line in f:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        try:
-                            obj = json.loads(line)
-                            if isinstance(obj, dict):
-                                records.append(obj)
-                        except json.JSONDecodeError:
-                            continue
-                # 只保留最後 limit 筆
-                return records[-limit:]
+            with open(path, 'rb') as f:
+                raw = f.read()
+            # 边解析边只留最后 limit 笔，不必先建出整份 list 再切片
+            records: Deque[Dict[str, Any]] = deque(maxlen=max(limit, 0))
+            if raw[:1] == b'[':
+                # 舊版 JSON 陣列：逐筆解析
+                records.extend(x for x in iter_array(raw.decode('utf-8')) if isinstance(x, dict))
+                # 转存成 JSONL，之后启动就走逐行路径（也让之后的追加写入格式一致）
+                self._hist_dirty_since_compact = 1
+                self._compact_history_file(path, list(records))
+            else:
+                # JSONL（bytes 直接逐行解析，不先解码成 str）
+                for line in raw.splitlines():
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        obj = loads(line)
+                        if isinstance(obj, dict):
+                            records.append(obj)
+                    except JSONDecodeError:
+                        continue
+            return list(records)
         except Exception as e:
             self.log_ai.info(f"⚠️ 載入歷史檔案失敗: {e}")
             return []
 
-    def _append_history_jsonl(self, path: Path, record: Dict[str, Any]) -> None:
+    def _history_writer(self) -> None:
+        """
+        背景写档执行绪：依序处理伫列里的 append / flush / compact / close。
+        一次取出当下排队的所有工作，连续的 append 合并成一次 write。
+        """
+        q = self._hist_queue
+        while True:
+            batch = [q.get()]
+            try:
+                while True:
+                    batch.append(q.get_nowait())
+            except queue.Empty:
+                pass
+            pending: List[Dict[str, Any]] = []
+            stop = False
+            for op, arg in batch:
+                if op == 'append':
+                    pending.append(arg)
+                    continue
+                if pending:
+                    self._append_history_jsonl(self.history_file, pending)
+                    pending = []
+                if op == 'flush':
+                    self._flush_history_handle(arg)
+                elif op == 'compact':
+                    self._compact_history_file(self.history_file, arg)
+                    self._compact_pending = False
+                elif op == 'close':
+                    self._close_history_handle()
+                    stop = True
+            if pending:
+                self._append_history_jsonl(self.history_file, pending)
+            for _ in batch:
+                q.task_done()
+            if stop:
+                return
+
+    def _append_history_jsonl(self, path: Path, records: List[Dict[str, Any]]) -> None:
         """
-        以 JSONL 方式追加一筆歷史到檔案。
+        以 JSONL 方式追加多筆歷史到檔案（一次 write）。
+        写进长驻 handle 的缓冲区，由 flush_history() 在周期结束时一次落盘。
         """
         try:
-            with open(path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(record, ensure_ascii=False))
-                f.write('\n')
+            if self._hist_fh is None or self._hist_fh_path != path:
+                self._close_history_handle()
+                self._hist_fh = open(path, 'ab', buffering=1 << 16)
+                self._hist_fh_path = path
+            data = b''.join(dumps_bytes(r, indent=False) + b'\n' for r in records)
+            self._hist_fh.write(data)
+            self._hist_bytes += len(data)
+            self._hist_dirty_since_compact += len(records)
         except Exception as e:
             self.log_ai.info(f"⚠️ 寫入歷史檔案失敗: {e}")
 
+    def flush_history(self, fsync: bool = False) -> None:
+        """请背景执行绪把缓冲中的历史纪录写入档案；fsync=True 时再要求作业系统落到磁碟（不等待完成）"""
+        self._hist_queue.put(('flush', fsync))
+
+    def _flush_history_handle(self, fsync: bool) -> None:
+        if self._hist_fh is None:
+            return
+        try:
+            self._hist_fh.flush()
+            if fsync:
+                os.fsync(self._hist_fh.fileno())
+        except Exception as e:
+            self.log_ai.info(f"⚠️ 寫入歷史檔案失敗: {e}")
+
+    def _close_history_handle(self) -> None:
+        if self._hist_fh is None:
+            return
+        try:
+            self._hist_fh.close()  # close 会先 flush
+        except Exception as e:
+            self.log_ai.info(f"⚠️ 寫入歷史檔案失敗: {e}")
+        self._hist_fh = None
+        self._hist_fh_path = None
+
     def _compact_history_file(self, path: Path, records: List[Dict[str, Any]]) -> None:
         """
         壓縮歷史檔案：只保留 records 的內容（通常是最後 N 筆），
         以臨時檔 + 原子替換確保安全。
         """
+        if self._hist_dirty_since_compact == 0:
+            return  # 上次压缩后没有新纪录，档案内容已经就是 records
         try:
+            # 追加 handle 指向旧档案，替换前先关掉（缓冲内容一并写出），下次追加再开新档
+            if self._hist_fh_path == path:
+                self._close_history_handle()
+            if self._archive_history:
+                self._archive_history_file(path)
             tmp = path.with_suffix(path.suffix + '.tmp')
-            with open(tmp, 'w', encoding='utf-8') as f:
-                for r in records:
-                    f.write(json.dumps(r, ensure_ascii=False))
-                    f.write('\n')
+            data = b''.join(dumps_bytes(r, indent=False) + b'\n' for r in records)
+            with open(tmp, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())  # 先确保新内容落盘，再换名
             os.replace(tmp, path)
+            self._fsync_dir(path.parent)  # 换名本身也要落盘，断电后才不会回到旧档
+            self._hist_dirty_since_compact = 0
+            self._hist_bytes = len(data)
+            # 门槛设得比 N 笔本身还小时，至少等档案再长一倍才压缩，免得每笔都重写
+            self._compact_threshold = max(self._compact_threshold, 2 * len(data))
         except Exception as e:
             self.log_ai.info(f"⚠️ 壓縮歷史檔案失敗: {e}")
 
+    @staticmethod
+    def _archive_history_file(path: Path) -> None:
+        """把目前的历史档整份 gzip 压缩另存到同目录（JSONL 每行键名相同，压缩率约 5~10 倍）"""
+        try:
+            src = open(path, 'rb')
+        except FileNotFoundError:
+            return
+        dest = path.with_name(f"{path.stem}-{time.strftime('%Y%m%d-%H%M%S')}{path.suffix}.gz")
+        # 'ab'：同一秒内再次归档时接成下一个 gzip member（gzip / zcat 会依序解开），不会盖掉前一份
+        with src, gzip.open(dest, 'ab', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1 << 16)
+
+    @staticmethod
+    def _fsync_dir(directory: Path) -> None:
+        """fsync 目录（让 rename 持久化）；不支援开启目录的平台（Windows）直接略过"""
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
     def _send_startup_summary_to_discord(self):
         """
         发送账户摘要到Discord（包含账户标签）
@@ -193,31 +382,34 @@ class TradingBot:
 
             # 构建消息内容
             now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            content = f"🚀 **交易机器人启动** @ {now_str}\n\n"
-            content += "📊 **账户摘要**\n"
-            content += f"总权益: {account_summary.get('equity', 0):.2f} USDT\n"
-            content += f"可用余额: {account_summary.get('available_balance', 0):.2f} USDT\n"
-            content += f"未实现盈亏: {account_summary.get('total_unrealized_pnl', 0):.2f} USDT\n"
-            content += f"保证金率: {account_summary.get('margin_ratio', 0):.2f}%\n"
+            parts = [
+                f"🚀 **交易机器人启动** @ {now_str}\n\n",
+                "📊 **账户摘要**\n",
+                f"总权益: {account_summary.get('equity', 0):.2f} USDT\n",
+                f"可用余额: {account_summary.get('available_balance', 0):.2f} USDT\n",
+                f"未实现盈亏: {account_summary.get('total_unrealized_pnl', 0):.2f} USDT\n",
+                f"保证金率: {account_summary.get('margin_ratio', 0):.2f}%\n",
+            ]
+            append = parts.append
 
             # 添加持仓信息
             if open_positions:
-                content += f"\n📈 **当前持仓** ({len(open_positions)}个)\n"
+                append(f"\n📈 **当前持仓** ({len(open_positions)}个)\n")
+                ctx: Dict[str, Any] = {}
                 for pos in open_positions:
-                    symbol = pos.get('symbol', 'N/A')
-                    side = pos.get('side', 'N/A')
-                    position_amt = pos.get('positionAmt', 0)
-                    entry_price = pos.get('entry_price', 0)
-                    mark_price = pos.get('mark_price', 0)
-                    unrealized_pnl = pos.get('unrealized_pnl', 0)
-                    pnl_percent = pos.get('pnl_percent', 0)
-
-                    pnl_sign = "+" if unrealized_pnl >= 0 else ""
-                    content += f"{symbol} {side}: {position_amt:.4f}\n"
-                    content += f"  入场: {entry_price:.2f} | 标记: {mark_price:.2f}\n"
-                    content += f"  盈亏: {pnl_sign}{unrealized_pnl:.2f} USDT ({pnl_sign}{pnl_percent:.2f}%)\n"
+                    ctx["symbol"] = pos.get('symbol', 'N/A')
+                    ctx["side"] = pos.get('side', 'N/A')
+                    ctx["position_amt"] = pos.get('positionAmt', 0)
+                    ctx["entry_price"] = pos.get('entry_price', 0)
+                    ctx["mark_price"] = pos.get('mark_price', 0)
+                    ctx["unrealized_pnl"] = unrealized_pnl = pos.get('unrealized_pnl', 0)
+                    ctx["pnl_percent"] = pos.get('pnl_percent', 0)
+                    ctx["pnl_sign"] = "+" if unrealized_pnl >= 0 else ""
+                    # 每个持仓一次组好三行，避免逐行 += 反复复制整段字串
+                    append(_STARTUP_POS_TPL.format_map(ctx))
             else:
-                content += "\n📈 **当前持仓**: 无\n"
+                append("\n📈 **当前持仓**: 无\n")
+            content = "".join(parts)
 
             # 发送到Discord（会自动包含账户标签）
             notify_discord(content)
@@ -225,10 +417,16 @@ class TradingBot:
         except Exception as e:
             self.log_ai.info(f"⚠️ 发送启动摘要到Discord失败: {e}")
 
-    def _build_precision_map(self, symbols: list[str]) -> Dict[str, Dict[str, int]]:
+    def _build_precision_map(self, symbols: Tuple[str, ...]) -> Dict[str, Dict[str, int]]:
         pm: Dict[str, Dict[str, int]] = {}
+        # 一次 exchangeInfo 取回全部交易对；清单里没有的才逐一查询
+        try:
+            all_filters = self.client.get_all_symbol_filters()
+        except Exception as e:
+            self.log_ai.info(f"⚠️ 批次取得交易规则失败，改为逐一查询: {e}")
+            all_filters = {}
         for sym in symbols:
-            f: SymbolFilters = self.client.get_symbol_filters(sym)  # 內含 tickSize/stepSize
+            f: SymbolFilters = all_filters.get(sym) or self.client.get_symbol_filters(sym)  # 內含 tickSize/stepSize
             price_dp = PromptBuilder._decimals_from_step(getattr(f, "tickSize", None), default_dp=2)
             qty_dp = PromptBuilder._decimals_from_step(getattr(f, "stepSize", None), default_dp=4)
             pm[sym] = {"price_dp": price_dp, "qty_dp": qty_dp}
@@ -240,7 +438,7 @@ class TradingBot:
         if not api_key or not api_secret:
             raise ValueError("API凭证未配置")
         
-        return BinanceClient(api_key=api_key, api_secret=api_secret)
+        return BinanceClient(api_key=api_key, api_secret=api_secret, pool_maxsize=self._http_pool_size())
     
     def _init_binance_client_hedge(self) -> HedgeClient:
         """初始化Binance客户端（正式网）"""
@@ -248,8 +446,12 @@ class TradingBot:
         if not api_key or not api_secret:
             raise ValueError("API凭证未配置")
         
-        return HedgeClient(api_key=api_key, api_secret=api_secret)
+        return HedgeClient(api_key=api_key, api_secret=api_secret, pool_maxsize=self._http_pool_size())
     
+    def _http_pool_size(self) -> int:
+        """每币种并行的 K 线 / 行情请求约 4 条，连线池至少 32 条"""
+        return max(32, len(self._symbols) * 4)
+
     def _init_ai_client(self) -> DeepSeekClient:
         """初始化DeepSeek客户端"""
         api_key = EnvManager.get_deepseek_key()
@@ -274,70 +476,96 @@ class TradingBot:
             'multi_timeframe': multi_timeframe
         }
     
-    def analyze_all_symbols_with_ai(self, all_symbols_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    def analyze_all_symbols_with_ai(self, all_symbols_data: Dict[str, Any],
+                                    account_summary: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
         """使用AI一次性分析所有币种"""
         try:
-            # 收集所有币种的持仓
-            all_positions = {}
-            for symbol in all_symbols_data.keys():
-                position = self.position_data.get_current_position(symbol)
-                if position:
-                    all_positions[symbol] = position
+            # 持仓已由 run_cycle 放进 all_symbols_data[symbol]["position"]，不必再逐一查询
+            # 获取账户摘要（run_cycle 已取过就直接沿用）
+            if account_summary is None:
+                account_summary = self.account_data.get_account_summary()
             
-            # 获取账户摘要
-            account_summary = self.account_data.get_account_summary()
-            
-            # 获取历史决策
-            history = self.decision_history[-300:] if self.decision_history else []
-            # 构建多币种提示词
-            prompt = self.prompt_builder.build_multi_symbol_analysis_prompt_json(all_symbols_data, account_summary , history)
+            # 获取历史决策（不超过 300 笔时直接传原 deque，让 PromptBuilder 的分组快取可命中）
+            history = self.decision_history
+            if len(history) > 300:
+                history = list(islice(history, len(history) - 300, None))
+            # 行情 / 账户 / 持仓都与上次相同、且上次全是 HOLD 时沿用上次决策
+            # （历史决策与时间每周期都会变，不算进杂凑；非 HOLD 的决策不快取，免得同一笔单重复下）
+            inputs_hash = None
+            if self._ai_cache_ttl > 0:
+                inputs_hash = self.prompt_builder.inputs_digest(all_symbols_data, account_summary)
+                if (inputs_hash == self._last_inputs_hash
+                        and time.monotonic() - self._last_ai_ts < self._ai_cache_ttl):
+                    self.log_sys.info("♻️ 行情与持仓与上次相同，沿用上次的 HOLD 决策")
+                    return {symbol: dict(decision) for symbol, decision in self._last_decisions.items()}
 
+            # 构建多币种提示词
+            prompt_bytes = self.prompt_builder.build_multi_symbol_analysis_prompt_json_bytes(
+                all_symbols_data, account_summary, history)
+            prompt = prompt_bytes.decode()
             
             # 调用AI
+            banner = self._BANNER
             self.log_sys.info(f"\n🤖 调用AI一次性分析所有币种...")
-            self.log_sys.info(f"\n{'='*60}")
-            self.log_prompt.info(f"{'='*60}")
-            self.log_prompt.info(prompt)
-            self.log_prompt.info(f"{'='*60}\n")
+            self.log_sys.info("\n%s", banner)
+            if self._verbose:
+                self.log_prompt.info(banner)
+                self.log_prompt.info(prompt)
+                self.log_prompt.info("%s\n", banner)
+            else:
+                digest = hashlib.blake2b(prompt_bytes, digest_size=16).digest()
+                self.log_prompt.info("提示词 %d 字元 / %d bytes, blake2b=%s", len(prompt), len(prompt_bytes), digest.hex()[:12])
             
             response = self.ai_client.analyze_and_decide(prompt)
             
             # 显示AI推理过程
             reasoning = self.ai_client.get_reasoning(response)
             
-            if reasoning:
-                self.log_ai.info(f"🧠 AI思维链（详细分析）")
-                self.log_ai.info(f"{'='*60}")
-                self.log_ai.info(reasoning)
-                self.log_ai.info(f"{'='*60}\n")
-            
-            # 显示AI原始回复
-            self.log_ai.info(f"🤖 AI原始回复:")
-            self.log_ai.info(f"{'='*60}")
-            self.log_ai.info(response['content'])
-            self.log_ai.info(f"{'='*60}\n")
+            if self._verbose:
+                if reasoning:
+                    self.log_ai.info(f"🧠 AI思维链（详细分析）")
+                    self.log_ai.info(banner)
+                    self.log_ai.info(reasoning)
+                    self.log_ai.info("%s\n", banner)
+                
+                # 显示AI原始回复
+                self.log_ai.info(f"🤖 AI原始回复:")
+                self.log_ai.info(banner)
+                self.log_ai.info(response['content'])
+                self.log_ai.info("%s\n", banner)
+            else:
+                self.log_ai.info("🤖 AI回复 %d 字元（推理 %d 字元）", len(response['content'] or ''), len(reasoning or ''))
             
             # 解析决策
             decisions = self.decision_parser.parse_multi_symbol_response(response['content'])
+            if inputs_hash is not None:
+                if decisions and all(str(d.get('action', 'HOLD')).upper() == 'HOLD' for d in decisions.values()):
+                    self._last_inputs_hash = inputs_hash
+                    self._last_decisions = {symbol: dict(decision) for symbol, decision in decisions.items()}
+                    self._last_ai_ts = time.monotonic()
+                else:
+                    self._last_inputs_hash = None
             
             now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            content = f"🕒 Deepseek决策总结 @({now_str})\n"
+            parts = [f"🕒 Deepseek决策总结 @({now_str})\n"]
             # 显示所有决策
             self.log_ai.info(f"📊 AI多币种决策总结:")
-            self.log_ai.info(f"{'='*60}")
+            self.log_ai.info(banner)
             all_hold = True  # 檢查用旗標
+            ctx: Dict[str, Any] = {}
             for symbol, decision in decisions.items():
                 action = decision.get('action', 'HOLD').upper()
                 self.log_ai.info(f"   {symbol}: {decision['action']} - {decision['reason']}")
-                content += (f"{symbol}: {decision['action']} \n")
-                content += (f"{decision['reason']}\n")
-                content += (f"{' '*20}\n")
+                ctx["symbol"] = symbol
+                ctx["action"] = decision['action']
+                ctx["reason"] = decision['reason']
+                parts.append(_DECISION_TPL.format_map(ctx))
                 if action != "HOLD":
                     all_hold = False
                     
-            self.log_ai.info(f"{'='*60}\n")
+            self.log_ai.info("%s\n", banner)
             if not all_hold:
-                notify_discord(content)
+                notify_discord("".join(parts))
             else:
                 notify_discord(f"策略未改變,省略通知@{now_str}")
             return decisions
@@ -347,14 +575,16 @@ class TradingBot:
             traceback.print_exc()
             return {}
     
-    def analyze_with_ai(self, symbol: str, market_data: Dict[str, Any]) -> Dict[str, Any]:
+    def analyze_with_ai(self, symbol: str, market_data: Dict[str, Any],
+                        position: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """使用AI分析并获取决策"""
         try:
-            # 获取持仓
-            position = self.position_data.get_current_position(symbol)
+            # 获取持仓（呼叫端已取过就直接沿用）
+            if position is None:
+                position = self.position_data.get_current_position(symbol)
             
             # 获取历史决策（最近3条）
-            history = [d for d in self.decision_history if d.get('symbol') == symbol][-3:]
+            history = list(self._history_by_symbol.get(symbol, ()))
             
             # 构建提示词
             prompt = self.prompt_builder.build_analysis_prompt(
@@ -373,7 +603,7 @@ class TradingBot:
             
             # 显示AI推理过程
             reasoning = self.ai_client.get_reasoning(response)
-            if reasoning:
+            if reasoning and self._verbose:
                 self.log_ai.info(f"\n💭 {symbol} AI推理:")
                 self.log_ai.info(reasoning)
             
@@ -391,22 +621,15 @@ class TradingBot:
             self.log_ai.info(f"❌ AI分析失败 {symbol}: {e}")
             return self.decision_parser._get_default_decision()
     
-    def execute_decision(self, symbol: str, decision: Dict[str, Any], market_data: Dict[str, Any]):
+    def execute_decision(self, symbol: str, decision: Dict[str, Any], market_data: Dict[str, Any],
+                         account_summary: Optional[Dict[str, Any]] = None):
         """执行AI决策"""
         action = decision.get('action', 'HOLD')
         confidence = decision.get('confidence', 0.5)
         
-        # 确保 confidence 是数字
+        # 确保 confidence 是数字（HIGH / MEDIUM / LOW 与提示词用同一套对应）
         if isinstance(confidence, str):
-            conf_str = confidence.upper()
-            if conf_str == 'HIGH':
-                confidence = 0.8
-            elif conf_str == 'MEDIUM':
-                confidence = 0.6
-            elif conf_str == 'LOW':
-                confidence = 0.4
-            else:
-                confidence = 0.5
+            confidence = PromptBuilder._norm_confidence(confidence)
         
         # 如果信心度太低，不执行
         if confidence < 0.5 and action != 'CLOSE':
@@ -414,8 +637,9 @@ class TradingBot:
             return
         
         try:
-            # 获取账户信息
-            account_summary = self.account_data.get_account_summary()
+            # 获取账户信息（run_cycle 传入本周期的快照时不再查询）
+            if account_summary is None:
+                account_summary = self.account_data.get_account_summary()
             if not account_summary:
                 self.log_ai.info(f"⚠️ {symbol} 无法获取账户信息")
                 return
@@ -428,111 +652,42 @@ class TradingBot:
                 self.log_ai.info(f"⚠️ {symbol} 无法获取当前价格")
                 return
             
-            if action == 'BUY_OPEN':
-                # 开多仓
-                self._open_long(symbol, decision, total_equity, current_price)
-            
-            elif action == 'ADD_BUY_OPEN':
-                self._open_long(symbol, decision, total_equity, current_price)
+            handler = self._action_table.get(action, self._act_hold)
+            handler(symbol, decision, total_equity, current_price)
 
-            elif action == 'SELL_OPEN':
-                # 开空仓
-                self._open_short(symbol, decision, total_equity, current_price)
-            
-            elif action == 'ADD_SELL_OPEN':
-                # 开空仓
-                self._open_short(symbol, decision, total_equity, current_price)
+        except Exception as e:
+            self.log_ai.info(f"❌ 执行决策失败 {symbol}: {e}")
+    
+    # ---- 各动作的处理函式（签名一致，供 _action_table 查表呼叫）----
+    def _act_open_long(self, symbol: str, decision: Dict[str, Any], total_equity: float, current_price: float):
+        self._open_position(symbol, decision, total_equity, current_price, 'LONG')
 
-            elif action == 'CLOSE':
-                # 平仓
-                self._close_position(symbol, decision)
-                
-            elif action == 'HOLD':
-                # 持有
-                self.log_ai.info(f"💤 {symbol} 保持现状")
-                
-            
-            elif action == 'PARTIAL_CLOSE':
-                pct = decision.get('reduce_percent')
-                try:
-                    pct = float(pct)
-                except Exception:
-                    pct = None
-                if not pct or pct <= 0 or pct > 100:
-                    self.log_ai.info(f"⚠️ {symbol} 部分減倉比例無效: {pct}")
-                    return
-                self.trade_executor.close_position_partial(symbol, pct / 100.0)
-                if self.hedger:
-                    self.hedger.close_position_partial(symbol, pct / 100.0)
+    def _act_open_short(self, symbol: str, decision: Dict[str, Any], total_equity: float, current_price: float):
+        self._open_position(symbol, decision, total_equity, current_price, 'SHORT')
 
+    def _act_close(self, symbol: str, decision: Dict[str, Any], total_equity: float, current_price: float):
+        self._close_position(symbol, decision)
 
+    def _act_hold(self, symbol: str, decision: Dict[str, Any], total_equity: float, current_price: float):
+        self.log_ai.info(f"💤 {symbol} 保持现状")
 
-        except Exception as e:
-            self.log_ai.info(f"❌ 执行决策失败 {symbol}: {e}")
-    
-    def _open_long(self, symbol: str, decision: Dict[str, Any], total_equity: float, current_price: float):
-        """开多仓"""
-        # 检查账户余额
-        if total_equity <= 0:
-            self.log_ai.info(f"⚠️ {symbol} 账户余额为0，无法开仓")
-            self.log_ai.info(f"   请确保账户有足够的 USDT 余额")
-            return
-        
-        # 检查是否已有持仓
-        # position = self.position_data.get_current_position(symbol)
-        # if position:
-        #     self.log_ai.info(f"⚠️ {symbol} 已有持仓，无法开多仓")
-        #     return
-        
-        # 计算仓位数量
-        leverage = decision['leverage']
-        open_percent = decision['open_percent'] / 100
-        position_value = leverage * total_equity * open_percent
-        quantity = position_value / current_price
-        
-        # 检查数量是否有效
-        if quantity <= 0:
-            self.log_ai.info(f"❌ {symbol} 计算出的数量无效: {quantity} (账户余额: {total_equity})")
-            return
-        
-        # 风险检查
-        ok, errors = self.risk_manager.check_all_risk_limits(
-            symbol, quantity, current_price, total_equity, total_equity
-        )
-        if not ok:
-            self.log_ai.info(f"❌ {symbol} 风控检查失败:")
-            for err in errors:
-                self.log_ai.info(f"   - {err}")
-            return
-        
-        # 计算止盈止损价格
-        take_profit = decision.get('take_profit')
-        stop_loss = decision.get('stop_loss')
-        
-        # 执行开仓
+    def _act_partial_close(self, symbol: str, decision: Dict[str, Any], total_equity: float, current_price: float):
+        pct = decision.get('reduce_percent')
         try:
-            self.trade_executor.open_long(
-                symbol=symbol,
-                quantity=quantity,
-                leverage=leverage,
-                take_profit=take_profit,
-                stop_loss=stop_loss
-            )
-            if self.hedger:
-                self.hedger.open_short(
-                    symbol=symbol,
-                    quantity=quantity*4,
-                    leverage=leverage,
-                    take_profit=stop_loss,
-                    stop_loss=take_profit
-                )
-            self.log_ai.info(f"✅ {symbol} 开多仓成功")
-            self.trade_count += 1
-        except Exception as e:
-            self.log_ai.info(f"❌ {symbol} 开多仓失败: {e}")
+            pct = float(pct)
+        except Exception:
+            pct = None
+        if not pct or pct <= 0 or pct > 100:
+            self.log_ai.info(f"⚠️ {symbol} 部分減倉比例無效: {pct}")
+            return
+        self.trade_executor.close_position_partial(symbol, pct / 100.0)
+        if self.hedger:
+            self.hedger.close_position_partial(symbol, pct / 100.0)
     
-    def _open_short(self, symbol: str, decision: Dict[str, Any], total_equity: float, current_price: float):
-        """开空仓"""
+    def _open_position(self, symbol: str, decision: Dict[str, Any], total_equity: float, current_price: float,
+                       side: Literal['LONG', 'SHORT']):
+        """开仓（side: LONG 开多 / SHORT 开空；启用对冲时对冲帐户开反向仓）"""
+        label = "开多仓" if side == 'LONG' else "开空仓"
         # 检查账户余额
         if total_equity <= 0:
             self.log_ai.info(f"⚠️ {symbol} 账户余额为0，无法开仓")
@@ -542,7 +697,7 @@ class TradingBot:
         # 检查是否已有持仓
         # position = self.position_data.get_current_position(symbol)
         # if position:
-        #     self.log_ai.info(f"⚠️ {symbol} 已有持仓，无法开空仓")
+        #     self.log_ai.info(f"⚠️ {symbol} 已有持仓，无法{label}")
         #     return
         
         # 计算仓位数量
@@ -571,26 +726,34 @@ class TradingBot:
         stop_loss = decision.get('stop_loss')
         
         # 执行开仓
+        if side == 'LONG':
+            open_main = self.trade_executor.open_long
+            open_hedge = self.hedger.open_short if self.hedger else None
+        else:
+            open_main = self.trade_executor.open_short
+            open_hedge = self.hedger.open_long if self.hedger else None
         try:
-            self.trade_executor.open_short(
+            open_main(
                 symbol=symbol,
                 quantity=quantity,
                 leverage=leverage,
                 take_profit=take_profit,
-                stop_loss=stop_loss
+                stop_loss=stop_loss,
+                reference_price=current_price
             )
-            if self.hedger:
-                self.hedger.open_long(
+            if open_hedge:
+                open_hedge(
                     symbol=symbol,
                     quantity=quantity*4,
                     leverage=leverage,
                     take_profit=stop_loss,
-                    stop_loss=take_profit
+                    stop_loss=take_profit,
+                    reference_price=current_price
                 )
-            self.log_ai.info(f"✅ {symbol} 开空仓成功")
+            self.log_ai.info(f"✅ {symbol} {label}成功")
             self.trade_count += 1
         except Exception as e:
-            self.log_ai.info(f"❌ {symbol} 开空仓失败: {e}")
+            self.log_ai.info(f"❌ {symbol} {label}失败: {e}")
     
     def _close_position(self, symbol: str, decision: Dict[str, Any]):
         """平仓"""
@@ -607,19 +770,21 @@ class TradingBot:
         """保存决策历史（記憶體 + 檔案）"""
         p_obj: Dict[str, Any] = {}
         if position:
+            pb = self.prompt_builder  # 精度（price_dp / qty_dp）在 PromptBuilder 建构时已按 symbol 算好
+            to_float, get = pb._to_float, pb._get
             p_obj = {
-                "side": position.get("side") or ("LONG" if self._to_float(position.get("positionAmt"), 0.0) > 0 else "SHORT"),
-                "positionAmt": self.prompt_builder ._round_qty(symbol, position.get("positionAmt", 0.0)),
-                "entry_price": self.prompt_builder ._round_price(symbol, position.get("entry_price", 0.0)),
-                "leverage": self.prompt_builder ._to_float(position.get("leverage"), 0.0),
-                "unrealized_pnl": self.prompt_builder ._get(position, "unrealized_pnl", 0.0, 4),
-                "pnl_percent": self.prompt_builder ._get(position, "pnl_percent", 0.0, 4),
-                "isolatedMargin": self.prompt_builder ._get(position, "isolatedMargin", 0.0, 4),
-                "take_profit": self.prompt_builder ._get(position, "take_profit", 0.0, 4),
-                "stop_loss": self.prompt_builder ._get(position, "stop_loss", 0.0, 4),
+                "side": position.get("side") or ("LONG" if to_float(position.get("positionAmt"), 0.0) > 0 else "SHORT"),
+                "positionAmt": pb._round_qty(symbol, position.get("positionAmt", 0.0)),
+                "entry_price": pb._round_price(symbol, position.get("entry_price", 0.0)),
+                "leverage": to_float(position.get("leverage"), 0.0),
+                "unrealized_pnl": get(position, "unrealized_pnl", 0.0, 4),
+                "pnl_percent": get(position, "pnl_percent", 0.0, 4),
+                "isolatedMargin": get(position, "isolatedMargin", 0.0, 4),
+                "take_profit": get(position, "take_profit", 0.0, 4),
+                "stop_loss": get(position, "stop_loss", 0.0, 4),
             }
         decision_record = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': _iso_now(),
             'symbol': symbol,
             'action': decision['action'],
             'confidence': decision['confidence'],
@@ -630,20 +795,16 @@ class TradingBot:
             'price': market_data['realtime'].get('price', 0),
             'positionAfterExecution' : p_obj
         }
-        # 先存記憶體
+        # 先存記憶體（deque 的 maxlen 只保留最近 N 筆）
         self.decision_history.append(decision_record)
-        # 僅保留最近 N 筆
-        if len(self.decision_history) > self.max_history:
-            self.decision_history = self.decision_history[-self.max_history:]
-        # 追加到檔案（JSONL）
-        self._append_history_jsonl(self.history_file, decision_record)
-        # 如檔案過大（以筆數判斷），壓縮重寫
-        try:
-            # 簡易判斷：若筆數剛好超過 N，就做一次壓縮
-            if len(self.decision_history) == self.max_history:
-                self._compact_history_file(self.history_file, self.decision_history)
-        except Exception as e:
-            self.log_ai.info(f"⚠️ 壓縮歷史檔案時發生錯誤: {e}")
+        self._history_by_symbol[symbol].append(decision_record)
+        # 追加到檔案（JSONL）：交给背景执行绪序列化与写入，这里不等磁碟
+        self._hist_queue.put(('append', decision_record))
+        # 如檔案過大（以位元組數判斷），壓縮重寫成記憶體中的最近 N 筆（交出当下的快照）
+        # 门槛远大于 N 笔的大小，压缩是每隔许多周期才一次，而不是 history 满了之后每笔都重写
+        if not self._compact_pending and self._hist_bytes > self._compact_threshold:
+            self._compact_pending = True
+            self._hist_queue.put(('compact', list(self.decision_history)))
     
     def run_cycle(self):
         """执行一个交易周期"""
@@ -652,7 +813,7 @@ class TradingBot:
         self.log_ai.info("=" * 60)
         
         # 获取交易币种列表
-        symbols = ConfigLoader.get_trading_symbols(self.config)
+        symbols = self._symbols
         
         # 显示账户摘要
         account_summary = self.account_data.get_account_summary()
@@ -664,25 +825,38 @@ class TradingBot:
         
         # 方式1：多币种一次性分析（优化）
         if len(symbols) > 1:
-            # 收集所有币种的数据
-            all_symbols_data = {}
-            for symbol in symbols:
+            # 收集所有币种的数据（各币种并行请求，结果依 symbols 顺序放入）
+            # 持仓的查询时间另外记下，执行决策前连同持仓交给主帐户执行器
+            fetched_at: Dict[str, float] = {}
+
+            def collect(symbol: str) -> Dict[str, Any]:
                 market_data = self.get_market_data_for_symbol(symbol)
-                position = self.position_data.get_current_position(symbol)
-                all_symbols_data[symbol] = {
+                fetched_at[symbol] = time.monotonic()
+                return {
                     'market_data': market_data,
-                    'position': position
+                    'position': self.position_data.get_current_position(symbol)
                 }
+
+            futures = [(symbol, self._io_pool.submit(collect, symbol)) for symbol in symbols]
+            all_symbols_data = {symbol: fut.result() for symbol, fut in futures}
             
-            # 一次性AI分析所有币种
-            all_decisions = self.analyze_all_symbols_with_ai(all_symbols_data)
+            # 一次性AI分析所有币种（沿用周期开头的帐户快照）
+            all_decisions = self.analyze_all_symbols_with_ai(all_symbols_data, account_summary)
             
             # 执行每个币种的决策
             for symbol, decision in all_decisions.items():
                 self.log_ai.info(f"\n--- {symbol} ---")
                 market_data = all_symbols_data[symbol]['market_data']
-                self.execute_decision(symbol, decision, market_data)
-                position = self.position_data.get_current_position(symbol)
+                self._remember_position(symbol, all_symbols_data[symbol]['position'], fetched_at.get(symbol))
+                self.execute_decision(symbol, decision, market_data, account_summary)
+                if decision.get('action', 'HOLD') != 'HOLD':
+                    self.account_data.invalidate_summary()  # 下过单，下一个币种重新取帐户快照
+                    self.position_data.invalidate(symbol)   # 下面取执行后的持仓不能读到快取
+                    account_summary = self.account_data.get_account_summary()
+                    position = self.position_data.get_current_position(symbol)
+                else:
+                    # 没下单：持仓就是本周期开头取得的那份
+                    position = all_symbols_data[symbol]['position']
                 self.save_decision(symbol, decision, market_data , position)
                 
         else:
@@ -693,50 +867,91 @@ class TradingBot:
                 # 获取市场数据
                 market_data = self.get_market_data_for_symbol(symbol)
                 
-                # AI分析
-                decision = self.analyze_with_ai(symbol, market_data)
+                # AI分析（持仓只查一次，分析、保存与执行共用）
+                position_ts = time.monotonic()
+                position = self.position_data.get_current_position(symbol)
+                decision = self.analyze_with_ai(symbol, market_data, position)
                 
                 # 保存决策
-                self.save_decision(symbol, decision, market_data)
+                self.save_decision(symbol, decision, market_data, position)
                 
                 # 执行决策
-                self.execute_decision(symbol, decision, market_data)
+                self._remember_position(symbol, position, position_ts)
+                self.execute_decision(symbol, decision, market_data, account_summary)
+                if decision.get('action', 'HOLD') != 'HOLD':
+                    self.account_data.invalidate_summary()
+                    self.position_data.invalidate(symbol)
+                    account_summary = self.account_data.get_account_summary()
     
+    def _remember_position(self, symbol: str, position: Optional[Dict[str, Any]], fetched_at: Optional[float]) -> None:
+        """
+        把本周期查到的持仓交给主帐户执行器（position_data 与 trade_executor 用同一个客户端）；
+        交易所原始资料在 meta 里，格式同 client.get_position。对冲帐户是另一个帐户，不适用
+        """
+        raw = position.get('meta') if position else None
+        self.trade_executor.remember_position(symbol, raw or None, fetched_at)
+
     def run(self):
         """启动主循环"""
-        schedule_config = ConfigLoader.get_schedule_config(self.config)
-        interval_seconds = schedule_config['interval_seconds']
+        interval_seconds = self._interval_seconds
         
         self.log_ai.info(f"\n⏱️  交易周期: 每{interval_seconds}秒")
-        self.log_ai.info(f"📊 交易币种: {', '.join(ConfigLoader.get_trading_symbols(self.config))}")
+        self.log_ai.info(f"📊 交易币种: {', '.join(self._symbols)}")
         self.log_ai.info(f"\n按 Ctrl+C 停止运行\n")
         
         try:
+            # 以 monotonic 时钟排程（不受 NTP 校时跳动影响），next_tick 逐次累加，不会因周期耗时而漂移
+            next_tick = time.monotonic() + interval_seconds
             while True:
-                start_time = time.time()
-                
                 # 执行交易周期
-                self.run_cycle()
+                try:
+                    self.run_cycle()
+                finally:
+                    self.flush_history()  # 本周期的决策纪录一次写入
                 
                 # 等待下一个周期
-                elapsed = time.time() - start_time
-                sleep_time = max(0, interval_seconds - elapsed)
+                sleep_time = next_tick - time.monotonic()
+                if sleep_time < 0:
+                    # 周期超时：不睡直接进下一轮；落后超过一整个周期的 tick 略过，但保持原本的排程相位
+                    missed = int(-sleep_time // interval_seconds)
+                    self.log_ai.warning("⚠️ 交易周期超时 %.1f秒，略过 %d 个排程点", -sleep_time, missed)
+                    next_tick += (missed + 1) * interval_seconds
+                    continue
                 
-                if sleep_time > 0:
-                    self.log_ai.info(f"\n💤 等待 {sleep_time:.0f}秒...")
-                    time.sleep(sleep_time)
+                self.log_ai.info(f"\n💤 等待 {sleep_time:.0f}秒...")
+                # 下个周期开始前 _PREFETCH_LEAD 秒，在背景把快过期的资金费率 / 持仓量先抓好
+                if sleep_time > self._PREFETCH_LEAD:
+                    time.sleep(sleep_time - self._PREFETCH_LEAD)
+                    self._io_pool.submit(self._prefetch_market_data, self._symbols, next_tick)
+                time.sleep(max(0.0, next_tick - time.monotonic()))
+                next_tick += interval_seconds
                 
         except KeyboardInterrupt:
             self.log_ai.info("\n\n⚠️ 收到中断信号，正在安全退出...")
+        finally:
+            # 不论是 Ctrl+C 还是未预期的例外离开主循环，都要把伫列里的决策纪录写完
             self.shutdown()
     
+    def _prefetch_market_data(self, symbols: Tuple[str, ...], until: float) -> None:
+        """等待期间的背景预取：只抓有快取的慢变栏位，K 线与即时行情仍在周期内抓最新的"""
+        for symbol in symbols:
+            self.market_data.warm_slow_caches(symbol, until)
+
     def shutdown(self):
-        """优雅关闭"""
+        """优雅关闭（可重复呼叫，只执行一次）"""
+        if self._shut_down:
+            return
+        self._shut_down = True
         self.log_ai.info("\n" + "=" * 60)
         self.log_ai.info("🛑 交易机器人正在关闭...")
         self.log_ai.info("=" * 60)
         self.log_ai.info(f"✅ 本次运行交易次数: {self.trade_count}")
         self.log_ai.info(f"✅ 决策记录数量: {len(self.decision_history)}")
+        # 等背景执行绪把伫列里的纪录写完并关闭档案（执行绪已意外结束就不等，免得 join 卡住）
+        if self._writer_thread.is_alive():
+            self._hist_queue.put(('close', None))
+            self._hist_queue.join()
+        self._io_pool.shutdown(wait=False)
         self.log_ai.info("🎉 交易机器人已安全退出")
         self.log_ai.info("=" * 60)
 
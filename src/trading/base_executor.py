@@ -0,0 +1,385 @@
+"""
+交易执行共用基底
+TradeExecutor（主账户）与 Hedger（对冲账户）的开仓、平仓、TP/SL 流程完全相同，只差客户端与 logger 名称
+"""
+import time
+from typing import Dict, Any, Optional, Tuple, Union
+
+from binance.exceptions import BinanceAPIException
+
+from src.api.binance_client import BinanceClient
+from src.api.hedge_client import HedgeClient
+from src.utils.decorators import retry_on_failure, log_execution
+from src.utils.symbol_filters import SymbolFilters
+from src.utils.quant_nb import adjust_qty_steps
+from src.utils.logger import get_logger
+
+
+# 重送也不会成功的下单错误：保证金不足、数量/价格精度、低于最小名义金额、reduceOnly 被拒、数量 <= 0
+_FATAL_ORDER_CODES = frozenset((-2019, -1111, -4164, -2022, -4003))
+
+
+def _no_retry(e: Exception) -> bool:
+    """retry_on_failure 的 giveup：参数错误与上述交易所错误码直接抛出，不再重试"""
+    if isinstance(e, ValueError):
+        return True
+    return isinstance(e, BinanceAPIException) and e.code in _FATAL_ORDER_CODES
+
+
+class BaseExecutor:
+    """交易执行基底：子类只需指定 log_name"""
+
+    log_name = "trade"
+
+    def __init__(self, client: Union[BinanceClient, HedgeClient], config: Dict[str, Any]):
+        """
+        初始化交易执行器
+
+        Args:
+            client: Binance API客户端（主账户或对冲账户）
+            config: 交易配置
+        """
+        self.client = client
+        self.config = config
+        self.position_manager = None  # 将在外部设置
+        self.log = get_logger(self.log_name)  # 專用交易 logger
+        # 交易规则快取：symbol -> (取得时的 monotonic 时间, SymbolFilters)；每笔下单会用到 2~3 次
+        self._filter_cache: Dict[str, Tuple[float, SymbolFilters]] = {}
+        self.filters_ttl = 3600.0
+        # 名义金额检查用的参考价快取：symbol -> (价格, monotonic 时间)，price_ttl 秒内不再打 ticker
+        self._last_prices: Dict[str, Tuple[float, float]] = {}
+        self.price_ttl = 5.0
+        # 持仓快照：symbol -> (monotonic 时间, get_position 的原始结果)；position_ttl 秒内平仓不必再查一次，
+        # 本执行器下过单就丢掉该 symbol 的快照
+        self._position_cache: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+        self.position_ttl = 1.0
+    # --------------------- 内部工具 ---------------------
+
+    def _get_filters(self, symbol: str) -> SymbolFilters:
+        ts, f = self._filter_cache.get(symbol, (0.0, None))
+        now = time.monotonic()
+        if f is None or now - ts > self.filters_ttl:
+            f = self.client.get_symbol_filters(symbol)
+            self._filter_cache[symbol] = (now, f)
+        return f
+
+    def remember_position(self, symbol: str, position: Optional[Dict[str, Any]],
+                          fetched_at: Optional[float] = None) -> None:
+        """
+        呼叫端已有刚查到的持仓（client.get_position 的结果，None = 无持仓）时交给执行器，
+        position_ttl 秒内的平仓直接使用。fetched_at：查询当时的 time.monotonic()，预设为现在；
+        快照一样按查询时间过期，不会拿旧持仓去平仓
+        """
+        self._position_cache[symbol] = (time.monotonic() if fetched_at is None else fetched_at, position)
+
+    def invalidate_position(self, symbol: Optional[str] = None) -> None:
+        """清掉持仓快照；symbol=None 时全部清掉"""
+        if symbol is None:
+            self._position_cache.clear()
+        else:
+            self._position_cache.pop(symbol, None)
+
+    def _get_position(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """position_ttl 秒内的快照优先，过期或没有才打 REST"""
+        hit = self._position_cache.get(symbol)
+        if hit is not None and time.monotonic() - hit[0] <= self.position_ttl:
+            return hit[1]
+        position = self.client.get_position(symbol)
+        self._position_cache[symbol] = (time.monotonic(), position)
+        return position
+
+    def _place_market_order(self, symbol: str, **kwargs) -> Dict[str, Any]:
+        """下市价单；不论成功与否（逾时也可能已成交）都丢掉该 symbol 的持仓快照"""
+        try:
+            return self.client.create_market_order(symbol=symbol, **kwargs)
+        finally:
+            self._position_cache.pop(symbol, None)
+
+    def _reference_price(self, symbol: str, reference_price: Optional[float] = None) -> float:
+        """名义金额检查用的价格：呼叫端给的参考价 > price_ttl 秒内的快取 > 最后才查 ticker"""
+        now = time.monotonic()
+        # 参考价可能是交易所字串（如 markPrice "0.00"），<= 0 视同没给，免得名义金额换算出天量数量
+        price = float(reference_price) if reference_price else 0.0
+        if price <= 0:
+            hit = self._last_prices.get(symbol)
+            if hit is not None and now - hit[1] <= self.price_ttl:
+                return hit[0]
+            t = self.client.get_ticker(symbol)
+            p = t.get("lastPrice") or t.get("price") or t.get("markPrice")
+            price = float(p)
+        self._last_prices[symbol] = (price, now)
+        return price
+
+    def _ensure_qty_price(self, symbol: str, quantity: float, price: Optional[float] = None,
+                          reference_price: Optional[float] = None):
+        """
+        根据交易对过滤规则修正数量/价格，并确保满足最小名义金额。
+        reference_price：市价单（price 为 None）时名义金额检查用的参考价，未给才查 ticker
+        返回 (adj_qty_str, adj_price_str, used_price_float)
+        """
+        filters = self._get_filters(symbol)
+
+        # price used for notional checks
+        if price is not None:
+            used_price = float(price)
+        else:
+            used_price = self._reference_price(symbol, reference_price)
+
+        # 按 stepSize 取整 & 补足最小名义金额（向上取到满足的 step 数），再交回 filters 转成 API 用的字串
+        steps = adjust_qty_steps(float(quantity), used_price, filters.step_f, filters.min_notional_f)
+        adj_qty_str = filters.qty_from_steps(steps)                 # string
+        adj_price_str = None if price is None else filters.quantize_price(price)  # string or None
+
+        return adj_qty_str, adj_price_str, used_price  # used_price stays float
+
+    def _wait_filled(self, symbol: str, order: Optional[Dict[str, Any]],
+                     attempts: int = 10, interval: float = 0.1) -> bool:
+        """
+        轮询订单直到 FILLED（最多 attempts 次，每次间隔 interval 秒），取代固定 sleep；
+        市价单通常一两次就成交。逾时也返回（False），由呼叫端照常继续
+        """
+        if not order:
+            return False
+        if order.get('status') == 'FILLED':
+            return True
+        order_id = order.get('orderId')
+        if order_id is None:
+            time.sleep(attempts * interval)  # 拿不到 orderId 无从查询，退回原本的固定等待
+            return False
+        for _ in range(attempts):
+            try:
+                o = self.client.get_order(symbol, order_id)
+            except Exception as e:
+                # 市价单已经送出：查询逾时 / 断线不能往外抛，否则上层重试会再下一张单
+                self.log.info("⚠️ %s 查询订单 %s 失败（不再等待成交）: %s", symbol, order_id, e)
+                return False
+            if o and o.get('status') == 'FILLED':
+                return True
+            time.sleep(interval)
+        return False
+
+    def _quantize_stop_prices(self, symbol: str, take_profit: Optional[float], stop_loss: Optional[float]):
+        filters = self._get_filters(symbol)
+        tp = None if take_profit is None else filters.quantize_price(take_profit)  # string
+        sl = None if stop_loss is None else filters.quantize_price(stop_loss)      # string
+        return tp, sl
+
+    # ==================== 开仓 ====================
+
+    @retry_on_failure(max_retries=3, delay=0.25, backoff='expo', giveup=_no_retry)
+    def _open_market(self, symbol: str, side: str, quantity: float, leverage: Optional[int],
+                     reference_price: Optional[float]) -> Tuple[Dict[str, Any], str]:
+        """
+        调整杠杆 → 量化数量 → 下市价单，返回 (order, adj_qty)。
+        重试只包到下单为止：下单成功后的等待成交与 TP/SL 失败不会让整段重来、重复开仓
+        """
+        if leverage and leverage > 1:
+            try:
+                self.client.change_leverage(symbol, leverage)  # REST 回应即代表已生效，不必再等
+            except Exception as e:
+                self.log.info("⚠️ 调整杠杆失败（继续开仓）: %s", e)
+
+        # 量化数量 & 名义金额检查
+        adj_qty, _, _ = self._ensure_qty_price(symbol, quantity, reference_price=reference_price)
+        if float(adj_qty) <= 0:
+            raise ValueError(f"{symbol} 数量无效（量化后<=0）")
+
+        order = self._place_market_order(symbol, side=side, quantity=adj_qty)
+        return order, adj_qty
+
+    def _open(self, symbol: str, side: str, quantity: float, leverage: Optional[int],
+              take_profit: Optional[float], stop_loss: Optional[float],
+              reference_price: Optional[float]) -> Dict[str, Any]:
+        """open_long（BUY）/ open_short（SELL）共用流程"""
+        label = "开多仓" if side == 'BUY' else "开空仓"
+        try:
+            order, adj_qty = self._open_market(symbol, side, quantity, leverage, reference_price)
+        except Exception as e:
+            self.log.info("❌ %s失败: %s", label, e)
+            raise
+        self.log.info("✅ %s成功: %s %s", label, symbol, adj_qty)
+
+        # 设置止盈止损（量化 stopPrice）；已经开仓，这里失败只记 log，不再往外抛
+        if take_profit or stop_loss:
+            try:
+                self._wait_filled(symbol, order)  # 等待订单成交
+                # 用「覆蓋式」TP/SL，會先清掉舊的
+                self.update_take_profit_stop_loss(
+                    symbol=symbol,
+                    side=side,
+                    quantity=adj_qty,
+                    take_profit=take_profit,
+                    stop_loss=stop_loss
+                )
+            except Exception as e:
+                self.log.info("⚠️ %s 已%s，但设置止盈止损失败: %s", symbol, label, e)
+
+        return order
+
+    @log_execution
+    def open_long(self, symbol: str, quantity: float, leverage: int = None,
+                  take_profit: float = None, stop_loss: float = None,
+                  reference_price: float = None) -> Dict[str, Any]:
+        """
+        开多仓
+        reference_price：下单参考价（呼叫端已有的最新价），用于名义金额检查，省一次 ticker 请求
+        """
+        self.log.info("OPEN_LONG %s qty=%s lev=%s", symbol, quantity, leverage)
+        return self._open(symbol, 'BUY', quantity, leverage, take_profit, stop_loss, reference_price)
+
+    @log_execution
+    def open_short(self, symbol: str, quantity: float, leverage: int = None,
+                   take_profit: float = None, stop_loss: float = None,
+                   reference_price: float = None) -> Dict[str, Any]:
+        """
+        开空仓
+        reference_price：下单参考价（呼叫端已有的最新价），用于名义金额检查，省一次 ticker 请求
+        """
+        self.log.info("OPEN_SHORT %s qty=%s lev=%s", symbol, quantity, leverage)
+        return self._open(symbol, 'SELL', quantity, leverage, take_profit, stop_loss, reference_price)
+
+    # ==================== 平仓 ====================
+
+    @log_execution
+    @retry_on_failure(max_retries=3, delay=0.25, backoff='expo', giveup=_no_retry)
+    def close_position(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        平仓（平掉整个持仓）
+        会自动判断当前持仓方向并执行反向操作
+        """
+        self.log.info("CLOSE_POSITION %s", symbol)
+        try:
+            position = self._get_position(symbol)
+            amt = float(position.get('positionAmt', 0)) if position else 0.0
+            if amt == 0:
+                self.log.info("⚠️ %s 无持仓", symbol)
+                return None
+
+            # 持仓方向：正数=多仓 → 用 SELL 平；负数=空仓 → 用 BUY 平
+            side = 'SELL' if amt > 0 else 'BUY'
+            amount = abs(amt)
+
+            # 撤销所有挂单
+            try:
+                self.client.cancel_all_orders(symbol)
+            except Exception:
+                pass
+
+            # 量化平仓数量（有的symbol需要按stepSize）
+            adj_qty, _, _ = self._ensure_qty_price(symbol, amount, reference_price=position.get('markPrice'))
+            if float(adj_qty) <= 0:
+                self.log.info("⚠️ %s 平仓数量量化后为0，跳过", symbol)
+                return None
+
+            order = self._place_market_order(
+                symbol,
+                side=side,
+                quantity=adj_qty
+            )
+            self.log.info("✅ 平仓成功: %s %s %s", symbol, side, adj_qty)
+            return order
+
+        except Exception as e:
+            self.log.info("❌ 平仓失败 %s: %s", symbol, e)
+            raise
+
+    def close_position_partial(self, symbol: str, percentage: float) -> Optional[Dict[str, Any]]:
+        """
+        部分平仓
+        """
+        self.log.info("CLOSE_PARTIAL %s pct=%.2f", symbol, percentage)
+        if not 0 < percentage <= 1:
+            raise ValueError("平仓比例必须在0-1之间")
+
+        try:
+            position = self._get_position(symbol)
+            amt = float(position.get('positionAmt', 0)) if position else 0.0
+            if amt == 0:
+                self.log.info("⚠️ %s 无持仓", symbol)
+                return None
+
+            total_amount = abs(amt)
+            close_amount = total_amount * percentage
+
+            side = 'SELL' if amt > 0 else 'BUY'
+
+            # 量化数量 & 名义金额检查
+            adj_qty, _, _ = self._ensure_qty_price(symbol, close_amount, reference_price=position.get('markPrice'))
+            if float(adj_qty) <= 0:
+                self.log.info("⚠️ %s 部分平仓数量量化后为0，跳过", symbol)
+                return None
+
+            order = self._place_market_order(
+                symbol,
+                side=side,
+                quantity=adj_qty,
+                reduceOnly=True   # ← 關鍵：確保只會減少現有倉位
+            )
+
+            self.log.info("✅ 部分平仓成功: %s %s (%s%%)", symbol, adj_qty, percentage*100)
+            return order
+
+        except Exception as e:
+            self.log.info("❌ 部分平仓失败 %s: %s", symbol, e)
+            raise
+
+    def force_close_position(self, symbol: str, reason: str) -> Optional[Dict[str, Any]]:
+        """强制平仓（风控触发）"""
+        self.log.info("🚨 强制平仓: %s, 原因: %s", symbol, reason)
+        return self.close_position(symbol)
+
+    # ==================== 止盈止损 ====================
+
+    def _set_take_profit_stop_loss(self, symbol: str, side: str, quantity: float,
+                                   take_profit: float = None, stop_loss: float = None):
+        """设置止盈止损（量化 stopPrice 到 tickSize）"""
+        try:
+            tp, sl = self._quantize_stop_prices(symbol, take_profit, stop_loss)
+            orders = self.client.set_take_profit_stop_loss(
+                symbol=symbol,
+                side=side,
+                quantity=quantity,          # 数量已在开仓时量化
+                take_profit_price=tp,
+                stop_loss_price=sl
+            )
+
+            if tp:
+                self.log.info("   📈 止盈价: $%s", tp)
+            if sl:
+                self.log.info("   🛑 止损价: $%s", sl)
+
+        except Exception as e:
+            self.log.info("⚠️ 设置止盈止损失败: %s", e)
+    
+    def update_take_profit_stop_loss(self, symbol: str, side: str,
+                                 quantity: float,
+                                 take_profit: float = None,
+                                 stop_loss: float = None):
+        """
+        先清舊的 TP/SL/STOP 類單，再依目前設定建立新的。
+        """
+        self.log.info("UPDATE_TP_SL %s tp=%s sl=%s (will cancel old)", symbol, take_profit, stop_loss)
+        try:
+            # 先砍掉會關倉的舊條件單，避免累積
+            try:
+                self.client.cancel_close_orders(symbol)
+            except Exception as e:
+                self.log.info("⚠️ 清除舊 TP/SL 失敗（繼續覆蓋）: %s", e)
+
+            # 再設新的
+            tp, sl = self._quantize_stop_prices(symbol, take_profit, stop_loss)
+            self.client.set_take_profit_stop_loss(
+                symbol=symbol,
+                side=side,
+                quantity=quantity,
+                take_profit_price=tp,
+                stop_loss_price=sl
+            )
+
+            if tp:
+                self.log.info("   📈 新止盈價: $%s", tp)
+            if sl:
+                self.log.info("   🛑 新止損價: $%s", sl)
+
+        except Exception as e:
+            self.log.info("⚠️ 更新 TP/SL 失敗: %s", e)
\ No newline at end of file
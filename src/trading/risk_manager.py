@@ -2,7 +2,8 @@
 风险管理器
 负责风险控制和检查
 """
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 
 
@@ -20,7 +21,17 @@ class RiskManager:
         self.daily_loss = 0.0  # 今日亏损
         self.daily_start_balance = 0.0  # 今日起始余额
         self.consecutive_losses = 0  # 连续亏损次数
-        self.last_reset_date = datetime.now().date()
+        # 下一个本地午夜的 epoch 秒数；每次检查只比较一个浮点数，跨日时才重新计算
+        self._next_reset_ts = self._next_midnight_ts()
+
+        # 风控参数在运行期间不变，建构时读一次
+        trading_config = config.get('trading', {})
+        risk_config = config.get('risk', {})
+        self._min_percent = trading_config.get('min_position_percent', 10) / 100
+        self._max_percent = trading_config.get('max_position_percent', 30) / 100
+        self._reserve_percent = trading_config.get('reserve_percent', 20) / 100
+        self._max_loss_percent = risk_config.get('max_daily_loss_percent', 10) / 100
+        self._max_consecutive = risk_config.get('max_consecutive_losses', 5)
     
     def check_position_size(self, symbol: str, quantity: float, price: float,
                            total_equity: float) -> tuple[bool, str]:
@@ -30,11 +41,9 @@ class RiskManager:
         Returns:
             (是否通过, 错误消息)
         """
-        trading_config = self.config.get('trading', {})
-        
-        min_percent = trading_config.get('min_position_percent', 10) / 100
-        max_percent = trading_config.get('max_position_percent', 30) / 100
-        reserve_percent = trading_config.get('reserve_percent', 20) / 100
+        min_percent = self._min_percent
+        max_percent = self._max_percent
+        reserve_percent = self._reserve_percent
         
         # 计算持仓价值
         position_value = quantity * price
@@ -54,22 +63,30 @@ class RiskManager:
         
         return True, ""
     
-    def check_max_daily_loss(self, current_balance: float) -> tuple[bool, str]:
+    @staticmethod
+    def _next_midnight_ts() -> float:
+        """下一个本地午夜（明天 00:00）的 epoch 秒数"""
+        tomorrow = datetime.now().date() + timedelta(days=1)
+        return datetime(tomorrow.year, tomorrow.month, tomorrow.day).timestamp()
+    
+    def check_max_daily_loss(self, current_balance: float,
+                             now: Optional[float] = None) -> tuple[bool, str]:
         """
         检查每日最大亏损
         
+        Args:
+            now: 目前的 time.time()（呼叫端连续检查多笔时可共用同一个值），预设现取
+        
         Returns:
             (是否通过, 错误消息)
         """
-        # 检查是否需要重置日期
-        current_date = datetime.now().date()
-        if current_date != self.last_reset_date:
+        # 检查是否需要重置日期：跨过本地午夜才重置
+        if (now if now is not None else time.time()) >= self._next_reset_ts:
             self.daily_loss = 0.0
             self.daily_start_balance = current_balance
-            self.last_reset_date = current_date
+            self._next_reset_ts = self._next_midnight_ts()
         
-        risk_config = self.config.get('risk', {})
-        max_loss_percent = risk_config.get('max_daily_loss_percent', 10) / 100
+        max_loss_percent = self._max_loss_percent
         
         if self.daily_start_balance == 0:
             self.daily_start_balance = current_balance
@@ -90,8 +107,7 @@ class RiskManager:
         Returns:
             (是否通过, 错误消息)
         """
-        risk_config = self.config.get('risk', {})
-        max_consecutive = risk_config.get('max_consecutive_losses', 5)
+        max_consecutive = self._max_consecutive
         
         if self.consecutive_losses >= max_consecutive:
             return False, f"触发最大连续亏损限制（{self.consecutive_losses}次 >= {max_consecutive}次）"
@@ -113,10 +129,14 @@ class RiskManager:
             self.consecutive_losses = 0
     
     def check_all_risk_limits(self, symbol: str, quantity: float, price: float,
-                              total_equity: float, current_balance: float) -> tuple[bool, list]:
+                              total_equity: float, current_balance: float,
+                              now: Optional[float] = None) -> tuple[bool, list]:
         """
         检查所有风险限制
         
+        Args:
+            now: 传给 check_max_daily_loss 的 time.time()（选填）
+        
         Returns:
             (是否通过, 错误消息列表)
         """
@@ -128,7 +148,7 @@ class RiskManager:
             errors.append(msg)
         
         # 检查每日亏损
-        ok, msg = self.check_max_daily_loss(current_balance)
+        ok, msg = self.check_max_daily_loss(current_balance, now)
         if not ok:
             errors.append(msg)
         
@@ -3,20 +3,32 @@
 用于错误处理、重试等
 """
 import time
+import random
 import functools
-from typing import Callable, Any
+from typing import Callable, Any, Optional
+
+from src.utils.logger import get_logger
+
+_log = get_logger("system")
 
 
 def retry_on_failure(max_retries: int = 3, delay: float = 1.0, 
-                     exceptions: tuple = (Exception,)):
+                     exceptions: tuple = (Exception,), backoff: str = 'fixed',
+                     max_delay: float = 5.0, jitter: float = 0.1,
+                     giveup: Optional[Callable[[Exception], bool]] = None):
     """
     失败重试装饰器
     
     Args:
         max_retries: 最大重试次数
-        delay: 重试延迟（秒）
+        delay: 重试延迟（秒）；backoff='expo' 时为第一次的延迟
         exceptions: 捕获的异常类型
+        backoff: 'fixed' 每次等 delay；'expo' 依次等 delay * 2**i（最多 max_delay）再加 0~jitter 秒随机抖动，
+                 多个请求同时被限流时不会在同一时刻一起重送
+        giveup: 判断异常不值得重试的函式（如保证金不足、数量无效），返回 True 时直接抛出
     """
+    expo = backoff == 'expo'
+
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         def wrapper(*args, **kwargs) -> Any:
@@ -25,12 +37,17 @@ def retry_on_failure(max_retries: int = 3, delay: float = 1.0,
                 try:
                     return func(*args, **kwargs)
                 except exceptions as e:
+                    if giveup is not None and giveup(e):
+                        raise
                     last_exception = e
                     if i < max_retries - 1:
-                        print(f"⚠️ {func.__name__} 失败 (尝试 {i+1}/{max_retries}): {e}")
-                        time.sleep(delay)
+                        _log.info("⚠️ %s 失败 (尝试 %d/%d): %s", func.__name__, i + 1, max_retries, e)
+                        if expo:
+                            time.sleep(min(max_delay, delay * 2 ** i) + random.uniform(0, jitter))
+                        else:
+                            time.sleep(delay)
             # 所有重试都失败
-            print(f"❌ {func.__name__} 失败，已重试 {max_retries} 次")
+            _log.info("❌ %s 失败，已重试 %d 次", func.__name__, max_retries)
             raise last_exception
         return wrapper
     return decorator
@@ -41,16 +58,16 @@ def log_execution(func: Callable) -> Callable:
     @functools.wraps(func)
     def wrapper(*args, **kwargs) -> Any:
         func_name = func.__name__
-        print(f"📋 执行: {func_name}")
+        _log.info("📋 执行: %s", func_name)
         start_time = time.time()
         try:
             result = func(*args, **kwargs)
             elapsed = time.time() - start_time
-            print(f"✅ 完成: {func_name} (耗时: {elapsed:.2f}s)")
+            _log.info("✅ 完成: %s (耗时: %.2fs)", func_name, elapsed)
             return result
         except Exception as e:
             elapsed = time.time() - start_time
-            print(f"❌ 失败: {func_name} (耗时: {elapsed:.2f}s): {e}")
+            _log.info("❌ 失败: %s (耗时: %.2fs): %s", func_name, elapsed, e)
             raise
     return wrapper
 
@@ -1,18 +1,94 @@
 import httpx
 import asyncio
-import os
+import atexit
+import threading
+from concurrent.futures import Future
 from datetime import datetime
 from typing import Optional
 
+from src.config.env_manager import EnvManager
+from src.utils.http_pool import HAS_H2
+from src.utils.json_utils import dumps_bytes
+from src.utils.logger import get_logger
 
+_log = get_logger("system")
+
+# 整个程序共用一个 AsyncClient 与一个事件循环：连线保持 keep-alive，之后的通知不必再做 TCP + TLS 握手。
+# loop 在背景 daemon 执行绪上 run_forever，呼叫端只把协程丢过去，不等建 loop 也不等网路往返。
+# AsyncClient 的连线绑在建立它的 loop 上，只能在这个 loop 里使用
+_CLIENT: Optional[httpx.AsyncClient] = None
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+_SEND_LOCK: Optional[asyncio.Lock] = None  # 只在背景 loop 里使用：通知依呼叫顺序逐则送出
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """第一次发送通知时才建立 loop 与背景执行绪"""
+    global _LOOP
+    if _LOOP is None:
+        with _LOOP_LOCK:
+            if _LOOP is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="discord-loop", daemon=True).start()
+                _LOOP = loop
+    return _LOOP
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = httpx.AsyncClient(
+            timeout=10,
+            http2=HAS_H2,
+            limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=60),
+        )
+    return _CLIENT
+
+
+async def _drain_and_close(timeout: float) -> None:
+    """等尚未送完的通知（最多 timeout 秒），再关闭 AsyncClient"""
+    global _CLIENT
+    pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    if pending:
+        await asyncio.wait(pending, timeout=timeout)
+    if _CLIENT is not None:
+        await _CLIENT.aclose()
+        _CLIENT = None
+
+
+@atexit.register
+def _close_client() -> None:
+    loop = _LOOP
+    if loop is None or not loop.is_running():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(_drain_and_close(5.0), loop).result(timeout=6.0)
+    except Exception:
+        pass
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def _log_failure(fut: Future) -> None:
+    if not fut.cancelled() and fut.exception() is not None:
+        _log.info("⚠️ Discord通知发送失败: %s", fut.exception())
+
+
+# 不在 import 时读环境变量：main 先 import 本模组、之后才 load_env_file，届时 .env 的值尚未载入。
+# 改用 EnvManager 的快取 getter，第一次呼叫读一次，load_env_file 会自动清掉重读
 def get_webhook_url() -> Optional[str]:
     """获取Discord webhook URL from environment variable"""
-    return os.getenv('DISCORD_WEBHOOK_URL')
+    return EnvManager.get_discord_webhook_url()
 
 
 def get_account_tag() -> Optional[str]:
     """获取Discord账户标签 from environment variable"""
-    return os.getenv('DISCORD_ACCOUNT_TAG')
+    return EnvManager.get_discord_account_tag()
+
+
+def refresh_config() -> None:
+    """程式内改了 os.environ 之后呼叫，让下一则通知读到新的 webhook URL / 账户标签"""
+    EnvManager.clear_cache()
 
 
 async def send_discord(content: str, account_tag: Optional[str] = None):
@@ -39,26 +115,35 @@ async def send_discord(content: str, account_tag: Optional[str] = None):
         "username": "DeepSeekBit",
         "avatar_url": "https://www.tw-pool.com/static/icons/ore.png",
     }
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.post(webhook_url, json=payload)
-        r.raise_for_status()
+    # 自行序列化（有 orjson 时走 C 实作）后以 content= 送出，不经 httpx 内部的标准库 json
+    r = await _get_client().post(webhook_url, content=dumps_bytes(payload, indent=False), headers=_JSON_HEADERS)
+    r.raise_for_status()
+
+
+async def _send_in_order(content: str, account_tag: Optional[str]) -> None:
+    global _SEND_LOCK
+    if _SEND_LOCK is None:
+        _SEND_LOCK = asyncio.Lock()
+    async with _SEND_LOCK:
+        await send_discord(content, account_tag)
 
 
-def notify_discord(content: str, account_tag: Optional[str] = None):
+def notify_discord(content: str, account_tag: Optional[str] = None) -> Future:
     """
-    同步程式方便使用
+    同步程式方便使用：交给背景 loop 发送后立即返回（不等待结果）
     
     Args:
         content: 消息内容
         account_tag: 账户标签（可选），如果未提供则从环境变量读取
+
+    Returns:
+        concurrent.futures.Future；需要确认已送出时可呼叫 .result()
     """
     # 如果未提供account_tag，尝试从环境变量读取
     if account_tag is None:
         account_tag = get_account_tag()
     
-    try:
-        asyncio.run(send_discord(content, account_tag))
-    except RuntimeError:
-        # 若 loop 已存在（如在 async 環境中）
-        loop = asyncio.get_event_loop()
-        loop.create_task(send_discord(content, account_tag))
\ No newline at end of file
+    # 不论呼叫端是否在 async 环境中，一律丢到背景 loop；失败只记 log，不影响交易流程
+    fut = asyncio.run_coroutine_threadsafe(_send_in_order(content, account_tag), _get_loop())
+    fut.add_done_callback(_log_failure)
+    return fut
\ No newline at end of file
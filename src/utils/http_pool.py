@@ -0,0 +1,37 @@
+"""
+HTTP 连线池
+requests.Session 挂上加大的 HTTPAdapter：同一主机的连线以 keep-alive 重复使用，
+多执行绪并行请求时也不会因池太小（requests 预设 10）而反复新建 TCP + TLS 连线。
+HAS_H2：是否装了 h2，httpx 客户端据此决定要不要开 HTTP/2
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import h2  # noqa: F401  可选：httpx 的 HTTP/2 支援，未安装时维持 HTTP/1.1
+    HAS_H2 = True
+except ImportError:  # pragma: no cover
+    HAS_H2 = False
+
+
+def mount_pool(session: requests.Session, pool_maxsize: int = 32,
+               pool_connections: int = 16) -> requests.Session:
+    """
+    在既有 session 的 http:// 与 https:// 挂上连线池，返回同一个 session
+    Retry 只重试连线 / 读取错误，且 urllib3 预设不重试 POST，下单请求不会被重送
+    """
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=Retry(total=3, backoff_factor=0.2),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+
+def pooled_session(pool_maxsize: int = 32, pool_connections: int = 16) -> requests.Session:
+    """建立一个已挂上连线池的新 session（不带任何预设标头）"""
+    return mount_pool(requests.Session(), pool_maxsize, pool_connections)
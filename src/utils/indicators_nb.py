@@ -0,0 +1,263 @@
+"""
+Numba 指标 kernel（提示词用的「最近 tail 个值」序列）
+与 PromptBuilder 原本的 pandas 定义逐值一致：
+- RSI：period 期 gain/loss 简单平均（非 Wilder）
+- MACD：EMA(fast/slow, adjust=False) 与 signal EMA，自序列开头递推
+未安装 numba 时此模组仍可 import，但请改用 NumPy 版本（见 HAS_NUMBA）。
+"""
+import numpy as np
+
+from src.utils.jit import HAS_NUMBA, njit
+
+
+@njit(cache=True)
+def rsi_tail(close, period=14, tail=10):
+    """最近 tail 个 RSI(period)（旧→新）；close 长度需 >= period + tail"""
+    n = close.shape[0]
+    out = np.empty(tail)
+    for k in range(tail):
+        i = n - tail + k
+        gain = 0.0
+        loss = 0.0
+        # 每个窗口各自加总（与 rolling().mean() 数值一致，不累积滑动误差）
+        for j in range(i - period + 1, i + 1):
+            d = close[j] - close[j - 1]
+            if d > 0.0:
+                gain += d
+            elif d < 0.0:
+                loss -= d
+        avg_gain = gain / period
+        avg_loss = loss / period
+        if avg_loss == 0.0:
+            out[k] = 100.0 if avg_gain > 0.0 else np.nan
+        else:
+            out[k] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    return out
+
+
+@njit(cache=True)
+def macd_tail(close, fast_period=12, slow_period=26, signal_period=9, tail=10):
+    """最近 tail 个 MACD 快线与柱状图（旧→新）；close 长度需 >= tail"""
+    n = close.shape[0]
+    macd = np.empty(tail)
+    hist = np.empty(tail)
+    a_fast = 2.0 / (fast_period + 1.0)
+    a_slow = 2.0 / (slow_period + 1.0)
+    a_sig = 2.0 / (signal_period + 1.0)
+    fast = close[0]
+    slow = close[0]
+    sig = 0.0
+    start = n - tail
+    for i in range(n):
+        x = close[i]
+        fast = a_fast * x + (1.0 - a_fast) * fast
+        slow = a_slow * x + (1.0 - a_slow) * slow
+        m = fast - slow
+        if i == 0:
+            sig = m
+        else:
+            sig = a_sig * m + (1.0 - a_sig) * sig
+        if i >= start:
+            macd[i - start] = m
+            hist[i - start] = m - sig
+    return macd, hist
+
+
+@njit(cache=True)
+def boll_tail(close, window=20, tail=10):
+    """
+    最近 tail 组布林带 (upper, middle, lower)（旧→新）；close 长度需 >= window + tail - 1
+    第一个窗口两趟算出均值与平方差和，之后每滑一格以 Welford 增量更新（加新值、减旧值），
+    只需 O(window + tail)，且不像 sum / sum-of-squares 在高价位时有相消误差。
+    """
+    n = close.shape[0]
+    upper = np.empty(tail)
+    middle = np.empty(tail)
+    lower = np.empty(tail)
+    first = n - tail - window + 1
+    mean = 0.0
+    for t in range(first, first + window):
+        mean += close[t]
+    mean /= window
+    m2 = 0.0
+    for t in range(first, first + window):
+        dv = close[t] - mean
+        m2 += dv * dv
+    for k in range(tail):
+        if k > 0:
+            x_new = close[first + window - 1 + k]
+            x_old = close[first + k - 1]
+            old_mean = mean
+            mean += (x_new - x_old) / window
+            m2 += (x_new - x_old) * (x_new - mean + x_old - old_mean)
+            if m2 < 0.0:
+                m2 = 0.0
+        std = np.sqrt(m2 / (window - 1))
+        middle[k] = mean
+        upper[k] = mean + std * 2.0
+        lower[k] = mean - std * 2.0
+    return upper, middle, lower
+
+
+@njit(cache=True)
+def indicators_tail(high, low, close, tail=10, kdj_n=9, boll_window=20):
+    """
+    单一 timeframe 的融合 kernel：一次走完 high/low/close，返回最近 tail 个值（旧→新）
+    (rsi, macd, hist, k, d, j, boll_upper, boll_middle, boll_lower)
+    - RSI(14) / MACD(12,26,9)：同 rsi_tail / macd_tail
+    - KDJ：RSV = (C - LLV) / (HHV - LLV) * 100，NaN（不足 n 根或 HHV == LLV）补 50、夹在 [0, 100]，
+      K/D 自 50 起以 2/3、1/3 递推，J = 3K - 2D
+    - BOLL：window 期均值 ± 2 倍样本标准差（ddof=1）
+    close 长度需 >= max(24, boll_window + tail - 1)
+    """
+    n = close.shape[0]
+    rsi = rsi_tail(close, 14, tail)
+    macd, hist = macd_tail(close, 12, 26, 9, tail)
+
+    k_out = np.empty(tail)
+    d_out = np.empty(tail)
+    j_out = np.empty(tail)
+    start = n - tail
+    k_prev = 50.0
+    d_prev = 50.0
+    for i in range(n):
+        rsv = 50.0
+        if i >= kdj_n - 1:
+            lo = low[i]
+            hi = high[i]
+            for t in range(i - kdj_n + 1, i):
+                if low[t] < lo:
+                    lo = low[t]
+                if high[t] > hi:
+                    hi = high[t]
+            num = close[i] - lo
+            den = hi - lo
+            if den != 0.0:
+                rsv = num / den * 100.0
+            elif num > 0.0:
+                rsv = 100.0
+            elif num < 0.0:
+                rsv = 0.0
+            if rsv < 0.0:
+                rsv = 0.0
+            elif rsv > 100.0:
+                rsv = 100.0
+        k_val = (2.0 / 3.0) * k_prev + (1.0 / 3.0) * rsv
+        d_val = (2.0 / 3.0) * d_prev + (1.0 / 3.0) * k_val
+        if i >= start:
+            k_out[i - start] = k_val
+            d_out[i - start] = d_val
+            j_out[i - start] = 3.0 * k_val - 2.0 * d_val
+        k_prev = k_val
+        d_prev = d_val
+
+    upper, middle, lower = boll_tail(close, boll_window, tail)
+
+    return rsi, macd, hist, k_out, d_out, j_out, upper, middle, lower
+
+
+# ---------------------------------------------------------------------------
+# MarketDataManager._compute_indicators 用的「最新一个值」kernel
+# 与 src.utils.indicators 的 calculate_*（pandas ewm(adjust=False) / rolling）语意相同
+# ---------------------------------------------------------------------------
+@njit(cache=True)
+def _ewm_step(w, x, alpha):
+    """pandas ewm(adjust=False) 的单步更新（含其正规化除法与「值相同不更新」的判断）"""
+    if w != x:
+        old_wt = 1.0 - alpha
+        return (old_wt * w + alpha * x) / (old_wt + alpha)
+    return w
+
+
+@njit(cache=True)
+def ema_last(x, span):
+    """EMA(span, adjust=False) 的最后一个值；x 需非空"""
+    alpha = 2.0 / (span + 1.0)
+    w = x[0]
+    for i in range(1, x.shape[0]):
+        w = _ewm_step(w, x[i], alpha)
+    return w
+
+
+@njit(cache=True)
+def rsi_wilder_last(close, period=14):
+    """Wilder RSI 最后一个值（同 calculate_rsi）；最后的平均跌幅为 0 时返回 NaN"""
+    alpha = 1.0 / period
+    d = close[1] - close[0]
+    avg_gain = d if d > 0.0 else 0.0
+    avg_loss = -d if d < 0.0 else 0.0
+    for i in range(2, close.shape[0]):
+        d = close[i] - close[i - 1]
+        avg_gain = _ewm_step(avg_gain, d if d > 0.0 else 0.0, alpha)
+        avg_loss = _ewm_step(avg_loss, -d if d < 0.0 else 0.0, alpha)
+    if avg_loss == 0.0:
+        return np.nan
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+@njit(cache=True)
+def macd_last(close, fast_period=12, slow_period=26, signal_period=9):
+    """(macd, signal, histogram) 最后一个值（同 calculate_macd）"""
+    a_fast = 2.0 / (fast_period + 1.0)
+    a_slow = 2.0 / (slow_period + 1.0)
+    a_sig = 2.0 / (signal_period + 1.0)
+    fast = close[0]
+    slow = close[0]
+    sig = fast - slow
+    for i in range(1, close.shape[0]):
+        fast = _ewm_step(fast, close[i], a_fast)
+        slow = _ewm_step(slow, close[i], a_slow)
+        sig = _ewm_step(sig, fast - slow, a_sig)
+    m = fast - slow
+    return m, sig, m - sig
+
+
+@njit(cache=True)
+def atr_wilder_last(high, low, close, period=14):
+    """Wilder ATR 最后一个值（同 calculate_atr）；三个阵列需等长"""
+    alpha = 1.0 / period
+    w = abs(high[0] - low[0])
+    for i in range(1, close.shape[0]):
+        pc = close[i - 1]
+        tr = abs(high[i] - low[i])
+        t = abs(high[i] - pc)
+        if t > tr:
+            tr = t
+        t = abs(low[i] - pc)
+        if t > tr:
+            tr = t
+        w = _ewm_step(w, tr, alpha)
+    return w
+
+
+@njit(cache=True)
+def sma_std_last(x, window):
+    """最后 window 个值的均值与样本标准差（ddof=1）"""
+    n = x.shape[0]
+    s = 0.0
+    for i in range(n - window, n):
+        s += x[i]
+    mean = s / window
+    ss = 0.0
+    for i in range(n - window, n):
+        dv = x[i] - mean
+        ss += dv * dv
+    return mean, np.sqrt(ss / (window - 1))
+
+
+def warmup() -> None:
+    """import 时先编译（cache=True 之后多半直接读快取），避免第一轮决策时才付编译成本"""
+    dummy = np.linspace(1.0, 2.0, 30)
+    rsi_tail(dummy, 14, 10)
+    macd_tail(dummy, 12, 26, 9, 10)
+    boll_tail(dummy, 20, 10)
+    indicators_tail(dummy, dummy, dummy, 10, 9, 20)
+    ema_last(dummy, 20)
+    rsi_wilder_last(dummy, 14)
+    macd_last(dummy, 12, 26, 9)
+    atr_wilder_last(dummy, dummy, dummy, 14)
+    sma_std_last(dummy, 20)
+
+
+if HAS_NUMBA:
+    warmup()
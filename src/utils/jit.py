@@ -0,0 +1,22 @@
+"""
+可选 Numba JIT
+已安装 numba 时 njit 即 numba.njit；未安装时退化为原函数（以纯 Python 执行），
+呼叫端可用 HAS_NUMBA 决定是否改走 NumPy 向量化版本。
+"""
+from typing import Any, Callable
+
+try:
+    from numba import njit as _numba_njit
+    HAS_NUMBA = True
+except ImportError:  # pragma: no cover
+    _numba_njit = None
+    HAS_NUMBA = False
+
+
+def njit(*args: Any, **kwargs: Any) -> Callable:
+    """同 numba.njit，支援 @njit 与 @njit(cache=True) 两种写法"""
+    if HAS_NUMBA:
+        return _numba_njit(*args, **kwargs)
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return args[0]
+    return lambda func: func
@@ -0,0 +1,101 @@
+"""
+JSON 序列化工具
+已安装 orjson 时用 C 实作的 dumps/loads，未安装时回退标准库 json（输出内容相同：UTF-8、保留非 ASCII）
+"""
+import json
+import re
+from dataclasses import asdict, is_dataclass
+from typing import Any, Callable, Iterator, Optional, Union
+
+import numpy as np
+
+try:
+    import orjson  # 可选：C 实作的 JSON 序列化，未安装时回退标准库 json
+except ImportError:  # pragma: no cover
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+
+# orjson.JSONDecodeError 本身就是 json.JSONDecodeError 的子类，呼叫端统一 except 这个即可
+JSONDecodeError = json.JSONDecodeError
+
+_DECODER = json.JSONDecoder()
+_WS = re.compile(r"[ \t\n\r]*")
+
+
+def _json_default(obj: Any) -> Any:
+    """标准库 json 的回退序列化：dataclass → dict、numpy 纯量 / 阵列 → Python 值（orjson 已原生支援）"""
+    if is_dataclass(obj) and not isinstance(obj, type):
+        slots = getattr(obj, "__slots__", None)
+        if slots is not None:
+            return {name: getattr(obj, name) for name in slots}
+        return asdict(obj)  # 无 slots 的一般 dataclass
+    if isinstance(obj, (np.generic, np.ndarray)):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# OPT_SERIALIZE_NUMPY：DataFrame 直接取出的 np.float64 / np.int64 / ndarray 也能序列化（orjson 预设会拒绝）
+_ORJSON_OPTS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if HAS_ORJSON else 0
+_ORJSON_OPTS_INDENT = _ORJSON_OPTS | orjson.OPT_INDENT_2 if HAS_ORJSON else 0
+
+
+def dumps_bytes(obj: Any, indent: bool = True, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """
+    序列化为 JSON（UTF-8 bytes）；indent=True 缩排 2 格，False 为单行
+    default：遇到无法序列化的物件时的转换函式（例如 str），语意同 json.dumps(default=...)
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTS_INDENT if indent else _ORJSON_OPTS)
+    if default is None:
+        fallback = _json_default
+    else:
+        def fallback(o: Any) -> Any:
+            try:
+                return _json_default(o)
+            except TypeError:
+                return default(o)
+    return json.dumps(
+        obj, ensure_ascii=False, indent=2 if indent else None, default=fallback
+    ).encode()
+
+
+def dumps(obj: Any, indent: bool = True, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """同 dumps_bytes，返回 str"""
+    return dumps_bytes(obj, indent, default).decode()
+
+
+def loads(data: Union[str, bytes, bytearray]) -> Any:
+    """
+    解析 JSON（str 或 bytes）
+    orjson 不接受 NaN / Infinity 字面值与超出 64 位元的整数，遇到时改用标准库再解析一次，结果与 json.loads 一致。
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def iter_array(text: str) -> Iterator[Any]:
+    """
+    逐一解析顶层 JSON 阵列的元素（标准库 raw_decode），呼叫端找到目标即可提前中断，
+    不必先把整个阵列的元素都建成 Python 物件
+    """
+    idx = _WS.match(text, 0).end()
+    if text[idx:idx + 1] != "[":
+        raise JSONDecodeError("Expecting '['", text, idx)
+    idx = _WS.match(text, idx + 1).end()
+    if text[idx:idx + 1] == "]":
+        return
+    while True:
+        item, idx = _DECODER.raw_decode(text, idx)
+        yield item
+        idx = _WS.match(text, idx).end()
+        ch = text[idx:idx + 1]
+        if ch == "]":
+            return
+        if ch != ",":
+            raise JSONDecodeError("Expecting ',' delimiter", text, idx)
+        idx = _WS.match(text, idx + 1).end()
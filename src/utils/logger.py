@@ -1,19 +1,130 @@
 # src/utils/logger.py
+import atexit
 import logging
-from logging.handlers import TimedRotatingFileHandler
+import os
+import queue
+import threading
+import time
+from collections.abc import Mapping
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener, TimedRotatingFileHandler
 from pathlib import Path
 
 LOG_DIR = Path("./logs")
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 
-_DEFAULT_FMT = logging.Formatter(
-    "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
-)
+class _CachedTimeFormatter(logging.Formatter):
+    """同一秒内的 record 共用同一个 asctime 前缀，只补毫秒，不必每笔都 localtime + strftime"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # 快取各执行绪各自一份：listener 执行绪写档的 record 可能比 console（呼叫端执行绪）的慢一秒，
+        # 共用一份会在两个秒数之间来回重算
+        self._local = threading.local()
+
+    def formatTime(self, record: logging.LogRecord, datefmt: str | None = None) -> str:
+        if datefmt:
+            return super().formatTime(record, datefmt)
+        sec = int(record.created)
+        local = self._local
+        cached = getattr(local, "cache", None)  # (秒, 该秒格式化后的字串)
+        if cached is None or cached[0] != sec:
+            cached = local.cache = (sec, time.strftime(self.default_time_format, self.converter(sec)))
+        return self.default_msec_format % (cached[1], record.msecs)
+
 
-_CONSOLE_FMT = logging.Formatter(
+# 档案与 console 格式相同，共用一个 Formatter（asctime 快取也跟着共用）
+_FMT = _CachedTimeFormatter(
     "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
 )
 
+# logger 名称 → 日志档名；档案 handler 在第一次 get_logger(name) 时才建立（不用的 logger 不开档）
+_LOGGER_SPECS = {
+    "ai": "ai.log",
+    "trade": "trade.log",
+    "system": "system.log",
+    "prompt": "prompt.log",
+    "debug": "debug.log",
+    "binance_client": "binance_client.log",
+    "hedge": "hedge.log",
+}
+
+# 档案 handler 外包一层 MemoryHandler：满 _BUFFER_CAPACITY 笔、遇到 ERROR 以上、或每 _FLUSH_INTERVAL 秒才真正写档，
+# 不必每笔 log 都 write() 一次。程式结束时 logging.shutdown 会先关 MemoryHandler（把缓冲写进档案）再关档案
+_BUFFER_CAPACITY = 512
+_FLUSH_INTERVAL = 1.0
+_BUFFERED: list[MemoryHandler] = []
+_FLUSHER_LOCK = threading.Lock()
+_flusher_started = False
+
+# 写档整个移到背景执行绪：各 logger 只挂 QueueHandler（put 进 queue 即返回），
+# 由单一 QueueListener 依 record 上的档名交给对应的档案 handler，磁碟卡顿不会拖慢交易流程
+_LOG_QUEUE: queue.Queue = queue.Queue(-1)
+_FILE_HANDLERS: dict[str, logging.Handler] = {}  # 档名 → _build_file_handler 建立的 handler
+_listener: QueueListener | None = None
+
+
+class _FileRouter(logging.Handler):
+    """QueueListener 的唯一 handler：依 record.log_file 分送到各自的档案 handler"""
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        h = _FILE_HANDLERS.get(getattr(record, "log_file", None))
+        if h is not None:
+            h.handle(record)
+        return True
+
+
+class _FileQueueHandler(QueueHandler):
+    """挂在具名 logger 上：record 标上要写入的档名后放进共用 queue"""
+
+    def __init__(self, q: queue.Queue, filename: str):
+        super().__init__(q)
+        self.log_file = filename
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.log_file = self.log_file
+        return record
+
+
+def _flush_loop() -> None:
+    stop = threading.Event()  # 只用来定时等待；daemon 执行绪随程式结束
+    while not stop.wait(_FLUSH_INTERVAL):
+        for h in tuple(_BUFFERED):
+            try:
+                h.flush()
+            except Exception:
+                pass
+
+
+def _start_flusher() -> None:
+    global _flusher_started
+    with _FLUSHER_LOCK:
+        if not _flusher_started:
+            threading.Thread(target=_flush_loop, name="log-flush", daemon=True).start()
+            _flusher_started = True
+
+
+def _stop_listener() -> None:
+    # atexit 后进先出，会早于 logging 自己的 shutdown：先把 queue 里剩下的 record 写进 handler，再由 shutdown 关档
+    if _listener is not None:
+        _listener.stop()
+
+
+def _build_queue_handler(filename: str, level=logging.INFO) -> logging.Handler:
+    """建立 filename 的档案 handler（交给背景 listener），返回挂在 logger 上的 QueueHandler"""
+    global _listener
+    with _FLUSHER_LOCK:
+        if filename not in _FILE_HANDLERS:
+            _FILE_HANDLERS[filename] = _build_file_handler(filename, level)
+        if _listener is None:
+            _listener = QueueListener(_LOG_QUEUE, _FileRouter())
+            _listener.start()
+            atexit.register(_stop_listener)
+    qh = _FileQueueHandler(_LOG_QUEUE, filename)
+    qh.setLevel(level)
+    return qh
+
+
 def _build_file_handler(filename: str, level=logging.INFO) -> logging.Handler:
     h = TimedRotatingFileHandler(
         LOG_DIR / filename,
@@ -21,88 +132,111 @@ def _build_file_handler(filename: str, level=logging.INFO) -> logging.Handler:
         interval=1,
         backupCount=14,       # 保留天數
         encoding="utf-8",
+        delay=True,           # 第一笔写入时才开档：没写过的 log 不留空档、不占 fd
         utc=False             # 依系統時區（你在台灣就用本地時間）
     )
     h.setLevel(level)
-    h.setFormatter(_DEFAULT_FMT)
-    return h
+    h.setFormatter(_FMT)
+    mh = MemoryHandler(_BUFFER_CAPACITY, flushLevel=logging.ERROR, target=h)
+    mh.setLevel(level)
+    _BUFFERED.append(mh)
+    return mh
 
 def _build_console_handler(level=logging.INFO) -> logging.Handler:
     ch = logging.StreamHandler()
     ch.setLevel(level)
-    ch.setFormatter(_CONSOLE_FMT)
+    ch.setFormatter(_FMT)
     return ch
 
-def _ensure_handlers(logger: logging.Logger, handlers: list[logging.Handler]):
-    # 避免重覆加 handler
-    exists = {(type(h), getattr(h, "baseFilename", None)) for h in logger.handlers}
-    for h in handlers:
-        sig = (type(h), getattr(h, "baseFilename", None))
-        if sig not in exists:
-            logger.addHandler(h)
-            exists.add(sig)
+# LOG_CONSOLE=0：具名 logger 不再传到 root，只写各自的档案，省掉 console 那一次格式化与输出；
+# root 的 console 仍保留给 warnings 与未归属的讯息。于程式启动时的环境变数读取（早于载入 .env）
+_PROPAGATE = os.getenv("LOG_CONSOLE", "1").lower() not in ("0", "false", "no", "off")
+
+# 已装好 handler 的 logger 名称：get_logger 之后的呼叫只做一次 set 查询，不再比对既有 handler
+_INITIALIZED_LOGGERS: set[str] = set()
+_INIT_LOCK = threading.Lock()
+_console_ready = False
+
+def _ensure_console() -> None:
+    """root 装一个 console handler（已经有 StreamHandler 就不再加）；呼叫端需持有 _INIT_LOCK"""
+    global _console_ready
+    if _console_ready:
+        return
+    root = logging.getLogger()
+    if not any(type(h) is logging.StreamHandler for h in root.handlers):
+        root.addHandler(_build_console_handler(logging.INFO))
+    _console_ready = True
+
+class _LazyLoggers(Mapping):
+    """init_all_loggers 的返回值：以名称取用时才经 get_logger 建立该 logger 的档案 handler"""
+
+    def __getitem__(self, name: str) -> logging.Logger:
+        if name not in _LOGGER_SPECS:
+            raise KeyError(name)
+        return get_logger(name)
+
+    def __iter__(self):
+        return iter(_LOGGER_SPECS)
 
-def init_all_loggers() -> dict[str, logging.Logger]:
+    def __len__(self) -> int:
+        return len(_LOGGER_SPECS)
+
+
+_loggers: _LazyLoggers | None = None  # init_all_loggers 只做一次，之后直接返回同一个物件
+
+
+def init_all_loggers() -> Mapping[str, logging.Logger]:
     """
-    建立/初始化三個 logger：ai / trade / system
-    - 每個 logger 各自寫入對應檔案
+    初始化 logging：root 等級与 console 输出、warnings 模组讯息
+    - ai / trade / system / prompt / debug / binance_client / hedge 各自写入对应档案，
+      档案 handler 在第一次 get_logger(name)（或取用返回值的 [name]）时才建立
     - Root/Console 依然會輸出
-    重覆呼叫是安全的（不會重覆裝 handler）
+    重覆呼叫是安全的：第二次起直接返回第一次的结果
     """
-    logging.captureWarnings(True)  # 也抓到 warnings 模組訊息
-    root = logging.getLogger()
-    root.setLevel(logging.INFO)
-    _ensure_handlers(root, [_build_console_handler(logging.INFO)])
-
-    ai_logger = logging.getLogger("ai")
-    ai_logger.setLevel(logging.INFO)
-    _ensure_handlers(ai_logger, [_build_file_handler("ai.log", logging.INFO)])
-
-    trade_logger = logging.getLogger("trade")
-    trade_logger.setLevel(logging.INFO)
-    _ensure_handlers(trade_logger, [_build_file_handler("trade.log", logging.INFO)])
-
-    system_logger = logging.getLogger("system")
-    system_logger.setLevel(logging.INFO)
-    _ensure_handlers(system_logger, [_build_file_handler("system.log", logging.INFO)])
-
-    prompt_logger = logging.getLogger("prompt")
-    prompt_logger.setLevel(logging.INFO)
-    _ensure_handlers(prompt_logger, [_build_file_handler("prompt.log", logging.INFO)])
-    
-    debug_logger = logging.getLogger("debug")
-    debug_logger.setLevel(logging.INFO)
-    _ensure_handlers(debug_logger, [_build_file_handler("debug.log", logging.INFO)])
-
-    binance_client = logging.getLogger("binance_client")
-    binance_client.setLevel(logging.INFO)
-    _ensure_handlers(binance_client, [_build_file_handler("binance_client.log", logging.INFO)])
-
-    hedge = logging.getLogger("hedge")
-    hedge.setLevel(logging.INFO)
-    _ensure_handlers(hedge, [_build_file_handler("hedge.log", logging.INFO)])
-    
-    return {"hedge" : hedge ,"ai": ai_logger, "trade": trade_logger, "system": system_logger , "prompt": prompt_logger , "debug" : debug_logger , "binance_client" : binance_client}
+    global _loggers
+    if _loggers is not None:
+        return _loggers
+    with _INIT_LOCK:
+        if _loggers is None:
+            logging.captureWarnings(True)  # 也抓到 warnings 模組訊息
+            logging.getLogger().setLevel(logging.INFO)
+            _ensure_console()
+            _loggers = _LazyLoggers()
+    return _loggers
+
+# get_logger 建立 logger 时记下 (有效等级, logger)，trace() 只比一个整数就能决定要不要记录。
+# 等级只在 get_logger 第一次建立时设定；若在别处改了 logger 等级，trace 不会跟着变
+_GATES: dict[str, tuple[int, logging.Logger]] = {}
 
 def get_logger(name: str) -> logging.Logger:
     """
-    需要時取用既有 logger（保險起見若未初始化會快速建置必要 handler）
+    取用 logger；第一次取用时才建置它的档案 handler（与 root 的 console handler）
     """
-    m = {
-        "ai": ("ai.log",),
-        "trade": ("trade.log",),
-        "system": ("system.log",),
-        "prompt": ("prompt.log"),
-        "debug" : ("debug.log"),
-        "binance_client" : ("binance_client.log"),
-        "hedge" :("hedge.log")
-    }
     logger = logging.getLogger(name)
-    if not logger.handlers:
-        # 最小化處理，防漏 init
-        files = m.get(name)
-        if files:
-            _ensure_handlers(logger, [_build_file_handler(files[0], logging.INFO)])
-        _ensure_handlers(logging.getLogger(), [_build_console_handler(logging.INFO)])
-        logger.setLevel(logging.INFO)
-    return logger
\ No newline at end of file
+    if name in _INITIALIZED_LOGGERS:
+        return logger
+    with _INIT_LOCK:
+        if name not in _INITIALIZED_LOGGERS:
+            if not logger.handlers:
+                filename = _LOGGER_SPECS.get(name)
+                if filename:
+                    logger.addHandler(_build_queue_handler(filename, logging.INFO))
+                    logger.propagate = _PROPAGATE
+                    _start_flusher()
+                _ensure_console()
+                logger.setLevel(logging.INFO)
+            _GATES[name] = (logger.getEffectiveLevel(), logger)
+            _INITIALIZED_LOGGERS.add(name)
+    return logger
+
+def trace(name: str, level: int, msg: str, *args) -> None:
+    """
+    热路径用的记录函式：等级低于该 logger 的有效等级时直接返回，
+    不经 Logger.isEnabledFor，也不会组出 msg % args
+    """
+    gate = _GATES.get(name)
+    if gate is None:
+        get_logger(name)
+        gate = _GATES[name]
+    if level >= gate[0]:
+        gate[1].log(level, msg, *args)
\ No newline at end of file
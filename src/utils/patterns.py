@@ -0,0 +1,75 @@
+"""
+K 线型态侦测（Numba kernel，回传 bitmask）
+规则与 PromptBuilder 原本的纯 Python 版本逐条相同，只看最后两根：
+- Doji：实体 <= 区间 10%
+- Hammer / ShootingStar：下（上）影 >= 区间 50%、另一侧影线 <= 20%，且收阳（阴）
+- Bullish / BearishEngulfing：前一根阴（阳）线被本根实体完全吞没
+新增型态时：配一个新的 bit、在 detect_patterns 里加判断、并补进 PATTERN_NAMES。
+"""
+from typing import List
+
+import numpy as np
+
+from src.utils.jit import HAS_NUMBA, njit
+
+DOJI = 1
+HAMMER = 2
+SHOOTING_STAR = 4
+BULL_ENGULF = 8
+BEAR_ENGULF = 16
+
+# 依 bit 由小到大解码（即原本 patterns 串列的顺序）
+PATTERN_NAMES = (
+    (DOJI, "Doji"),
+    (HAMMER, "Hammer"),
+    (SHOOTING_STAR, "ShootingStar"),
+    (BULL_ENGULF, "BullishEngulfing"),
+    (BEAR_ENGULF, "BearishEngulfing"),
+)
+
+
+@njit(cache=True)
+def detect_patterns(ohlc):
+    """ohlc: (n, >=4) float64，栏位 O/H/L/C（旧→新）；返回型态 bitmask，n == 0 时为 0"""
+    n = ohlc.shape[0]
+    mask = 0
+    if n == 0:
+        return mask
+    o = ohlc[n - 1, 0]
+    h = ohlc[n - 1, 1]
+    l = ohlc[n - 1, 2]
+    c = ohlc[n - 1, 3]
+    rng = max(1e-9, h - l)
+    if c >= o:
+        b = c - o
+        up = h - c
+        lo = o - l
+    else:
+        b = o - c
+        up = h - o
+        lo = c - l
+
+    if b <= rng * 0.1:
+        mask |= DOJI
+    if lo >= rng * 0.5 and up <= rng * 0.2 and c > o:
+        mask |= HAMMER
+    if up >= rng * 0.5 and lo <= rng * 0.2 and c < o:
+        mask |= SHOOTING_STAR
+
+    if n >= 2:
+        o2 = ohlc[n - 2, 0]
+        c2 = ohlc[n - 2, 3]
+        if c2 < o2 and c > o and c >= o2 and o <= c2:
+            mask |= BULL_ENGULF
+        if c2 > o2 and c < o and o >= c2 and c <= o2:
+            mask |= BEAR_ENGULF
+    return mask
+
+
+def decode_patterns(mask: int) -> List[str]:
+    """bitmask → 型态名称串列"""
+    return [name for bit, name in PATTERN_NAMES if mask & bit]
+
+
+if HAS_NUMBA:
+    detect_patterns(np.zeros((2, 5)))  # import 时先编译
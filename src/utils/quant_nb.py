@@ -0,0 +1,31 @@
+"""
+Numba 下单数量 kernel
+数量按 stepSize 取整、不满最小名义金额时补足，都以「几个 step」的整数计算，
+格式化与 minQty / maxQty 限制仍交给 SymbolFilters（Decimal）。
+未安装 numba 时以纯 Python 执行，结果相同。
+"""
+import math
+
+from src.utils.jit import HAS_NUMBA, njit
+
+# 相对于一个 step 的容差：吸收 0.3 / 0.1 = 2.9999999999999996 这类浮点误差
+_EPS = 1e-9
+
+
+@njit(cache=True)
+def adjust_qty_steps(qty, price, step, min_notional):
+    """
+    数量换成 step 个数（向下取整）；qty * price 不满 min_notional 时，
+    改为满足 min_notional 的最少 step 个数（向上取整）。返回非负整数
+    """
+    n = math.floor(qty / step + _EPS)
+    if min_notional > 0.0 and price > 0.0 and n * step * price < min_notional:
+        n = math.ceil(min_notional / (price * step) - _EPS)
+    if n < 0:
+        n = 0
+    return n
+
+
+if HAS_NUMBA:
+    # import 时先编译（cache=True 时之后直接读磁碟快取），第一笔下单不必等 JIT
+    adjust_qty_steps(1.0, 1.0, 0.001, 5.0)
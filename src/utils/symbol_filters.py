@@ -1,62 +1,185 @@
 # src/utils/symbol_filters.py
 from __future__ import annotations
+from functools import lru_cache
 from typing import Dict, Any
 from decimal import Decimal, ROUND_DOWN
 
+import numpy as np
+
+from src.utils.quant_nb import _EPS
+
+_REL_EPS = 4 * float(np.finfo(np.float64).eps)  # 约 4 个 ulp
+
+
+@lru_cache(maxsize=4096)
+def _dec(x: float | str) -> Decimal:
+    # 同一个价格 / 数量常被反复量化：str + Decimal 解析只做一次（str(float) 为最短表示，同原本的 Decimal(str(x))）
+    return Decimal(str(x))
+
+
+def _to_decimal(x: float | str | Decimal) -> Decimal:
+    return x if isinstance(x, Decimal) else _dec(x)
+
+
+def _decimals(*values: Decimal) -> int:
+    """几位小数才能把这些值都表示成整数（'0.00100000' → 8）"""
+    return max(0, *(-v.as_tuple().exponent for v in values))
+
+
+@lru_cache(maxsize=4096)
+def _fmt_scaled(v: int, scale: int, dp: int) -> str:
+    """放大 scale(=10**dp) 倍的整数 → 数量 / 价格字串，格式同 format(Decimal.normalize(), 'f')"""
+    whole, frac = divmod(v, scale)
+    if not frac:
+        return str(whole)
+    return f"{whole}.{frac:0{dp}d}".rstrip("0")
+
+
 class SymbolFilters:
+    # 每个交易对一个实例、量化时频繁读属性：用 slots 取代 __dict__
+    __slots__ = (
+        "info",
+        "_step", "_minQ", "_maxQ", "_tick", "_minP", "_maxP", "_minN",
+        "step_f", "min_notional_f", "_has_notional",
+        "_qty_dp", "_qty_scale", "_step_i", "_minQ_i", "_maxQ_i", "_qty_floor",
+        "_price_dp", "_price_scale", "_tick_i", "_minP_i", "_maxP_i", "_price_floor",
+    )
+
     def __init__(self, info: Dict[str, Any]):
         self.info = info or {}
-        self.filters = {f["filterType"]: f for f in self.info.get("filters", [])}
 
-        lot = self.filters.get("LOT_SIZE") or self.filters.get("MARKET_LOT_SIZE") or {}
-        pricef = self.filters.get("PRICE_FILTER") or {}
-        notional = self.filters.get("MIN_NOTIONAL") or {}
+        # 只会用到这几种 filter：扫一次取出（同类重复时取最后一个，同原本以 dict 收集的结果），不建整张 dict
+        lot = market_lot = pricef = notional = None
+        for f in self.info.get("filters", ()):
+            t = f["filterType"]
+            if t == "LOT_SIZE":
+                lot = f
+            elif t == "PRICE_FILTER":
+                pricef = f
+            elif t == "MIN_NOTIONAL":
+                notional = f
+            elif t == "MARKET_LOT_SIZE":
+                market_lot = f
+        lot = lot or market_lot or {}
+        pricef = pricef or {}
+        notional = notional or {}
 
-        # Keep as strings → convert to Decimal later (no float artifacts)
-        self.stepSize = lot.get("stepSize", "0.001")
-        self.minQty   = lot.get("minQty", "0.001")
-        self.maxQty   = lot.get("maxQty", "100000000")
+        # Parse the exchange strings straight to Decimal (no float artifacts);
+        # the string forms are available as properties below
+        self._step  = Decimal(lot.get("stepSize", "0.001"))
+        self._minQ  = Decimal(lot.get("minQty", "0.001"))
+        self._maxQ  = Decimal(lot.get("maxQty", "100000000"))
+        self._tick  = Decimal(pricef.get("tickSize", "0.01"))
+        self._minP  = Decimal(pricef.get("minPrice", "0.01"))
+        self._maxP  = Decimal(pricef.get("maxPrice", "100000000"))
+        # On USDT Futures it’s often "notional"; on some it’s "minNotional"
+        self._minN  = Decimal(notional.get("notional") or notional.get("minNotional") or "0")
+        # float 版本给数量 kernel（src.utils.quant_nb）用
+        self.step_f = float(self._step)
+        self.min_notional_f = float(self._minN)
+        self._has_notional = self._minN > 0
 
-        self.tickSize = pricef.get("tickSize", "0.01")
-        self.minPrice = pricef.get("minPrice", "0.01")
-        self.maxPrice = pricef.get("maxPrice", "100000000")
+        # 整数版本：数量 / 价格放大 10**dp 倍后都是整数，取整只剩整数的 // 与比较，不做 Decimal 除法
+        self._qty_dp = _decimals(self._step, self._minQ, self._maxQ)
+        self._qty_scale = 10 ** self._qty_dp
+        self._step_i = int(self._step * self._qty_scale)
+        self._minQ_i = int(self._minQ * self._qty_scale)
+        self._maxQ_i = int(self._maxQ * self._qty_scale)
+        self._price_dp = _decimals(self._tick, self._minP, self._maxP)
+        self._price_scale = 10 ** self._price_dp
+        self._tick_i = int(self._tick * self._price_scale)
+        self._minP_i = int(self._minP * self._price_scale)
+        self._maxP_i = int(self._maxP * self._price_scale)
+        # step / tick 是 10 的次方（0.001、0.01…）且与 min/max 同位数时放大后为 1：int() 截断已经取好整，省掉取余
+        self._qty_floor = self._step_i != 1
+        self._price_floor = self._tick_i != 1
 
-        # On USDT Futures it’s often "notional"; on some it’s "minNotional"
-        self.minNotional = notional.get("notional") or notional.get("minNotional") or "0"
-
-        # Prebuild Decimals
-        self._step  = Decimal(self.stepSize)
-        self._minQ  = Decimal(self.minQty)
-        self._maxQ  = Decimal(self.maxQty)
-        self._tick  = Decimal(self.tickSize)
-        self._minP  = Decimal(self.minPrice)
-        self._maxP  = Decimal(self.maxPrice)
-        self._minN  = Decimal(self.minNotional)
-
-    def _floor_to_step(self, value: Decimal, step: Decimal) -> Decimal:
-        # emulate floor(value/step)*step in Decimal space
-        return (value // step) * step
-
-    def quantize_qty(self, qty: float | str) -> str:
-        q = Decimal(str(qty))
-        q = max(self._minQ, min(q, self._maxQ))
-        q = self._floor_to_step(q, self._step)
-        if q < self._minQ:
-            q = self._minQ
+    @property
+    def filters(self) -> Dict[str, Dict[str, Any]]:
+        """filterType → filter（要时才建）"""
+        return {f["filterType"]: f for f in self.info.get("filters", [])}
+
+    # 交易所原始字串：Decimal 保留原本的位数，format(..., 'f') 即还原（如 '0.00100000'）
+    @property
+    def stepSize(self) -> str:
+        return format(self._step, 'f')
+
+    @property
+    def minQty(self) -> str:
+        return format(self._minQ, 'f')
+
+    @property
+    def maxQty(self) -> str:
+        return format(self._maxQ, 'f')
+
+    @property
+    def tickSize(self) -> str:
+        return format(self._tick, 'f')
+
+    @property
+    def minPrice(self) -> str:
+        return format(self._minP, 'f')
+
+    @property
+    def maxPrice(self) -> str:
+        return format(self._maxP, 'f')
+
+    @property
+    def minNotional(self) -> str:
+        return format(self._minN, 'f')
+
+    # 以下取整都是：先夹在 [min, max]，再向下取到 step 的整数倍，不足 min 时取 min
+    # （min >= 0，int() 截断即向下取整；结果同原本 Decimal 的 (v // step) * step）
+
+    def quantize_qty(self, qty: float | str | Decimal) -> str:
+        q = int(_to_decimal(qty) * self._qty_scale)
+        if q > self._maxQ_i:
+            q = self._maxQ_i
+        if self._qty_floor:
+            q -= q % self._step_i
+        if q < self._minQ_i:
+            q = self._minQ_i
         # Normalize to plain string (no scientific notation)
-        return format(q.normalize(), 'f')
-
-    def quantize_price(self, price: float | str) -> str:
-        p = Decimal(str(price))
-        p = max(self._minP, min(p, self._maxP))
-        p = self._floor_to_step(p, self._tick)
-        if p < self._minP:
-            p = self._minP
-        return format(p.normalize(), 'f')
-
-    def meets_notional(self, qty: float | str, price: float | str) -> bool:
-        if self._minN <= 0:
+        return _fmt_scaled(q, self._qty_scale, self._qty_dp)
+
+    def qty_from_steps(self, steps: int) -> str:
+        """step 个数 → 数量字串（同 quantize_qty 的 minQty / maxQty 限制与格式）"""
+        q = int(steps) * self._step_i  # 本身就在 step 格点上
+        if q > self._maxQ_i:
+            q = self._maxQ_i - self._maxQ_i % self._step_i
+        if q < self._minQ_i:
+            q = self._minQ_i
+        return _fmt_scaled(q, self._qty_scale, self._qty_dp)
+
+    def quantize_price(self, price: float | str | Decimal) -> str:
+        p = int(_to_decimal(price) * self._price_scale)
+        if p > self._maxP_i:
+            p = self._maxP_i
+        if self._price_floor:
+            p -= p % self._tick_i
+        if p < self._minP_i:
+            p = self._minP_i
+        return _fmt_scaled(p, self._price_scale, self._price_dp)
+
+    def _floor_batch(self, values, scale: int, step_i: int, lo: int, hi: int) -> np.ndarray:
+        # 同 quantize_qty 的顺序（夹上限 → 向下取到 step → 不足下限取下限），以 step 个数计算。
+        # 0.29 * 100 = 28.999999999999996 这类浮点误差：小数值由 _EPS（同 quant_nb kernel）吸收，
+        # 大数值（如 3.26 * 1e7）误差超过 _EPS，再乘上 1 + _REL_EPS 按比例放宽
+        v = np.minimum(np.asarray(values, dtype=np.float64) * scale, hi)
+        out = np.floor(v / step_i * (1.0 + _REL_EPS) + _EPS).astype(np.int64) * step_i
+        np.minimum(out, hi - hi % step_i, out=out)  # 放宽后可能越过上限，再夹一次
+        np.maximum(out, lo, out=out)
+        return out / scale
+
+    def quantize_qty_batch(self, qtys) -> np.ndarray:
+        """整批数量一次量化（网格 / 分批下单试算用），返回 float64 阵列；送单仍用 quantize_qty 的字串"""
+        return self._floor_batch(qtys, self._qty_scale, self._step_i, self._minQ_i, self._maxQ_i)
+
+    def quantize_price_batch(self, prices) -> np.ndarray:
+        """整批价格一次量化到 tickSize，返回 float64 阵列"""
+        return self._floor_batch(prices, self._price_scale, self._tick_i, self._minP_i, self._maxP_i)
+
+    def meets_notional(self, qty: float | str | Decimal, price: float | str | Decimal) -> bool:
+        if not self._has_notional:
             return True
-        q = Decimal(str(qty))
-        p = Decimal(str(price))
-        return (q * p) >= self._minN
\ No newline at end of file
+        return _to_decimal(qty) * _to_decimal(price) >= self._minN
\ No newline at end of file